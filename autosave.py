@@ -0,0 +1,128 @@
+"""预算数据后台保存
+
+短时间内的多次修改合并为一次写入；序列化与写盘在后台线程完成，
+先写临时文件并fsync，再原子替换目标文件，写到一半崩溃也不会损坏原文件。
+保存结果通过Tk事件循环（after回调）通知界面。
+"""
+import os
+import json
+import queue
+import tempfile
+import threading
+
+SAVE_DELAY_MS = 500  # 最后一次修改后等待多久再保存（期间的修改合并为一次）
+POLL_INTERVAL_MS = 100
+
+
+def atomic_write_bytes(path, data):
+    """写入临时文件并fsync后原子替换目标文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write_json(path, obj):
+    """紧凑格式序列化后原子写入"""
+    data = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    atomic_write_bytes(path, data)
+
+
+class AutoSaver:
+    """合并保存请求并在后台线程写盘
+
+    root：Tk根窗口；write(snapshot)：在后台线程调用，负责实际写入；
+    get_snapshot：在主线程调用，返回可安全交给后台线程的数据副本；
+    on_done(error)：在主线程回调，error为None表示保存成功；
+    merge(older, newer)：合并排队中的两份数据，默认只保留较新的一份
+    """
+
+    def __init__(self, root, write, get_snapshot, on_done, delay_ms=SAVE_DELAY_MS, merge=None):
+        self.root = root
+        self.write = write
+        self.get_snapshot = get_snapshot
+        self.on_done = on_done
+        self.merge = merge or (lambda older, newer: newer)
+        self.delay_ms = delay_ms
+
+        self._timer = None
+        self._pending = 0  # 已交给后台线程、尚未收到结果的保存次数
+        self._polling = False
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, name="AutoSaver", daemon=True)
+        self._thread.start()
+
+    def request(self):
+        """请求保存（主线程调用）：重新计时，计时结束后才真正保存"""
+        if self._timer is not None:
+            self.root.after_cancel(self._timer)
+        self._timer = self.root.after(self.delay_ms, self._flush)
+
+    def flush(self):
+        """立即提交尚在计时中的保存请求（切换数据前调用）"""
+        if self._timer is not None:
+            self.root.after_cancel(self._timer)
+            self._flush()
+
+    def close(self):
+        """退出前调用：立即提交未保存的修改并等待后台线程写完"""
+        self.flush()
+        self._jobs.put(None)
+        self._thread.join()
+        self._drain_results()
+
+    def _flush(self):
+        self._timer = None
+        self._pending += 1
+        self._jobs.put(self.get_snapshot())
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def _worker(self):
+        while True:
+            snapshot = self._jobs.get()
+            if snapshot is None:
+                return
+            merged = 1
+            # 合并排队中的保存请求，只写最新的数据
+            while True:
+                try:
+                    newer = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if newer is None:
+                    self._jobs.put(None)
+                    break
+                snapshot = self.merge(snapshot, newer)
+                merged += 1
+            try:
+                self.write(snapshot)
+                self._results.put((merged, None))
+            except Exception as e:
+                self._results.put((merged, e))
+
+    def _drain_results(self):
+        while True:
+            try:
+                merged, error = self._results.get_nowait()
+            except queue.Empty:
+                return
+            self._pending -= merged
+            self.on_done(error)
+
+    def _poll(self):
+        self._drain_results()
+        if self._pending > 0:
+            self.root.after(POLL_INTERVAL_MS, self._poll)
+        else:
+            self._polling = False
@@ -0,0 +1,316 @@
+"""批量生成申请表 / 会审单（无界面，多进程并行）
+
+用法：
+    python main.py batch 站点清单.xlsx --out 输出目录 --jobs 4 \\
+        --app-template 申请表模板.docx --review-template 会审单模板.docx [--excel] [--engine ooxml]
+
+站点清单每行一个站点：
+    项目名称（必填）、项目日期、实施周期、图片目录 为固定列；
+    与基础信息同名的列（如“申请单位”）覆盖config.json中的默认值；
+    其余列名需与预算表中的项目名称一致，单元格填写该项的工程量。
+--excel 时每个站点另外导出一份预算清单（.xlsx）。
+--zip 打包.zip 时全部文件直接写入一个ZIP（--zip-per-site 时每个站点一个ZIP，保存在输出目录）：
+文档在子进程中生成到内存，每完成一个站点即写入ZIP，不产生临时文件；
+同时提交的站点数限制为进程数的IN_FLIGHT_PER_JOB倍，内存占用与站点总数无关。
+--engine ooxml 时用ooxml_fill直接修改模板XML（输出与默认的python-docx相同，速度快数倍）。
+"""
+import io
+import os
+import re
+import zipfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+import pandas as pd
+
+import doc_forms
+import ooxml_fill
+from budget_export import export_budget
+from budget_core import (CONFIG_FILE, BUDGET_DATA_FILE, read_config, read_budget_file, read_price_book,
+                         calc_total_amount, generate_work_list, list_image_files)
+
+MANIFEST_FIXED_COLS = ["项目名称", "项目日期", "实施周期", "图片目录"]
+DATE_FORMAT = "%Y年%m月%d日"  # 与界面日期控件的显示格式一致
+DEFAULT_CYCLE = "15天"
+ENGINES = {"docx": doc_forms, "ooxml": ooxml_fill}  # 填充引擎 -> 提供fill_application_form / fill_review_form的模块
+IN_FLIGHT_PER_JOB = 2  # 每个进程同时排队的站点数（限制已生成未写出的文档占用的内存）
+
+
+# ===================== 清单解析 =====================
+def load_budget(path):
+    """读取预算数据：家集客预算表（.xlsx/.xls）或budget_data.json，工程量均为0"""
+    if path.lower().endswith((".xlsx", ".xls")):
+        return read_price_book(path)
+    return read_budget_file(path)
+
+
+def format_date(value):
+    if pd.isna(value) or not str(value).strip():
+        return datetime.now().strftime(DATE_FORMAT)
+    if isinstance(value, datetime):
+        return value.strftime(DATE_FORMAT)
+    return str(value).strip()
+
+
+def safe_filename(name):
+    return re.sub(r'[\\/:*?"<>|\r\n]', "_", name).strip() or "未命名项目"
+
+
+def read_manifest(path, budget_data, base_info):
+    """读取站点清单，返回(站点任务列表, 预算表中不存在的列名)；工程量列对应预算表中的重名项目时报错"""
+    df = pd.read_csv(path) if path.lower().endswith(".csv") else pd.read_excel(path)
+    df.columns = df.columns.astype(str).str.strip()
+    if "项目名称" not in df.columns: raise ValueError("站点清单缺少必要列：项目名称")
+
+    manifest_dir = os.path.dirname(os.path.abspath(path))
+    item_cols = {c for c in df.columns if c not in MANIFEST_FIXED_COLS and c not in base_info}
+    names = pd.Series([item["name"] for item in budget_data], dtype=object)
+    ambiguous = sorted(item_cols & set(names[names.duplicated()]))
+    if ambiguous: raise ValueError(f"预算表中有重名项目，无法确定以下列对应哪一项：{'、'.join(ambiguous)}")
+    # 按预算表顺序排列工程量列，保证清单文本顺序与界面一致
+    ordered_items = []
+    for item in budget_data:
+        if item["name"] in item_cols:
+            ordered_items.append(item)
+            item_cols.discard(item["name"])
+    unknown_cols = sorted(item_cols)
+
+    quantities = {item["name"]: pd.to_numeric(df[item["name"]], errors="coerce").fillna(0.0)
+                  for item in ordered_items}
+
+    sites = []
+    used_stems = {}
+    for row_idx, row in enumerate(df.to_dict("records")):
+        project_name = str(row["项目名称"]).strip()
+        if not project_name or project_name == "nan": continue
+
+        items = []
+        for item in ordered_items:
+            quantity = float(quantities[item["name"]].iat[row_idx])
+            if quantity > 0:
+                items.append(dict(item, quantity=quantity, total=0.0))
+
+        site_info = dict(base_info)
+        for key in base_info:
+            if key in row and pd.notna(row[key]) and str(row[key]).strip():
+                site_info[key] = str(row[key]).strip()
+
+        folder = row.get("图片目录")
+        image_paths = []
+        if folder is not None and pd.notna(folder) and str(folder).strip():
+            image_paths = list_image_files(os.path.join(manifest_dir, str(folder).strip()))
+
+        cycle = row.get("实施周期")
+        stem = safe_filename(project_name)
+        used_stems[stem] = used_stems.get(stem, 0) + 1
+        if used_stems[stem] > 1: stem = f"{stem}_{used_stems[stem]}"
+
+        sites.append({
+            "row": row_idx + 2,  # Excel行号（含表头）
+            "project_name": project_name,
+            "project_date": format_date(row.get("项目日期")),
+            "cycle": str(cycle).strip() if cycle is not None and pd.notna(cycle) else DEFAULT_CYCLE,
+            "base_info": site_info,
+            "items": items,
+            "image_paths": image_paths,
+            "file_stem": stem,
+        })
+    return sites, unknown_cols
+
+
+# ===================== 单站点生成（在子进程中执行） =====================
+def _to_bytes(doc):
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def render_site(site, app_template, review_template, excel=False, engine="docx"):
+    """在内存中生成一个站点的文档，返回(金额, [(文件名, 内容)])"""
+    items = site["items"]
+    total_amount = calc_total_amount(items)
+    if total_amount <= 0: raise ValueError("无有效项目")
+    work_list = generate_work_list(items)
+    forms = ENGINES[engine]
+
+    app_doc = forms.fill_application_form(app_template, site["base_info"], site["project_name"],
+                                              site["project_date"], site["cycle"], work_list,
+                                              total_amount, site["image_paths"])
+    files = [(f"{site['file_stem']}_申请表.docx", _to_bytes(app_doc))]
+    review_doc = forms.fill_review_form(review_template, site["base_info"], site["project_name"],
+                                            site["project_date"], site["cycle"], work_list, total_amount)
+    files.append((f"{site['file_stem']}_会审单.docx", _to_bytes(review_doc)))
+
+    if excel:
+        buffer = io.BytesIO()
+        export_budget(items, buffer, write_only=False)
+        files.append((f"{site['file_stem']}_预算清单.xlsx", buffer.getvalue()))
+    return total_amount, files
+
+
+def generate_site(site, app_template, review_template, out_dir, excel=False, engine="docx"):
+    """生成一个站点的文档并保存到输出目录，返回(金额, 文件路径列表)"""
+    total_amount, files = render_site(site, app_template, review_template, excel, engine)
+    paths = []
+    for name, data in files:
+        path = os.path.join(out_dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+    return total_amount, paths
+
+
+# ===================== 输出（目录 / ZIP） =====================
+class DirectoryOutput:
+    """文件直接保存在输出目录（由生成文档的进程写出，主进程只收到路径）"""
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+
+    def write(self, site, paths):
+        return paths
+
+    def close(self):
+        pass
+
+
+class ZipOutput:
+    """全部文件写入一个ZIP；docx/xlsx本身已压缩，按存储方式写入，不再重复压缩"""
+    out_dir = None  # 文档在内存中生成，由主进程写入
+
+    def __init__(self, zip_path):
+        folder = os.path.dirname(os.path.abspath(zip_path))
+        os.makedirs(folder, exist_ok=True)
+        self.path = zip_path
+        self.zf = zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED)
+
+    def write(self, site, files):
+        for name, data in files:
+            self.zf.writestr(name, data)
+        return [f"{self.path}:{name}" for name, _ in files]
+
+    def close(self):
+        self.zf.close()
+
+
+class SiteZipOutput:
+    """每个站点一个ZIP（站点名.zip），保存在输出目录"""
+    out_dir = None
+
+    def __init__(self, zip_dir):
+        self.zip_dir = zip_dir
+        os.makedirs(zip_dir, exist_ok=True)
+
+    def write(self, site, files):
+        path = os.path.join(self.zip_dir, f"{site['file_stem']}.zip")
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as zf:
+            for name, data in files:
+                zf.writestr(name, data)
+        return [path]
+
+    def close(self):
+        pass
+
+
+def _run_site(site, app_template, review_template, out_dir, excel, engine):
+    """out_dir为None时在内存中生成，返回文件内容；否则保存到out_dir，返回路径"""
+    if out_dir is None:
+        return render_site(site, app_template, review_template, excel, engine)
+    return generate_site(site, app_template, review_template, out_dir, excel, engine)
+
+
+def run_batch(sites, app_template, review_template, output, jobs, excel=False, engine="docx"):
+    """并行生成所有站点，逐个返回(站点, 金额, 文件列表, 错误信息)
+    output为输出目录（字符串）或DirectoryOutput / ZipOutput / SiteZipOutput；
+    同时提交的站点数不超过jobs * IN_FLIGHT_PER_JOB，站点完成后立即写出"""
+    if isinstance(output, str):
+        output = DirectoryOutput(output)
+    if jobs <= 1:
+        for site in sites:
+            try:
+                total_amount, files = _run_site(site, app_template, review_template, output.out_dir, excel, engine)
+                yield site, total_amount, output.write(site, files), None
+            except Exception as e:
+                yield site, 0.0, [], str(e)
+        return
+
+    pending = iter(sites)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {}
+
+        def submit_more():
+            for site in pending:
+                futures[pool.submit(_run_site, site, app_template, review_template, output.out_dir, excel,
+                                     engine)] = site
+                if len(futures) >= jobs * IN_FLIGHT_PER_JOB: break
+
+        submit_more()
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                site = futures.pop(future)
+                try:
+                    total_amount, files = future.result()
+                    yield site, total_amount, output.write(site, files), None
+                except Exception as e:
+                    yield site, 0.0, [], str(e)
+            submit_more()
+
+
+# ===================== 命令行入口 =====================
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py batch", description="按站点清单批量生成申请表与会审单")
+    parser.add_argument("manifest", help="站点清单（.xlsx / .csv）")
+    parser.add_argument("--out", default="输出", help="输出目录（默认：输出）")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="并行进程数（默认：CPU核数）")
+    parser.add_argument("--app-template", required=True, help="申请表模板（.docx）")
+    parser.add_argument("--review-template", required=True, help="会审单模板（.docx）")
+    parser.add_argument("--budget", default=BUDGET_DATA_FILE,
+                        help=f"预算数据（{BUDGET_DATA_FILE}或家集客预算表.xlsx，默认：{BUDGET_DATA_FILE}）")
+    parser.add_argument("--config", default=CONFIG_FILE, help=f"基础信息配置（默认：{CONFIG_FILE}）")
+    parser.add_argument("--excel", action="store_true", help="每个站点另外导出预算清单（.xlsx）")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="docx",
+                        help="文档填充方式：docx（python-docx，默认）或ooxml（直接修改模板XML，更快）")
+    bundle = parser.add_mutually_exclusive_group()
+    bundle.add_argument("--zip", metavar="ZIP", help="全部文件写入一个ZIP（不在输出目录中保存散文件）")
+    bundle.add_argument("--zip-per-site", action="store_true", help="每个站点的文件打包为一个ZIP，保存在输出目录")
+    args = parser.parse_args(argv)
+
+    for path in (args.manifest, args.app_template, args.review_template, args.budget):
+        if not os.path.exists(path): parser.error(f"文件不存在：{path}")
+
+    budget_data = load_budget(args.budget)
+    base_info = read_config(args.config)
+    try:
+        sites, unknown_cols = read_manifest(args.manifest, budget_data, base_info)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    if unknown_cols:
+        print(f"⚠️ 以下列在预算表中不存在，已忽略：{', '.join(unknown_cols)}")
+    if not sites:
+        print("⚠️ 站点清单无有效数据")
+        return 1
+
+    if args.zip:
+        output, target = ZipOutput(args.zip), os.path.abspath(args.zip)
+    else:
+        output = SiteZipOutput(args.out) if args.zip_per_site else DirectoryOutput(args.out)
+        target = os.path.abspath(args.out)
+    failed = 0
+    try:
+        for done, (site, total_amount, paths, error) in enumerate(
+                run_batch(sites, args.app_template, args.review_template, output, args.jobs, args.excel,
+                          args.engine), start=1):
+            if error:
+                failed += 1
+                print(f"[{done}/{len(sites)}] ❌ 第{site['row']}行 {site['project_name']}：{error}")
+            else:
+                print(f"[{done}/{len(sites)}] ✅ {site['project_name']}（{total_amount:.2f}元）")
+    finally:
+        output.close()
+
+    print(f"完成：成功{len(sites) - failed}个，失败{failed}个，输出：{target}")
+    return 1 if failed else 0
@@ -0,0 +1,282 @@
+"""性能基准测试：用合成的预算表、模板和照片测量主要耗时环节，结果写入JSON，可与基准结果比较
+
+用法（在项目根目录运行）：
+    python benchmarks/run.py --sizes 1000 10000 100000 --out results.json
+    python benchmarks/run.py --compare baseline.json [--threshold 0.2]
+
+测量项目（每项重复若干次取最短时间，单位秒）：
+    读取预算表（read_price_book）、parse_sheet1 / parse_sheet2（不含读取Excel）、建立预算表（BudgetTable）、
+    表格刷新（refresh_treeviews：首次填充全部行、修改一项后的增量刷新）、导出预算清单（export_budget）、
+    工作量清单（BudgetTable.work_list：修改一项工程量后重新拼接）、申请表填充（无图片 / 4张照片，含保存）、会审单填充（含保存）、照片预处理；
+    文档填充另测ooxml_fill（名称带_ooxml后缀）。
+表格刷新在有显示环境时使用隐藏的Tk窗口，否则使用桩表格（只测量比对逻辑，不含Tk绘制）。
+未安装Pillow时跳过照片相关项目（合成照片与照片预处理都需要Pillow），比较时只比较两边都有的项目。
+--compare时耗时超过基准(1 + threshold)倍且多出1毫秒以上的项目记为退步，有退步时返回码为1。
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 项目根目录
+
+import doc_forms
+import image_prep
+import ooxml_fill
+from benchmarks import synthetic
+from budget_core import (DEFAULT_BASE_INFO, SHEET1_COLS, SHEET2_COLS, parse_sheet1, parse_sheet2,
+                         read_price_book, _read_sheet)
+from budget_export import export_budget
+from budget_store import BudgetTable
+
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.2
+NOISE_FLOOR = 0.001  # 绝对差小于1毫秒的不算退步
+NONZERO_SHARE = 0.1  # 工程量不为0的项目占比（导出、清单、文档按此填充）
+WORK_DIR = os.path.join(tempfile.gettempdir(), "jjk_benchmarks")
+
+
+# ===================== 计时 =====================
+def measure(func, repeat, setup=None):
+    """先不计时运行一次（编译模板、填充缓存、首次导入），再重复运行func（每次运行前调用setup，不计时），
+    返回最短时间、中位数和每次的耗时"""
+    if setup is not None:
+        setup()
+    func()
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - t0)
+    return {"seconds": min(runs), "median": statistics.median(runs), "runs": runs}
+
+
+# ===================== 表格刷新 =====================
+class StubTree:
+    """无显示环境时代替Treeview：只保存行数据，接口与界面用到的部分一致"""
+
+    def __init__(self):
+        self.rows = []
+        self.data = {}
+
+    def insert(self, parent, index, iid=None, values=(), tags=()):
+        self.rows.insert(index, iid)
+        self.data[iid] = (values, tags)
+
+    def item(self, iid, values=None, tags=None):
+        self.data[iid] = (values, tags)
+
+    def delete(self, iid):
+        self.rows.remove(iid)
+        del self.data[iid]
+
+    def get_children(self, item=""):
+        return tuple(self.rows)
+
+
+class _Var:
+    def set(self, value):
+        self.value = value
+
+
+def make_tree_app(budget_data):
+    """只含表格的界面对象：返回(app, 换成空表格的函数, 刷新后等待绘制完成的函数, 模式)
+    有显示环境时使用隐藏的Tk窗口（模式tk），否则使用桩表格（模式stub）"""
+    import tkinter as tk
+    from main import HomeAndEnterpriseTool, VIRTUAL_TREE_MIN_ROWS
+    app = HomeAndEnterpriseTool.__new__(HomeAndEnterpriseTool)
+    app.budget_data = budget_data
+    app.search_hits = None
+    app.total_var = _Var()
+    try:
+        root = tk.Tk()
+        root.withdraw()
+    except tk.TclError:
+        root = None
+    virtual = len(budget_data) >= VIRTUAL_TREE_MIN_ROWS
+
+    def reset():
+        app.tree_rows = {}
+        if root is None:
+            app.construction_tree, app.material_tree = StubTree(), StubTree()
+            return
+        for tree in (getattr(app, "construction_tree", None), getattr(app, "material_tree", None)):
+            if tree is not None:
+                tree.master.destroy()
+        app.construction_tree = app.create_scrolled_tree(tk.Frame(root), "施工项目", virtual)
+        app.material_tree = app.create_scrolled_tree(tk.Frame(root), "材料项目", virtual)
+
+    reset()
+    if root is None:
+        return app, reset, lambda: None, "stub"
+    return app, reset, root.update_idletasks, "tk"
+
+
+# ===================== 测量项目 =====================
+def set_quantities(budget_data, share=NONZERO_SHARE):
+    ids, _ = budget_data.names()
+    budget_data.set_quantities({item_id: float(idx % 7 + 1) for idx, item_id in enumerate(ids)
+                                if idx % round(1 / share) == 0})
+
+
+def fill_documents(app_template, review_template, budget_data, image_paths, forms=doc_forms):
+    base_info = dict(DEFAULT_BASE_INFO)
+    work_list = budget_data.work_list()
+    total = budget_data.total_amount
+
+    def application():
+        doc = forms.fill_application_form(app_template, base_info, "基准测试项目", "2026年01月01日", "15天",
+                                              work_list, total, image_paths)
+        doc.save(io.BytesIO())
+
+    def review():
+        doc = forms.fill_review_form(review_template, base_info, "基准测试项目", "2026年01月01日", "15天",
+                                     work_list, total)
+        doc.save(io.BytesIO())
+
+    return application, review
+
+
+def run_size(size, work_dir, repeat):
+    """一种预算表规模下的全部测量，返回{项目名称: 结果}"""
+    results = {}
+
+    def record(name, func):
+        results[f"{name}[{size}]"] = measure(func, repeat)
+
+    book = synthetic.price_book(work_dir, size)
+    record("read_price_book", lambda: read_price_book(book))
+    sheet1 = _read_sheet(book, 0, SHEET1_COLS)
+    sheet2 = _read_sheet(book, 1, SHEET2_COLS)
+    record("parse_sheet1", lambda: parse_sheet1(sheet1.copy()))
+    record("parse_sheet2", lambda: parse_sheet2(sheet2.copy()))
+
+    items = read_price_book(book)
+    record("budget_table", lambda: BudgetTable(items))
+    budget_data = BudgetTable(items)
+    set_quantities(budget_data)
+
+    app, reset, settle, mode = make_tree_app(budget_data)
+
+    def refresh_full():
+        app.refresh_treeviews()
+        settle()
+
+    results[f"refresh_treeviews_full_{mode}[{size}]"] = measure(refresh_full, repeat, setup=reset)
+    first_id = budget_data.names()[0][0]
+
+    def refresh_one():
+        item = budget_data.update(first_id, quantity=budget_data.get(first_id)["quantity"] + 1)
+        app.refresh_treeviews([item])
+        settle()
+
+    record(f"refresh_treeviews_one_{mode}", refresh_one)
+
+    export_path = os.path.join(work_dir, f"导出_{size}.xlsx")
+    record("export_budget", lambda: export_budget(budget_data.rows(nonzero=True), export_path))
+
+    def edit_one():  # 修改一项工程量，清单缓存失效
+        budget_data.update(first_id, quantity=budget_data.get(first_id)["quantity"] + 1)
+
+    results[f"work_list[{size}]"] = measure(budget_data.work_list, repeat, setup=edit_one)
+
+    templates = synthetic.application_template(work_dir), synthetic.review_template(work_dir)
+    for suffix, forms in (("", doc_forms), ("_ooxml", ooxml_fill)):
+        application, review = fill_documents(*templates, budget_data, [], forms)
+        record(f"fill_application_form{suffix}", application)
+        record(f"fill_review_form{suffix}", review)
+        if image_prep.Image is None: continue
+        application_images, _ = fill_documents(*templates, budget_data, synthetic.photos(work_dir), forms)
+        record(f"fill_application_form_images{suffix}", application_images)
+    return results
+
+
+def run(sizes, work_dir, repeat):
+    os.makedirs(work_dir, exist_ok=True)
+    results = {}
+    if image_prep.Image is None:
+        print("⚠️ 未安装Pillow，跳过照片相关项目（process_image、fill_application_form_images）", flush=True)
+    else:
+        with open(synthetic.photos(work_dir)[0], "rb") as f:
+            data = f.read()
+        results["process_image"] = measure(lambda: image_prep.process_image(data), repeat)
+    for size in sizes:
+        print(f"规模{size}行……", flush=True)
+        results.update(run_size(size, work_dir, repeat))
+    return {
+        "meta": {"created": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                 "platform": platform.platform(), "sizes": list(sizes), "repeat": repeat},
+        "results": results,
+    }
+
+
+# ===================== 比较 =====================
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """返回[(项目名称, 基准耗时, 当前耗时, 比值, 是否退步)]（只比较两边都有的项目）"""
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None: continue
+        old, new = base["seconds"], result["seconds"]
+        ratio = new / old if old else float("inf")
+        rows.append((name, old, new, ratio, new > old * (1 + threshold) and new - old > NOISE_FLOOR))
+    return rows
+
+
+def format_results(report):
+    return "\n".join(f"{name:<42}{result['seconds'] * 1000:>10.1f} ms" for name, result in report["results"].items())
+
+
+def format_comparison(rows):
+    lines = [f"{'项目':<40}{'基准':>10}{'当前':>10}{'比值':>8}"]
+    for name, old, new, ratio, regressed in rows:
+        lines.append(f"{name:<42}{old * 1000:>9.1f}ms{new * 1000:>9.1f}ms{ratio:>8.2f}" + ("  ❌ 退步" if regressed else ""))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="家集客预算工具性能基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help=f"预算表行数（默认：{' '.join(map(str, DEFAULT_SIZES))}）")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"每项重复次数（默认：{DEFAULT_REPEAT}）")
+    parser.add_argument("--out", default="benchmark_results.json", help="结果文件（默认：benchmark_results.json）")
+    parser.add_argument("--compare", metavar="BASELINE", help="与基准结果（之前保存的结果文件）比较")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"耗时超过基准多少比例记为退步（默认：{DEFAULT_THRESHOLD}）")
+    parser.add_argument("--work-dir", default=WORK_DIR, help=f"合成数据目录（默认：{WORK_DIR}）")
+    parser.add_argument("--clean", action="store_true", help="重新生成合成数据")
+    args = parser.parse_args(argv)
+
+    if args.clean:
+        shutil.rmtree(args.work_dir, ignore_errors=True)
+    report = run(args.sizes, args.work_dir, args.repeat)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(format_results(report))
+    print(f"结果已保存：{os.path.abspath(args.out)}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        print(format_comparison(rows))
+        regressed = [row[0] for row in rows if row[4]]
+        if regressed:
+            print(f"❌ {len(regressed)}项退步：{', '.join(regressed)}")
+            return 1
+        print("✅ 无退步")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""基准测试用的合成数据：家集客预算表（Sheet1施工项目、Sheet2材料项目）、申请表/会审单模板、现场照片
+
+生成结果按参数缓存在工作目录中，重复运行时直接复用。
+"""
+import os
+import random
+
+from openpyxl import Workbook
+from docx import Document
+
+from budget_core import SHEET1_COLS, SHEET2_COLS
+
+WORDS = ["光缆", "敷设", "管道", "架空", "直埋", "室内", "室外", "布放", "皮线", "终端盒", "分纤箱", "安装",
+         "调测", "ONU", "交换机", "网线", "六类", "PVC管", "钢绞线", "拉线", "电杆", "熔接", "尾纤", "跳纤",
+         "机柜", "光交箱", "入户", "楼道", "桥架", "开挖", "回填", "顶管", "人井", "手孔", "12芯", "24芯",
+         "48芯", "蝶形", "自承式", "吊线"]
+MATERIAL_SHARE = 0.2  # 材料项目占比
+LENGTH_SHARE = 0.1  # 施工项目中按公里计价（名称含“元/公里”）的占比
+
+
+def _names(rng, count, suffix=""):
+    return [f"{''.join(rng.sample(WORDS, rng.randint(2, 4)))}{suffix}（{i}）" for i in range(1, count + 1)]
+
+
+def price_book(work_dir, rows, seed=0):
+    """合成预算表（共rows行），返回文件路径"""
+    path = os.path.join(work_dir, f"预算表_{rows}.xlsx")
+    if os.path.exists(path): return path
+    rng = random.Random(seed)
+    materials = int(rows * MATERIAL_SHARE)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    ws.append(["序号"] + SHEET1_COLS + ["备注"])
+    for idx, name in enumerate(_names(rng, rows - materials), 1):
+        if rng.random() < LENGTH_SHARE:
+            name = f"{name}元/公里"
+        ws.append([idx, name, round(rng.uniform(1, 5000), 2), ""])
+    ws = wb.create_sheet("Sheet2")
+    ws.append(["序号"] + SHEET2_COLS)
+    for idx, name in enumerate(_names(rng, materials), 1):
+        ws.append([idx, name, round(rng.uniform(0.5, 800), 2)])
+    wb.save(path)
+    return path
+
+
+def _table_template(path, n_rows, n_cols, labels):
+    doc = Document()
+    table = doc.add_table(rows=n_rows, cols=n_cols)
+    table.style = "Table Grid"
+    for (row, col), text in labels.items():
+        table.cell(row, col).text = text
+    doc.save(path)
+
+
+def application_template(work_dir):
+    """申请表模板：固定位置的基础信息单元格，以及项目名称、工作量清单、支撑文件关键词"""
+    path = os.path.join(work_dir, "申请表模板.docx")
+    if not os.path.exists(path):
+        _table_template(path, 6, 7, {
+            (0, 0): "申请单位", (0, 2): "申请日期", (0, 5): "联系人",
+            (1, 0): "维修项目名称", (1, 5): "联系电话",
+            (2, 0): "实施周期", (2, 2): "预算金额",
+            (3, 0): "工作量及材料清单", (4, 0): "其他需求支撑文件", (5, 0): "审批意见",
+        })
+    return path
+
+
+def review_template(work_dir):
+    """会审单模板：固定位置的基础信息单元格，以及项目名称、主要工作量及材料清单、施工方实施计划关键词"""
+    path = os.path.join(work_dir, "会审单模板.docx")
+    if not os.path.exists(path):
+        _table_template(path, 6, 10, {
+            (0, 0): "维修项目名称", (1, 0): "预算金额", (1, 4): "日期", (1, 8): "周期",
+            (2, 0): "项目负责人", (2, 4): "联系电话", (3, 0): "实施单位", (3, 4): "项目经理", (3, 8): "电话",
+            (4, 0): "主要工作量及材料清单", (5, 0): "施工方实施计划",
+        })
+    return path
+
+
+def photos(work_dir, count=4, size=(4000, 3000), seed=0):
+    """合成现场照片（噪点图，压缩后体积与手机照片相近），返回路径列表；需要Pillow"""
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError("合成照片需要Pillow（pip install Pillow）") from None
+    folder = os.path.join(work_dir, "照片")
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for idx in range(count):
+        path = os.path.join(folder, f"现场{idx + 1}.jpg")
+        if not os.path.exists(path):
+            Image.effect_noise(size, 40 + seed + idx).convert("RGB").save(path, quality=92)
+        paths.append(path)
+    return paths
@@ -0,0 +1,162 @@
+"""预算数据公共逻辑（不依赖Tk，供图形界面与命令行批量生成共用）"""
+import os
+import json
+from decimal import Decimal, ROUND_HALF_UP
+
+# ===================== 配置与常量 =====================
+CONFIG_FILE = "config.json"
+BUDGET_DATA_FILE = "budget_data.json"
+MAX_IMAGES = 12  # 申请表最多插入的图片数量
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+SHEET1_COLS = ["类别", "折扣后（含税）37%/元"]  # 施工项目：名称、单价
+SHEET2_COLS = ["材料", "含税"]  # 材料项目：名称、单价
+
+DEFAULT_BASE_INFO = {
+    "申请单位": "奇台县分公司", "申请人": "樊斌", "联系电话": "13909949883",
+    "实施单位": "中移建设", "项目经理": "吴斌", "项目经理联系电话": "18899661100",
+    "项目负责人": "樊斌"
+}
+
+
+# ===================== 基础信息 / 预算数据读取 =====================
+def read_config(path=CONFIG_FILE):
+    """读取基础信息配置，缺失的字段用默认值补齐"""
+    base_info = dict(DEFAULT_BASE_INFO)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            base_info.update(json.load(f))
+    return base_info
+
+
+def read_budget_file(path=BUDGET_DATA_FILE):
+    """读取本地预算数据（工程量、合计清零，项目ID保持不变）"""
+    with open(path, "r", encoding="utf-8") as f:
+        budget_data = json.load(f)
+    for item in budget_data:
+        item["quantity"] = 0.0
+        item["total"] = 0.0
+    return budget_data
+
+
+# ===================== 预算表（Excel）解析 =====================
+def _parse_price_columns(df, name_col, price_col):
+    """按列批量解析名称、单价（跳过空名称，单价非数字按0处理）"""
+    import pandas as pd  # 导入较慢，只在解析预算表时导入（界面启动不需要）
+    raw_names = df[name_col]
+    names = raw_names.astype(str).str.strip()
+    valid = raw_names.notna() & (names != "") & (names != "nan")
+    names = names[valid]
+    prices = pd.to_numeric(df.loc[valid, price_col], errors="coerce").fillna(0.0).astype(float)
+    return names, prices
+
+
+def _check_columns(df, required_cols, sheet_label):
+    df.columns = df.columns.astype(str).str.strip()
+    missing_cols = [col for col in required_cols if col not in df.columns]
+    if missing_cols: raise ValueError(f"{sheet_label}缺少必要列：{', '.join(missing_cols)}")
+
+
+def parse_sheet1(df):
+    _check_columns(df, SHEET1_COLS, "Sheet1")
+    names, prices = _parse_price_columns(df, *SHEET1_COLS)
+    is_length = names.str.contains("元/公里", regex=False)
+    parsed = [
+        {"id": idx, "category": "施工项目", "name": name,
+         "unit": "公里" if length else "个/户/处等",
+         "unit_price": price, "quantity": 0.0, "total": 0.0, "is_length": length}
+        for idx, (name, price, length) in enumerate(zip(names.tolist(), prices.tolist(), is_length.tolist()), 1)
+    ]
+    if not parsed: raise ValueError("Sheet1无有效数据")
+    return parsed
+
+
+def parse_sheet2(df):
+    _check_columns(df, SHEET2_COLS, "Sheet2")
+    names, prices = _parse_price_columns(df, *SHEET2_COLS)
+    parsed = [
+        {"id": idx, "category": "材料项目", "name": name,
+         "unit": "个", "unit_price": price, "quantity": 0.0, "total": 0.0, "is_length": False}
+        for idx, (name, price) in enumerate(zip(names.tolist(), prices.tolist()), 1)
+    ]
+    if not parsed: raise ValueError("Sheet2无有效数据")
+    return parsed
+
+
+def _read_sheet(path, sheet_name, required_cols):
+    """只读取需要的列（列名去除首尾空格后匹配）"""
+    import pandas as pd
+    return pd.read_excel(path, sheet_name=sheet_name, usecols=lambda col: str(col).strip() in required_cols)
+
+
+def read_price_book(path):
+    """解析家集客预算表：Sheet1为施工项目，Sheet2为材料项目，返回重新编号后的预算数据"""
+    sheet1 = _read_sheet(path, 0, SHEET1_COLS)
+    if sheet1.empty and len(sheet1.columns) == len(SHEET1_COLS): raise ValueError("Sheet1为空")
+    sheet1_data = parse_sheet1(sheet1)
+
+    sheet2 = _read_sheet(path, 1, SHEET2_COLS)
+    if sheet2.empty and len(sheet2.columns) == len(SHEET2_COLS): raise ValueError("Sheet2为空")
+    sheet2_data = parse_sheet2(sheet2)
+
+    budget_data = sheet1_data + sheet2_data
+    for idx, item in enumerate(budget_data):
+        item["id"] = idx + 1
+    return budget_data
+
+
+def carry_over_ids(new_items, old_items):
+    """重新导入预算表时沿用同类别同名项目的原ID，新增项目从原最大ID之后编号，
+    使已保存项目的工程量仍对应到正确的项目"""
+    old_ids = {}
+    for item in old_items:
+        old_ids.setdefault((item["category"], item["name"]), item["id"])
+    next_id = max(old_ids.values(), default=0) + 1
+    used = set()
+    for item in new_items:
+        item_id = old_ids.get((item["category"], item["name"]))
+        if item_id is None or item_id in used:
+            item_id = next_id
+            next_id += 1
+        item["id"] = item_id
+        used.add(item_id)
+    return new_items
+
+
+# ===================== 金额 / 清单计算 =====================
+def to_fen(quantity, unit_price):
+    """金额（分，整数）：工程量×单价按十进制精确计算后四舍五入到分，各处金额都由此得出，避免浮点误差累积"""
+    amount = Decimal(str(float(quantity))) * Decimal(str(float(unit_price))) * 100
+    return int(amount.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def calc_total_amount(budget_data):
+    """计算总金额（按分累加），同时回写每项的合计"""
+    total_fen = 0
+    for item in budget_data:
+        fen = to_fen(item["quantity"], item["unit_price"])
+        item["total"] = fen / 100
+        total_fen += fen
+    return total_fen / 100
+
+
+def work_item_text(item):
+    """工作量清单中一个项目的文本"""
+    quantity = float(item["quantity"])
+    if item["is_length"]:
+        return f"{quantity:.2f}公里 {item['name']}"
+    return f"{quantity:.2f}{item['unit']} {item['name']}"
+
+
+def generate_work_list(budget_data):
+    """拼接工作量及材料清单文本（工程量为0的项目不导出）"""
+    work_list = [work_item_text(item) for item in budget_data if item["quantity"] > 0]
+    return "，".join(work_list) if work_list else "无有效项目"
+
+
+def list_image_files(folder, limit=MAX_IMAGES):
+    """列出目录下的图片文件（按文件名排序，最多limit张）"""
+    if not folder or not os.path.isdir(folder):
+        return []
+    names = sorted(n for n in os.listdir(folder) if n.lower().endswith(IMAGE_EXTENSIONS))
+    return [os.path.join(folder, n) for n in names[:limit]]
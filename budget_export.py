@@ -0,0 +1,83 @@
+"""预算清单导出：openpyxl只写模式，一次遍历逐行写入，内存占用不随行数增长
+
+施工项目、材料项目分别写入各自的工作表，每张表末尾有小计行；“汇总”表列出各类别项目数与合计。
+金额、工程量写为数值并设置数字格式。target可以是文件路径，也可以是可写的文件对象（如批量打包时的ZIP条目）。
+"""
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+EXPORT_COLUMNS = ["序号", "项目名称", "单位", "单价（元）", "工程量", "合计（元）"]
+COLUMN_WIDTHS = [8, 50, 12, 14, 12, 16]
+CATEGORY_SHEETS = ["施工项目", "材料项目"]  # 固定顺序的工作表，其他类别按出现顺序追加
+SUMMARY_SHEET = "汇总"
+MONEY_FORMAT = "#,##0.00"
+QUANTITY_FORMAT = "0.00"
+BOLD = Font(bold=True)
+
+
+def styled_cell(ws, value, number_format=None, bold=False):
+    """只写模式的单元格（数字格式、粗体）；rollup.py的汇总表也使用"""
+    cell = WriteOnlyCell(ws, value=value)
+    if number_format: cell.number_format = number_format
+    if bold: cell.font = BOLD
+    return cell
+
+
+def new_sheet(wb, title, columns, widths):
+    """新建工作表：设置列宽并写入粗体表头"""
+    ws = wb.create_sheet(title)
+    for idx, width in enumerate(widths):
+        ws.column_dimensions[get_column_letter(idx + 1)].width = width  # 只写模式下需在写入数据前设置列宽
+    ws.append([styled_cell(ws, name, bold=True) for name in columns])
+    return ws
+
+
+class _CategorySheet:
+    def __init__(self, wb, category):
+        self.category = category
+        self.ws = new_sheet(wb, category, EXPORT_COLUMNS, COLUMN_WIDTHS)
+        self.count = 0
+        self.subtotal_fen = 0  # 按分累加，与Word中的金额一致
+
+    def append(self, item):
+        ws = self.ws
+        self.count += 1
+        fen = round(float(item["total"]) * 100)  # 合计已按分取整（budget_core.to_fen）
+        self.subtotal_fen += fen
+        ws.append([self.count, item["name"], item["unit"],
+                   styled_cell(ws, float(item["unit_price"]), MONEY_FORMAT),
+                   styled_cell(ws, float(item["quantity"]), QUANTITY_FORMAT),
+                   styled_cell(ws, fen / 100, MONEY_FORMAT)])
+
+    def close(self):
+        ws = self.ws
+        ws.append([None, styled_cell(ws, "小计", bold=True), None, None, None,
+                   styled_cell(ws, self.subtotal_fen / 100, MONEY_FORMAT, bold=True)])
+
+
+def export_budget(items, target, write_only=True):
+    """导出工程量大于0的项目（items只遍历一次，可以是生成器），返回导出的项目数
+    write_only=False时在内存中生成（openpyxl只写模式会把工作表暂存为临时文件），适合行数不多的站点清单"""
+    wb = Workbook(write_only=write_only)
+    if not write_only: wb.remove(wb.active)
+    summary = new_sheet(wb, SUMMARY_SHEET, ["类别", "项目数", "合计（元）"], [14, 10, 16])
+    sheets = {category: _CategorySheet(wb, category) for category in CATEGORY_SHEETS}
+    for item in items:
+        if item["quantity"] <= 0: continue
+        sheet = sheets.get(item["category"])
+        if sheet is None:
+            sheet = sheets[item["category"]] = _CategorySheet(wb, item["category"])
+        sheet.append(item)
+
+    count, amount_fen = 0, 0
+    for sheet in sheets.values():
+        sheet.close()
+        count += sheet.count
+        amount_fen += sheet.subtotal_fen
+        summary.append([sheet.category, sheet.count, styled_cell(summary, sheet.subtotal_fen / 100, MONEY_FORMAT)])
+    summary.append([styled_cell(summary, "总计", bold=True), styled_cell(summary, count, bold=True),
+                    styled_cell(summary, amount_fen / 100, MONEY_FORMAT, bold=True)])
+    wb.save(target)
+    return count
@@ -0,0 +1,397 @@
+"""预算项目存储：列式预算表，按项目ID建立哈希索引，支持O(1)查找、修改、删除
+
+每列是一个定长类型的numpy数组（ID、单价、工程量、合计（分）、是否长度类），类别、名称、单位
+保存为字符串池的下标（相同字符串只保存一份），代替原来每个项目一个8键字典的列表；
+筛选（如工程量>0）和读取工程量等按整列向量化计算。
+遍历、get()、add()、update() 返回 BudgetRow：只读的行视图，可像字典一样按键读取、dict(row)复制，
+修改必须通过 BudgetTable.update()。
+
+项目ID在新增时分配，删除其他项目后保持不变（不再重新编号）；
+表格和导出中的“序号”是按显示位置计算的序号，与ID相互独立。
+删除只做标记，已删除的行过多时整理压缩（行顺序即显示顺序，不变）。
+price_version 在预算表本身（新增、删除、修改名称/单价等）变化时递增，只改工程量时不变，
+保存时可据此判断是否需要重写预算表。
+
+汇总数据随每次新增、修改、删除增量更新（O(1)）：总金额与各类别小计按分（整数）累加，
+工程量不为0的项目数，以及各项目在工作量清单中的文本片段（行号按显示顺序二分插入，修改一项只更新一个片段）。
+名称搜索索引（name_search.NameIndex）在首次使用时建立，或用start_name_index()在后台线程建立
+（建立完成前搜索逐个比对名称），之后随新增、改名、删除增量更新。
+"""
+import bisect
+import threading
+from collections.abc import Mapping
+
+import numpy as np
+
+from budget_core import to_fen, work_item_text
+from name_search import NameIndex, scan
+
+FIELDS = ("id", "category", "name", "unit", "unit_price", "quantity", "total", "is_length")
+PRICE_FIELDS = ("category", "name", "unit", "unit_price", "is_length")
+STRING_FIELDS = ("category", "name", "unit")
+COLUMNS = {"id": np.int64, "category": np.int32, "name": np.int32, "unit": np.int32,
+           "unit_price": np.float64, "quantity": np.float64, "fen": np.int64,
+           "is_length": np.bool_, "alive": np.bool_}
+MIN_CAPACITY = 64
+COMPACT_MIN_DEAD = 64  # 已删除行超过此数且超过一半时整理
+
+
+SNAPSHOT_COLUMNS = ("id", "category", "name", "unit", "unit_price", "quantity", "fen", "is_length")  # 与FIELDS对应
+
+
+def snapshot_records(snapshot):
+    """把BudgetTable.snapshot()的结果转换为字典列表：每列一次tolist()，不逐项读取行视图（可在后台线程调用）"""
+    cols, strings = snapshot
+    columns = [cols[key].tolist() for key in SNAPSHOT_COLUMNS]
+    for idx in (1, 2, 3):  # 类别、名称、单位为字符串池下标
+        columns[idx] = [strings[code] for code in columns[idx]]
+    columns[6] = (cols["fen"] / 100).tolist()
+    return [dict(zip(FIELDS, values)) for values in zip(*columns)]
+
+
+class BudgetRow(Mapping):
+    """只读的行视图：按项目ID读取表中的当前值，项目删除后再读取会抛出KeyError"""
+    __slots__ = ("_table", "_id")
+
+    def __init__(self, table, item_id):
+        self._table = table
+        self._id = item_id
+
+    def __getitem__(self, key):
+        return self._table._value(self._id, key)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __repr__(self):
+        return f"BudgetRow({dict(self)!r})"
+
+
+class BudgetTable:
+    def __init__(self, items=()):
+        self._cols = {key: np.zeros(MIN_CAPACITY, dtype) for key, dtype in COLUMNS.items()}
+        self._n = 0  # 已使用的行数（含已删除的行）
+        self._dead = 0
+        self._row = {}  # 项目ID -> 行号
+        self._strings = []  # 字符串池
+        self._codes = {}  # 字符串 -> 字符串池下标
+        self._next_id = 1
+        self.price_version = 0
+
+        self._fragments = {}  # 工程量不为0的项目ID -> 工作量清单文本
+        self._fragment_rows = []  # 这些项目的行号（升序，即显示顺序；二分插入删除，拼接清单时不必排序）
+        self._work_list = None  # 拼接好的工作量清单（片段变化时失效）
+        self.total_fen = 0
+        self.category_fen = {}  # 类别 -> 小计（分）
+        self._name_index = None  # 名称搜索索引（首次搜索时建立）
+        self._name_version = 0  # 新增、改名、删除时加1（判断后台建立的索引是否已过时）
+        self._name_builder = None  # 后台建立中的索引：(线程, 结果, 开始时的_name_version)
+        self._append(items)
+
+    def __iter__(self):
+        return iter(self._views(np.flatnonzero(self._cols["alive"][:self._n])))
+
+    def __len__(self):
+        return len(self._row)
+
+    def __contains__(self, item_id):
+        return item_id in self._row
+
+    def get(self, item_id):
+        return BudgetRow(self, item_id) if item_id in self._row else None
+
+    def add(self, item):
+        """新增项目：保留有效且未被占用的ID，否则分配新ID；返回行视图"""
+        return self._views(self._append([item]))[0]
+
+    def insert(self, item, before=None):
+        """在项目before之前插入项目（before为None或不存在时追加到末尾），用于撤销删除：
+        保留项目原ID，插入位置之后的行整体后移一行；返回行视图"""
+        row = self._append([item])[0].item()
+        item_id = self._cols["id"].item(row)
+        if before in self._row:
+            self._move(row, self._row[before])
+        return BudgetRow(self, item_id)
+
+    def next_id(self, item_id):
+        """显示顺序中紧随item_id的项目ID（最后一项返回None）"""
+        row = self._row[item_id]
+        after = np.flatnonzero(self._cols["alive"][row + 1:self._n])
+        return self._cols["id"].item(row + 1 + after[0]) if len(after) else None
+
+    def update(self, item_id, **fields):
+        """修改项目字段，工程量或单价变化时同步更新合计与汇总；返回行视图"""
+        row = self._row[item_id]
+        self._unaccount(row)
+        for key, value in fields.items():
+            if key == "total": continue  # 合计由工程量×单价得出
+            self._set(row, key, value)
+        if any(key in fields for key in PRICE_FIELDS):
+            self.price_version += 1
+        if "name" in fields:
+            self._name_version += 1
+            if self._name_index is not None:
+                self._name_index.rename(item_id, fields["name"])
+        self._account(row)
+        return BudgetRow(self, item_id)
+
+    def delete(self, item_id):
+        """删除项目，其余项目的ID保持不变；返回被删除项目的字典副本"""
+        row = self._row[item_id]
+        item = self._row_dict(row)
+        self.price_version += 1
+        self._unaccount(row)
+        del self._row[item_id]
+        self._cols["alive"][row] = False
+        self._name_version += 1
+        if self._name_index is not None:
+            self._name_index.remove(item_id)
+        self._dead += 1
+        if self._dead > COMPACT_MIN_DEAD and self._dead * 2 > self._n:
+            self._compact()
+        return item
+
+    def to_list(self):
+        """按显示顺序导出为字典列表（用于保存JSON）"""
+        return snapshot_records(self.snapshot())
+
+    def snapshot(self):
+        """按显示顺序复制各列（整列复制，5万行也只需几毫秒），在后台线程用snapshot_records()转换为字典列表"""
+        live = np.flatnonzero(self._cols["alive"][:self._n])
+        return {key: self._cols[key][live] for key in SNAPSHOT_COLUMNS}, list(self._strings)
+
+    # ===================== 向量化筛选 =====================
+    def _mask(self, category=None, nonzero=False):
+        n = self._n
+        mask = self._cols["alive"][:n].copy()
+        if category is not None:
+            code = self._codes.get(category)
+            if code is None: return np.zeros(n, np.bool_)
+            mask &= self._cols["category"][:n] == code
+        if nonzero:
+            mask &= self._cols["quantity"][:n] > 0
+        return mask
+
+    def rows(self, category=None, nonzero=False):
+        """按显示顺序返回符合条件的行视图：category为类别，nonzero为只要工程量大于0的项目"""
+        return self._views(np.flatnonzero(self._mask(category, nonzero)))
+
+    def names(self):
+        """按显示顺序返回(项目ID列表, 名称列表)"""
+        live = np.flatnonzero(self._cols["alive"][:self._n])
+        strings = self._strings
+        return self._cols["id"][live].tolist(), [strings[code] for code in self._cols["name"][live].tolist()]
+
+    def quantities(self):
+        """工程量大于0的项目：{项目ID: 工程量}"""
+        mask = self._mask(nonzero=True)
+        n = self._n
+        return dict(zip(self._cols["id"][:n][mask].tolist(), self._cols["quantity"][:n][mask].tolist()))
+
+    def set_quantities(self, quantities):
+        """按{项目ID: 工程量}整体设置工程量（未列出的项目为0），只更新有变化的行；返回这些行的视图"""
+        live = np.flatnonzero(self._cols["alive"][:self._n])
+        ids = self._cols["id"][live].tolist()
+        new = np.fromiter((quantities.get(item_id, 0.0) for item_id in ids), np.float64, len(ids))
+        diff = new != self._cols["quantity"][live]
+        changed = live[diff]
+        for row, quantity in zip(changed.tolist(), new[diff].tolist()):
+            self._unaccount(row)
+            self._cols["quantity"][row] = quantity
+            self._account(row)
+        return self._views(changed)
+
+    # ===================== 名称搜索 =====================
+    def name_index(self):
+        """名称搜索索引，首次调用时建立"""
+        if self._name_index is None:
+            index = NameIndex()
+            for item_id, name in zip(*self.names()):
+                index.add(item_id, name)
+            self._name_index = index
+        return self._name_index
+
+    def start_name_index(self):
+        """在后台线程建立名称搜索索引，之后在主线程定时调用poll_name_index()装入"""
+        if self._name_index is not None or self._name_builder is not None: return
+        names = list(zip(*self.names()))  # 在主线程取名称，后台线程不读取表
+        result = []
+        thread = threading.Thread(target=lambda: result.append(NameIndex({"id": i, "name": n} for i, n in names)),
+                                  name="NameIndex", daemon=True)
+        self._name_builder = (thread, result, self._name_version)
+        thread.start()
+
+    def poll_name_index(self):
+        """（主线程）后台建立完成时装入索引；建立期间名称有变化则重新建立。返回是否已无需再检查"""
+        if self._name_builder is None: return True
+        thread, result, version = self._name_builder
+        if thread.is_alive(): return False
+        self._name_builder = None
+        if not result: return True  # 建立失败，首次搜索时再建立
+        if version != self._name_version:
+            self.start_name_index()
+            return False
+        self._name_index = result[0]
+        return True
+
+    def search(self, query):
+        """按名称搜索，返回按匹配程度排序的项目ID（同一档内按显示顺序）；查询为空时返回None
+        索引正在后台建立时逐个比对名称，不等待"""
+        if self._name_index is None and self._name_builder is not None:
+            return scan(zip(*self.names()), query, self._row)
+        return self.name_index().search(query, self._row)
+
+    # ===================== 行存取 =====================
+    def _value(self, item_id, key):
+        row = self._row[item_id]
+        if key in STRING_FIELDS:
+            return self._strings[self._cols[key][row]]
+        if key == "total":
+            return self._cols["fen"].item(row) / 100
+        if key not in FIELDS:
+            raise KeyError(key)
+        return self._cols[key].item(row)
+
+    def _row_dict(self, row):
+        item_id = self._cols["id"].item(row)
+        return {key: self._value(item_id, key) for key in FIELDS}
+
+    def _views(self, rows):
+        return [BudgetRow(self, item_id) for item_id in self._cols["id"][rows].tolist()]
+
+    def _intern(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._strings)
+            self._strings.append(value)
+        return code
+
+    def _set(self, row, key, value):
+        if key in STRING_FIELDS:
+            self._cols[key][row] = self._intern(value)
+        elif key in ("unit_price", "quantity"):
+            self._cols[key][row] = float(value)
+        elif key == "is_length":
+            self._cols[key][row] = bool(value)
+        else:
+            raise KeyError(key)
+
+    def _append(self, items):
+        """追加项目（整列批量写入），返回新行的行号"""
+        start = self._n
+        columns = {key: [] for key in ("id",) + PRICE_FIELDS + ("quantity",)}
+        for item in items:
+            item_id = item.get("id")
+            if not isinstance(item_id, int) or item_id <= 0 or item_id in self._row:
+                item_id = self._next_id
+            self._row[item_id] = start + len(columns["id"])
+            self._next_id = max(self._next_id, item_id + 1)
+            columns["id"].append(item_id)
+            for key in STRING_FIELDS:
+                columns[key].append(self._intern(item[key]))
+            columns["unit_price"].append(float(item["unit_price"]))
+            columns["is_length"].append(bool(item["is_length"]))
+            columns["quantity"].append(float(item.get("quantity", 0.0)))
+        if not columns["id"]:
+            return np.arange(start, start)
+
+        self._reserve(start + len(columns["id"]))
+        self._n = end = start + len(columns["id"])
+        for key, values in columns.items():
+            self._cols[key][start:end] = values
+        self._cols["fen"][start:end] = 0
+        self._cols["alive"][start:end] = True
+        for code in np.unique(self._cols["category"][start:end]).tolist():
+            self.category_fen.setdefault(self._strings[code], 0)
+        for row in (start + np.flatnonzero(self._cols["quantity"][start:end])).tolist():
+            self._account_quantity(row)
+        self._name_version += 1
+        if self._name_index is not None:
+            for item_id in columns["id"]:
+                self._name_index.add(item_id, self._value(item_id, "name"))
+        self.price_version += 1
+        return np.arange(start, end)
+
+    def _reserve(self, size):
+        capacity = len(self._cols["id"])
+        if size <= capacity: return
+        capacity = max(size, capacity * 2)
+        for key, col in self._cols.items():
+            grown = np.zeros(capacity, col.dtype)
+            grown[:self._n] = col[:self._n]
+            self._cols[key] = grown
+
+    def _move(self, src, dst):
+        """把第src行移到第dst行（dst < src），其间的行后移一行，更新ID索引"""
+        for col in self._cols.values():
+            col[dst:src + 1] = np.roll(col[dst:src + 1], 1)
+        ids = self._cols["id"][dst:src + 1]
+        alive = self._cols["alive"][dst:src + 1]
+        self._row.update(zip(ids[alive].tolist(), (dst + np.flatnonzero(alive)).tolist()))
+        self._reindex_fragments()
+
+    def _compact(self):
+        """去掉已删除的行（保持顺序），重建ID索引"""
+        keep = np.flatnonzero(self._cols["alive"][:self._n])
+        for col in self._cols.values():
+            col[:len(keep)] = col[keep]
+        self._n = len(keep)
+        self._dead = 0
+        self._cols["alive"][self._n:] = False
+        self._row = dict(zip(self._cols["id"][:self._n].tolist(), range(self._n)))
+        self._reindex_fragments()
+
+    def _reindex_fragments(self):
+        """行号整体变化（整理、移动行）后重新排列清单片段的行号"""
+        self._fragment_rows = sorted(self._row[item_id] for item_id in self._fragments)
+        self._work_list = None
+
+    # ===================== 汇总 =====================
+    def _account(self, row):
+        self.category_fen.setdefault(self._strings[self._cols["category"][row]], 0)
+        self._account_quantity(row)
+
+    def _account_quantity(self, row):
+        """计入工程量不为0的行（工程量为0时合计为0，不影响汇总）"""
+        cols = self._cols
+        quantity = cols["quantity"].item(row)
+        if not quantity: return
+        fen = to_fen(quantity, cols["unit_price"].item(row))
+        cols["fen"][row] = fen
+        self.total_fen += fen
+        self.category_fen[self._strings[cols["category"][row]]] += fen
+        if quantity > 0:
+            item_id = cols["id"].item(row)
+            if item_id not in self._fragments:
+                bisect.insort(self._fragment_rows, row)
+            self._fragments[item_id] = work_item_text(BudgetRow(self, item_id))
+            self._work_list = None
+
+    def _unaccount(self, row):
+        cols = self._cols
+        fen = cols["fen"].item(row)
+        cols["fen"][row] = 0
+        self.total_fen -= fen
+        self.category_fen[self._strings[cols["category"][row]]] -= fen
+        if self._fragments.pop(cols["id"].item(row), None) is not None:
+            del self._fragment_rows[bisect.bisect_left(self._fragment_rows, row)]
+            self._work_list = None
+
+    @property
+    def total_amount(self):
+        return self.total_fen / 100
+
+    @property
+    def nonzero_count(self):
+        """工程量不为0（大于0）的项目数"""
+        return len(self._fragments)
+
+    def work_list(self):
+        """工作量及材料清单文本（与 budget_core.generate_work_list 结果相同），未变化时直接返回上次结果"""
+        if self._work_list is None:
+            ids = self._cols["id"][self._fragment_rows].tolist()
+            self._work_list = "，".join(map(self._fragments.__getitem__, ids)) if ids else "无有效项目"
+        return self._work_list
@@ -0,0 +1,237 @@
+"""申请表 / 会审单 Word模板填充（不依赖Tk，界面与批量生成输出一致）
+
+模板首次使用时编译一次：解析文档并定位所有填写位置（固定坐标和按关键字查找的单元格），
+按模板路径缓存，文件大小/修改时间变化时再按内容哈希确认；之后每次填充只复制已解析的文档，
+不再重新解析模板，也不再扫描表格。
+各单元格填写的内容由 application_fills / review_fills 给出，python-docx填充与ooxml_fill（直接修改XML）共用。
+"""
+import io
+import os
+import copy
+import hashlib
+import threading
+from docx import Document
+from docx.shared import Pt
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+
+import image_prep
+from image_prep import MAX_IMG_WIDTH, MAX_IMG_HEIGHT
+
+
+# ===================== 表格辅助函数 =====================
+def insert_images_to_cell(cell, image_paths, dpi=image_prep.DEFAULT_DPI):
+    """插入图片（嵌入按打印尺寸预处理后的数据）"""
+    if not image_paths: return
+    cell.text = ""
+    for img_path in image_paths:
+        try:
+            para = cell.add_paragraph()
+            run = para.add_run()
+            run.add_picture(io.BytesIO(image_prep.prepare_image(img_path, dpi)),
+                            width=MAX_IMG_WIDTH, height=MAX_IMG_HEIGHT)
+            para.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+        except:
+            pass
+
+
+def _fill_cells(cells, fills):
+    """按填写内容逐个设置单元格文字、对齐方式和字号；可跳过的项目出错时忽略"""
+    for pos, text, alignment, size, optional in fills:
+        try:
+            cell = cells[pos]
+            cell.text = text
+            for p in cell.paragraphs:
+                if alignment is not None: p.alignment = alignment
+                if size is None: continue
+                for r in p.runs: r.font.size = size
+        except:
+            if not optional: raise
+
+
+def _locate_keywords(table, keyword_groups):
+    """一次遍历表格，返回每组关键字第一次出现的(行, 列)，未找到为None
+
+    按行、再按列逐个单元格查找，单元格文本（去掉首尾空白）包含组内任一关键字即为找到；
+    合并单元格的文本只读取一次。
+    """
+    found = dict.fromkeys(keyword_groups)
+    texts = {}
+    for row_idx, row in enumerate(table.rows):
+        for col_idx, cell in enumerate(row.cells):
+            text = texts.get(cell._tc)
+            if text is None:
+                text = texts[cell._tc] = cell.text.strip()
+            for key, keywords in keyword_groups.items():
+                if found[key] is None and any(keyword in text for keyword in keywords):
+                    found[key] = (row_idx, col_idx)
+            if all(pos is not None for pos in found.values()):
+                return found
+    return found
+
+
+# ===================== 模板编译与缓存 =====================
+class CompiledTemplate:
+    """已解析的模板文档 + 各填写位置的(行, 列)坐标（固定坐标超出表格时为None）"""
+
+    def __init__(self, document, digest, stat_key, slots):
+        self.document = document
+        self.digest = digest
+        self.stat_key = stat_key
+        self.slots = slots
+
+    def new_document(self):
+        """复制一份已解析的模板文档，返回(文档, {(行, 列): 单元格})"""
+        doc = copy.deepcopy(self.document)
+        return doc, slot_cells(doc.tables[0], self.slots)
+
+
+def _cell_slots(table, fixed_cells, **targets):
+    """填写位置：固定坐标超出表格的行数或列数时为None（填写时跳过，table.cell不检查列号，会取到下一行的单元格）；
+    targets为按关键字定位后的(行, 列)"""
+    n_rows, n_cols = len(table.rows), len(table.columns)
+    slots = {"fixed": [(r, c) if r < n_rows and c < n_cols else None for r, c in fixed_cells]}
+    slots.update(targets)
+    return slots
+
+
+def slot_cells(table, slots):
+    """全部填写位置对应的单元格：{(行, 列): 单元格}，按 table.cell(行, 列) 取得（合并单元格的多个位置为同一单元格）"""
+    positions = {pos for pos in slots["fixed"] if pos is not None}
+    positions.update(pos for key, pos in slots.items() if key != "fixed")
+    return {pos: table.cell(*pos) for pos in sorted(positions)}
+
+
+_TEMPLATE_CACHE = {}  # (模板绝对路径, 表单类型) -> CompiledTemplate
+_TEMPLATE_COMPILERS = {}  # 表单类型 -> fn(table)，返回slots
+_cache_lock = threading.Lock()
+
+
+def load_template(template_path, kind):
+    """返回编译后的模板：路径与大小/修改时间未变时直接复用，变化时按内容哈希判断是否需要重新编译"""
+    path = os.path.abspath(os.fspath(template_path))
+    st = os.stat(path)
+    stat_key = (st.st_size, st.st_mtime_ns)
+    key = (path, kind)
+    with _cache_lock:
+        compiled = _TEMPLATE_CACHE.get(key)
+        if compiled is not None and compiled.stat_key == stat_key:
+            return compiled
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()
+        if compiled is not None and compiled.digest == digest:
+            compiled.stat_key = stat_key
+            return compiled
+        slots = _TEMPLATE_COMPILERS[kind](Document(io.BytesIO(data)).tables[0])
+        # 供复制的原始文档另行解析且不再访问：Document会缓存body子元素，深拷贝后会脱离文档树
+        compiled = CompiledTemplate(Document(io.BytesIO(data)), digest, stat_key, slots)
+        _TEMPLATE_CACHE[key] = compiled
+        return compiled
+
+
+# ===================== 申请表 =====================
+APPLICATION_FIXED_CELLS = [(0, 1), (0, 3), (0, 4), (0, 6), (1, 6), (2, 1), (2, 3), (2, 4)]
+APPLICATION_KEYWORDS = {
+    "name": ["维修项目名称", "项目名称"],
+    "list": ["工作量及材料清单", "工作量", "清单"],
+    "image": ["其他需求支撑文件"],
+}
+
+
+def _compile_application(table):
+    n_rows, n_cols = len(table.rows), len(table.columns)
+    found = _locate_keywords(table, APPLICATION_KEYWORDS)
+    name_row, name_col = found["name"] or (1, 1)
+    list_row, list_col = found["list"] or (max(0, n_rows - 3), 0)
+    if found["image"] is not None:
+        image = (found["image"][0], min(found["image"][1] + 1, n_cols - 1))
+    else:
+        image = (max(0, n_rows - 2), n_cols - 1)
+    return _cell_slots(table, APPLICATION_FIXED_CELLS,
+                         name=(name_row, min(name_col + 1, n_cols - 1)),
+                         list=(list_row, min(list_col + 1, n_cols - 1)),
+                         image=image)
+
+
+_TEMPLATE_COMPILERS["application"] = _compile_application
+
+
+def application_fills(slots, base_info, project_name, project_date, cycle, work_list, total_amount):
+    """申请表的文字填写：[((行, 列), 文本, 对齐方式, 字号, 可跳过)]，按填写顺序（同一单元格以最后一次为准）"""
+    fill_items = [
+        (base_info["申请单位"], WD_PARAGRAPH_ALIGNMENT.LEFT),
+        (project_date, WD_PARAGRAPH_ALIGNMENT.CENTER),
+        (project_date, WD_PARAGRAPH_ALIGNMENT.CENTER),
+        (base_info["申请人"], WD_PARAGRAPH_ALIGNMENT.LEFT),
+        (base_info["联系电话"], WD_PARAGRAPH_ALIGNMENT.LEFT),
+        (cycle, WD_PARAGRAPH_ALIGNMENT.LEFT),
+        (f"{total_amount:.2f}元", WD_PARAGRAPH_ALIGNMENT.CENTER),
+        (f"{total_amount:.2f}元", WD_PARAGRAPH_ALIGNMENT.CENTER),
+    ]
+    fills = [(idx, t, a, None, True) for idx, (t, a) in zip(slots["fixed"], fill_items) if idx is not None]
+    fills.append((slots["name"], project_name, WD_PARAGRAPH_ALIGNMENT.CENTER, Pt(10), False))
+    fills.append((slots["list"], work_list, WD_PARAGRAPH_ALIGNMENT.LEFT, Pt(9), False))
+    return fills
+
+
+def fill_application_form(template_path, base_info, project_name, project_date, cycle, work_list,
+                          total_amount, image_paths=()):
+    """按申请表模板填充内容，返回未保存的Document"""
+    template = load_template(template_path, "application")
+    doc, cells = template.new_document()
+    _fill_cells(cells, application_fills(template.slots, base_info, project_name, project_date, cycle,
+                                         work_list, total_amount))
+    insert_images_to_cell(cells[template.slots["image"]], image_paths, image_prep.image_dpi(base_info))
+    return doc
+
+
+# ===================== 会审单 =====================
+REVIEW_FIXED_CELLS = [(1, 1), (1, 5), (1, 9), (2, 1), (2, 5), (3, 1), (3, 5), (3, 9)]
+REVIEW_KEYWORDS = {
+    "name": ["维修项目名称", "项目名称"],
+    "list": ["主要工作量及材料清单", "工作量", "清单"],
+    "plan": ["施工方实施计划"],
+}
+
+
+def _compile_review(table):
+    n_rows, n_cols = len(table.rows), len(table.columns)
+    found = _locate_keywords(table, REVIEW_KEYWORDS)
+    name_row, name_col = found["name"] or (0, 1)
+    list_row, list_col = found["list"] or (max(0, n_rows - 2), 0)
+    plan_row, plan_col = found["plan"] or (list_row + 1, list_col)
+    return _cell_slots(table, REVIEW_FIXED_CELLS,
+                         name=(name_row, min(name_col + 1, n_cols - 1)),
+                         list=(list_row, min(list_col + 1, n_cols - 1)),
+                         plan=(plan_row, min(plan_col + 1, n_cols - 1)))
+
+
+_TEMPLATE_COMPILERS["review"] = _compile_review
+
+
+def review_fills(slots, base_info, project_name, project_date, cycle, work_list, total_amount):
+    """会审单的文字填写，格式同 application_fills"""
+    fill_items = [
+        f"{total_amount:.2f}元",
+        project_date,
+        cycle,
+        base_info["项目负责人"],
+        base_info["联系电话"],
+        base_info["实施单位"],
+        base_info["项目经理"],
+        base_info["项目经理联系电话"],
+    ]
+    fills = [(idx, t, None, None, True) for idx, t in zip(slots["fixed"], fill_items) if idx is not None]
+    fills.append((slots["name"], project_name, WD_PARAGRAPH_ALIGNMENT.CENTER, Pt(10), False))
+    fills.append((slots["list"], f"工作量：{work_list}", WD_PARAGRAPH_ALIGNMENT.LEFT, Pt(9), False))
+    fills.append((slots["plan"], f"我方计划安排1辆车2人在{cycle}完成施工。", WD_PARAGRAPH_ALIGNMENT.CENTER, Pt(9), False))
+    return fills
+
+
+def fill_review_form(template_path, base_info, project_name, project_date, cycle, work_list, total_amount):
+    """按会审单模板填充内容，返回未保存的Document"""
+    template = load_template(template_path, "review")
+    doc, cells = template.new_document()
+    _fill_cells(cells, review_fills(template.slots, base_info, project_name, project_date, cycle,
+                                    work_list, total_amount))
+    return doc
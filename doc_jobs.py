@@ -0,0 +1,87 @@
+"""文档后台生成：申请表、会审单在线程池中同时生成并保存，界面不卡顿
+
+进度通过Tk事件循环（after回调）通知界面；取消后尚未开始或尚未写盘的文档不再保存。
+文档先在内存中生成，再原子写入目标文件，取消或出错时不会留下写了一半的文件。
+"""
+import io
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from autosave import atomic_write_bytes
+
+POLL_INTERVAL_MS = 100
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class DocumentJob:
+    """后台生成一组文档
+
+    tasks：[(名称, build, 保存路径)]，build()在后台线程调用，返回python-docx的Document；
+    on_progress(名称, 状态)：在主线程回调，状态为“生成中”“保存中”“已完成”；
+    on_done(saved, errors, cancelled)：全部结束后在主线程回调，
+    saved为已保存的(名称, 路径)，errors为{名称: 异常}
+    """
+
+    def __init__(self, root, tasks, on_progress, on_done):
+        self.root = root
+        self.tasks = tasks
+        self.on_progress = on_progress
+        self.on_done = on_done
+
+        self._cancel = threading.Event()
+        self._events = queue.Queue()
+        pool = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="DocumentJob")
+        self._futures = [pool.submit(self._run, *task) for task in tasks]
+        pool.shutdown(wait=False)
+        self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def done(self):
+        return all(f.done() for f in self._futures)
+
+    def _check_cancel(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def _run(self, name, build, save_path):
+        self._check_cancel()
+        self._events.put((name, "生成中"))
+        doc = build()
+        self._check_cancel()
+        self._events.put((name, "保存中"))
+        buf = io.BytesIO()
+        doc.save(buf)
+        self._check_cancel()
+        atomic_write_bytes(save_path, buf.getvalue())
+        self._events.put((name, "已完成"))
+
+    def _poll(self):
+        finished = self.done()  # 先判断是否结束再取进度，保证最后的进度不会漏掉
+        while True:
+            try:
+                name, state = self._events.get_nowait()
+            except queue.Empty:
+                break
+            self.on_progress(name, state)
+        if not finished:
+            self.root.after(POLL_INTERVAL_MS, self._poll)
+            return
+
+        saved, errors = [], {}
+        for (name, _, save_path), future in zip(self.tasks, self._futures):
+            error = future.exception()
+            if error is None:
+                saved.append((name, save_path))
+            elif not isinstance(error, JobCancelled):
+                errors[name] = error
+        self.on_done(saved, errors, self.cancelled)
@@ -0,0 +1,295 @@
+"""本地文档生成服务：其他脚本通过HTTP（仅限本机127.0.0.1）请求生成申请表 / 会审单，无需操作界面
+
+用法：
+    python main.py serve --app-template 申请表模板.docx --review-template 会审单模板.docx \\
+        [--budget budget_data.json] [--port 8765] [--jobs 4] [--engine ooxml]
+
+接口：
+    POST /jobs    请求体为JSON任务，成功时返回ZIP（申请表、会审单，excel为true时另含预算清单），
+                  响应头X-Total-Amount为预算金额；任务有误返回400，排队已满返回503（JSON：{"error": 原因}）
+    GET  /status  JSON：进程数、排队数、处理中、已完成/失败/拒绝数、最近任务的耗时统计（毫秒）
+
+JSON任务：
+    {"project_name": "项目名称（必填）", "project_date": "2026年01月01日", "cycle": "15天",
+     "base_info": {"申请单位": "..."},               # 覆盖config.json中的基础信息（可选）
+     "quantities": {"项目名称或项目ID": 工程量},      # 与预算表中的项目对应
+     "images": ["base64编码的图片", ...],            # 支撑文件图片（可选）
+     "excel": false}
+
+服务启动时读取一次预算表与基础信息；文档在进程池中生成，每个进程首次使用时编译模板并缓存，
+之后的任务只传入本任务的工程量与图片。同时排队的任务数超过上限时直接拒绝，不无限堆积。
+Python脚本可直接调用 request_documents() / service_status()。
+"""
+import io
+import os
+import json
+import math
+import time
+import base64
+import zipfile
+import argparse
+import threading
+import statistics
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import batch
+from budget_core import CONFIG_FILE, BUDGET_DATA_FILE, read_config
+
+HOST = "127.0.0.1"  # 只接受本机请求
+DEFAULT_PORT = 8765
+DEFAULT_URL = f"http://{HOST}:{DEFAULT_PORT}"
+QUEUE_PER_JOB = 4  # 每个进程最多排队的任务数，超出时返回503
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+LATENCY_WINDOW = 200  # 耗时统计取最近的任务数
+
+
+# ===================== 任务 =====================
+def build_site(job, budget_data, base_info):
+    """把JSON任务转换为batch.render_site使用的站点数据；任务有误时抛出ValueError"""
+    if not isinstance(job, dict): raise ValueError("任务必须是JSON对象")
+    project_name = str(job.get("project_name") or "").strip()
+    if not project_name: raise ValueError("缺少项目名称（project_name）")
+    quantities = job.get("quantities") or {}
+    if not isinstance(quantities, dict): raise ValueError("quantities必须是{项目名称或项目ID: 工程量}")
+    overrides = job.get("base_info") or {}
+    if not isinstance(overrides, dict): raise ValueError("base_info必须是JSON对象")
+
+    wanted = {}
+    for key, value in quantities.items():
+        try:
+            quantity = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"工程量不是有效数字：{key} = {value!r}")
+        if not math.isfinite(quantity) or quantity < 0:
+            raise ValueError(f"工程量必须是不小于0的有限数字：{key} = {value!r}")
+        wanted[str(key).strip()] = quantity
+    items = []
+    for item in budget_data:  # 按预算表顺序，清单文本顺序与界面一致
+        quantity = wanted.pop(str(item["id"]), None)
+        if quantity is None:
+            quantity = wanted.pop(item["name"], None)
+        if quantity is not None and quantity > 0:
+            items.append(dict(item, quantity=quantity, total=0.0))
+    if wanted: raise ValueError(f"预算表中不存在以下项目：{'、'.join(sorted(wanted))}")
+
+    try:
+        images = [base64.b64decode(data, validate=True) for data in job.get("images") or []]
+    except (TypeError, ValueError):
+        raise ValueError("images必须是base64编码的图片列表")
+    site_info = dict(base_info)
+    site_info.update({key: str(value) for key, value in overrides.items() if key in base_info})
+    return {
+        "project_name": project_name,
+        "project_date": batch.format_date(job.get("project_date")),
+        "cycle": str(job.get("cycle") or batch.DEFAULT_CYCLE).strip(),
+        "base_info": site_info,
+        "items": items,
+        "image_paths": images,  # 图片数据直接传给生成进程，不落盘
+        "file_stem": batch.safe_filename(project_name),
+    }
+
+
+def _warm_worker(app_template, review_template, engine):
+    """生成进程启动时编译模板（之后的任务直接复用）"""
+    forms = batch.ENGINES[engine]
+    forms.load_template(app_template, "application")
+    forms.load_template(review_template, "review")
+
+
+def _zip_files(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zf:  # docx/xlsx本身已压缩
+        for name, data in files:
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+class DocumentService:
+    """有界的生成进程池：统计排队数与耗时，排队已满时拒绝新任务"""
+
+    def __init__(self, budget_data, base_info, app_template, review_template, jobs, engine="docx",
+                 max_queue=None):
+        self.budget_data = budget_data
+        self.base_info = base_info
+        self.templates = (app_template, review_template)
+        self.jobs = jobs
+        self.engine = engine
+        self.max_queue = max_queue or jobs * QUEUE_PER_JOB
+        self.pool = ProcessPoolExecutor(max_workers=jobs, initializer=_warm_worker,
+                                        initargs=self.templates + (engine,))
+        self.started = time.time()
+        self.pending = 0
+        self.counts = {"completed": 0, "failed": 0, "rejected": 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.futures = set()  # 已提交未完成的任务（关闭时取消尚未开始的）
+        self.lock = threading.Lock()
+
+    def submit(self, job):
+        """生成一个任务的文档（阻塞到完成），返回(金额, ZIP数据)；排队已满时返回None"""
+        site = build_site(job, self.budget_data, self.base_info)
+        with self.lock:
+            if self.pending >= self.max_queue:
+                self.counts["rejected"] += 1
+                return None
+            self.pending += 1
+        t0 = time.perf_counter()
+        future = None
+        try:
+            with self.lock:
+                future = self.pool.submit(batch.render_site, site, *self.templates, bool(job.get("excel")),
+                                          self.engine)
+                self.futures.add(future)
+            total_amount, files = future.result()
+        except Exception:
+            with self.lock:
+                self.counts["failed"] += 1
+            raise
+        finally:
+            with self.lock:
+                self.pending -= 1
+                self.futures.discard(future)
+        with self.lock:
+            self.counts["completed"] += 1
+            self.latencies.append(time.perf_counter() - t0)
+        return total_amount, _zip_files(files)
+
+    def status(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            pending = self.pending
+            counts = dict(self.counts)
+        latency = {}
+        if latencies:
+            latency = {"avg": statistics.mean(latencies) * 1000, "p50": latencies[len(latencies) // 2] * 1000,
+                       "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+                       "max": latencies[-1] * 1000, "samples": len(latencies)}
+        return dict(counts, jobs=self.jobs, engine=self.engine, max_queue=self.max_queue,
+                    in_flight=min(pending, self.jobs), queue_depth=max(0, pending - self.jobs),
+                    latency_ms=latency, uptime=round(time.time() - self.started, 1))
+
+    def close(self):
+        """取消排队中的任务并关闭进程池（不用shutdown(cancel_futures=True)，兼容Python 3.7/3.8）"""
+        with self.lock:
+            futures = list(self.futures)
+        for future in futures:
+            future.cancel()
+        self.pool.shutdown(wait=False)
+
+
+# ===================== HTTP接口 =====================
+class _Handler(BaseHTTPRequestHandler):
+    service = None  # DocumentService，由make_server设置
+
+    def _send(self, code, body, content_type="application/json; charset=utf-8", headers=()):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers:
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/status":
+            self._send(200, self.service.status())
+        else:
+            self._send(404, {"error": "未知接口"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._send(404, {"error": "未知接口"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send(400, {"error": "Content-Length无效"})
+            return
+        if length > MAX_REQUEST_BYTES:
+            self._send(413, {"error": f"请求过大（上限{MAX_REQUEST_BYTES // 1024 // 1024}MB）"})
+            return
+        try:
+            job = json.loads(self.rfile.read(length).decode("utf-8"))
+            result = self.service.submit(job)
+        except ValueError as e:  # JSON格式错误、任务内容有误、无有效项目
+            self._send(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self._send(500, {"error": f"生成失败：{e}"})
+            return
+        if result is None:
+            self._send(503, {"error": "排队任务已满，请稍后重试"}, headers=[("Retry-After", "1")])
+            return
+        total_amount, data = result
+        self._send(200, data, "application/zip", [("X-Total-Amount", f"{total_amount:.2f}")])
+
+    def log_message(self, format, *args):
+        pass  # 不逐条打印请求
+
+
+def make_server(service, port=DEFAULT_PORT):
+    """创建绑定127.0.0.1的HTTP服务（port为0时自动选择端口，见server.server_address）"""
+    handler = type("Handler", (_Handler,), {"service": service})
+    return ThreadingHTTPServer((HOST, port), handler)
+
+
+# ===================== 客户端 =====================
+def request_documents(job, url=DEFAULT_URL, timeout=300):
+    """提交任务并等待结果，返回(金额, {文件名: 数据})；服务返回错误时抛出RuntimeError"""
+    request = urllib.request.Request(f"{url}/jobs", data=json.dumps(job, ensure_ascii=False).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            total_amount = float(response.headers["X-Total-Amount"])
+            with zipfile.ZipFile(io.BytesIO(response.read())) as zf:
+                return total_amount, {name: zf.read(name) for name in zf.namelist()}
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"{e.code}：{json.loads(e.read() or b'{}').get('error', e.reason)}") from None
+
+
+def service_status(url=DEFAULT_URL, timeout=10):
+    with urllib.request.urlopen(f"{url}/status", timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def encode_image(path):
+    """读取图片文件并编码为任务中images的元素"""
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode("ascii")
+
+
+# ===================== 命令行入口 =====================
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py serve", description="本地文档生成服务（仅限本机访问）")
+    parser.add_argument("--app-template", required=True, help="申请表模板（.docx）")
+    parser.add_argument("--review-template", required=True, help="会审单模板（.docx）")
+    parser.add_argument("--budget", default=BUDGET_DATA_FILE,
+                        help=f"预算数据（{BUDGET_DATA_FILE}或家集客预算表.xlsx，默认：{BUDGET_DATA_FILE}）")
+    parser.add_argument("--config", default=CONFIG_FILE, help=f"基础信息配置（默认：{CONFIG_FILE}）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"端口（默认：{DEFAULT_PORT}）")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="生成进程数（默认：CPU核数）")
+    parser.add_argument("--max-queue", type=int, help=f"最多排队的任务数（默认：进程数×{QUEUE_PER_JOB}）")
+    parser.add_argument("--engine", choices=sorted(batch.ENGINES), default="docx", help="文档填充方式（见batch）")
+    args = parser.parse_args(argv)
+
+    for path in (args.app_template, args.review_template, args.budget):
+        if not os.path.exists(path): parser.error(f"文件不存在：{path}")
+    service = DocumentService(batch.load_budget(args.budget), read_config(args.config), args.app_template,
+                              args.review_template, max(1, args.jobs), args.engine, args.max_queue)
+    server = make_server(service, args.port)
+    print(f"文档生成服务已启动：http://{HOST}:{server.server_address[1]}（Ctrl+C停止）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
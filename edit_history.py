@@ -0,0 +1,110 @@
+"""撤销/重做：只记录每次修改的增量（项目ID、字段、旧值/新值），不保存整个预算表的副本
+
+每一步（一次界面操作）是若干条记录：
+- ("update", 项目ID, {字段: 旧值}, {字段: 新值})：只记录有变化的字段
+- ("delete", 项目字典, 后一项目ID)：删除的项目，撤销时按原ID插回原位置
+- ("add", 项目字典, 后一项目ID)：新增的项目，撤销时删除，重做时按原ID插回原位置
+撤销/重做经由BudgetTable的update/insert/delete执行，与普通修改一样增量更新汇总，
+界面随后按返回的行增量刷新并保存。内存只与修改次数有关，与预算表大小无关；
+步数超过上限时丢弃最早的记录。预算表整体替换（重新导入）后历史自动清空。
+"""
+from collections import deque
+
+MAX_STEPS = 200
+
+
+class EditHistory:
+    def __init__(self, max_steps=MAX_STEPS):
+        self._undo = deque(maxlen=max_steps)
+        self._redo = []
+        self._table = None  # 历史所属的预算表
+
+    def _bind(self, table):
+        if table is not self._table:
+            self.clear()
+            self._table = table
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def _record(self, label, records):
+        if not records: return
+        self._undo.append((label, records))
+        self._redo.clear()
+
+    # ===================== 记录修改 =====================
+    def update(self, table, label, item_id, **fields):
+        """修改项目字段并记录有变化的字段，返回行视图"""
+        self._bind(table)
+        item = table.get(item_id)
+        old = {key: item[key] for key, value in fields.items() if key != "total" and item[key] != value}
+        new = {key: fields[key] for key in old}
+        item = table.update(item_id, **fields)
+        self._record(label, [("update", item_id, old, new)] if old else [])
+        return item
+
+    def add(self, table, label, item):
+        """新增项目并记录，返回行视图"""
+        self._bind(table)
+        item = table.add(item)
+        self._record(label, [("add", dict(item), table.next_id(item["id"]))])
+        return item
+
+    def delete(self, table, label, item_id):
+        """删除项目并记录（含其在显示顺序中的位置），返回被删除项目的字典副本"""
+        self._bind(table)
+        before = table.next_id(item_id)
+        item = table.delete(item_id)
+        self._record(label, [("delete", item, before)])
+        return item
+
+    def set_quantities(self, table, label, quantities):
+        """整体设置工程量（同BudgetTable.set_quantities），有变化的行合并为一步；返回这些行的视图"""
+        self._bind(table)
+        old = table.quantities()
+        changed = table.set_quantities(quantities)
+        self._record(label, [("update", item["id"], {"quantity": old.get(item["id"], 0.0)},
+                              {"quantity": item["quantity"]}) for item in changed])
+        return changed
+
+    # ===================== 撤销/重做 =====================
+    def undo(self, table):
+        """撤销最近一步，返回(步骤名称, 有变化的行视图, 是否有增删)；无可撤销时返回None"""
+        self._bind(table)
+        if not self._undo: return None
+        step = self._undo.pop()
+        self._redo.append(step)
+        return (step[0],) + _apply(table, reversed(step[1]), undo=True)
+
+    def redo(self, table):
+        """重做最近撤销的一步，返回值同undo"""
+        self._bind(table)
+        if not self._redo: return None
+        step = self._redo.pop()
+        self._undo.append(step)
+        return (step[0],) + _apply(table, step[1], undo=False)
+
+
+def _apply(table, records, undo):
+    changed, structural = [], False
+    for kind, *args in records:
+        if kind == "update":
+            item_id, old, new = args
+            changed.append(table.update(item_id, **(old if undo else new)))
+        else:
+            item, before = args
+            structural = True
+            if (kind == "delete") == undo:  # 撤销删除 / 重做新增
+                table.insert(item, before)
+            else:
+                table.delete(item["id"])
+    return changed, structural
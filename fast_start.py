@@ -0,0 +1,134 @@
+"""快速启动：重型库首次使用时才导入或在首帧后后台预热，日期控件先用占位输入框，并记录启动耗时
+
+pandas、python-docx、tkcalendar等库导入较慢（pandas在瘦客户机上超过1秒），
+窗口显示前只导入tkinter与轻量模块；首帧绘制后在后台线程依次导入这些库，
+导入完成前用到时照常在主线程导入（只是不再预热）。numpy（预算表）在创建窗口的同时于后台导入，
+预算表在首帧绘制后建立，窗口显示不等待numpy。
+每次启动的各阶段耗时追加写入 startup_timing.jsonl，并与目标可交互时间比较。
+"""
+import os
+import json
+import time
+import threading
+import importlib
+import tkinter as tk
+from tkinter import ttk
+from datetime import date, datetime
+
+STARTUP_TARGET_MS = 1000  # 目标可交互时间：从启动到首帧绘制完成并填好预算表
+STARTUP_LOG_FILE = "startup_timing.jsonl"
+STARTUP_LOG_KEEP = 50  # 日志只保留最近若干次启动
+EARLY_MODULES = ("numpy", "budget_store")  # 窗口显示前就开始在后台导入（首帧后建立预算表要用）
+WARM_MODULES = ("tkcalendar", "pandas", "openpyxl", "docx", "doc_forms", "image_prep", "quantity_import")
+DATE_FORMAT = "%Y年%m月%d日"  # 与DateEntry的date_pattern="yyyy年MM月dd日"一致
+
+
+# ===================== 启动耗时 =====================
+class StartupTimer:
+    def __init__(self, t0=None):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self._last = self.t0
+        self.stages = {}  # 阶段名称 -> 耗时（毫秒）
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = round((now - self._last) * 1000, 1)
+        self._last = now
+
+    def report(self, target_ms=STARTUP_TARGET_MS):
+        total_ms = round((self._last - self.t0) * 1000, 1)
+        return {"time": datetime.now().isoformat(timespec="seconds"), "stages": self.stages,
+                "total_ms": total_ms, "target_ms": target_ms, "met": total_ms <= target_ms}
+
+
+def format_report(report):
+    stages = "，".join(f"{name}{ms:.0f}ms" for name, ms in report["stages"].items())
+    result = "达标" if report["met"] else "超出目标"
+    return f"启动耗时{report['total_ms']:.0f}ms（目标{report['target_ms']}ms，{result}）：{stages}"
+
+
+def write_report(report, path=STARTUP_LOG_FILE):
+    """追加一行启动记录，只保留最近STARTUP_LOG_KEEP次"""
+    lines = []
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()[-(STARTUP_LOG_KEEP - 1):]
+    lines.append(json.dumps(report, ensure_ascii=False))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+# ===================== 后台预热 =====================
+class WarmUp:
+    """在后台线程依次导入模块；ready为已导入完成（或导入失败）的模块名"""
+
+    def __init__(self, modules=WARM_MODULES):
+        self.ready = set()
+        self._thread = threading.Thread(target=self._run, args=(modules,), name="WarmUp", daemon=True)
+        self._thread.start()
+
+    def _run(self, modules):
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                pass
+            self.ready.add(name)
+
+    def done(self):
+        return not self._thread.is_alive()
+
+
+# ===================== 日期控件占位 =====================
+class LazyDateEntry(ttk.Frame):
+    """日期输入框：先显示普通输入框（今天的日期），tkcalendar导入后调用activate()换成DateEntry
+
+    对外接口与DateEntry的常用部分一致：get() / set_date() / bind()
+    """
+
+    def __init__(self, master, **kw):
+        super().__init__(master)
+        self._kw = kw
+        self._bindings = []
+        self.real = None
+        self.entry = ttk.Entry(self, width=kw.get("width", 12))
+        self.entry.insert(0, date.today().strftime(DATE_FORMAT))
+        self.entry.pack(fill=tk.BOTH, expand=True)
+
+    def get(self):
+        return self.entry.get()
+
+    def set_date(self, value):
+        if self.real is not None:
+            self.real.set_date(value)
+            return
+        if isinstance(value, str):
+            value = datetime.strptime(value, DATE_FORMAT)  # 格式不对时与DateEntry一样抛出异常
+        self.entry.delete(0, tk.END)
+        self.entry.insert(0, value.strftime(DATE_FORMAT))
+
+    def bind(self, sequence=None, func=None, add=None):
+        if func is None:
+            return super().bind(sequence, func, add)
+        self._bindings.append((sequence, func, add))
+        if self.real is not None:
+            return self.real.bind(sequence, func, add)
+
+    def activate(self):
+        """（主线程调用）换成真正的DateEntry并保留已填写的日期；tkcalendar不可用时继续使用普通输入框"""
+        if self.real is not None: return
+        try:
+            from tkcalendar import DateEntry
+        except ImportError:
+            return
+        value = self.entry.get()
+        real = DateEntry(self, **self._kw)
+        try:
+            real.set_date(datetime.strptime(value, DATE_FORMAT))
+        except ValueError:
+            pass
+        for sequence, func, add in self._bindings:
+            real.bind(sequence, func, add)
+        self.entry.destroy()
+        real.pack(fill=tk.BOTH, expand=True)
+        self.entry = self.real = real
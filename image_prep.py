@@ -0,0 +1,145 @@
+"""支撑图片预处理：纠正EXIF方向、按打印尺寸缩小并重新压缩
+
+Word中的图片固定按 MAX_IMG_WIDTH x MAX_IMG_HEIGHT 显示，按DPI（config.json中的“图片DPI”，
+默认150）换算出所需像素后缩小，手机照片（5~12MB）处理后一般只有几百KB。
+处理结果按文件内容哈希缓存；界面选择图片后即在线程池中预处理，生成文档时直接嵌入处理好的数据。
+未安装Pillow或图片无法识别时直接使用原图。
+"""
+import io
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from docx.shared import Inches
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+MAX_IMG_WIDTH = Inches(4)
+MAX_IMG_HEIGHT = Inches(3)
+DEFAULT_DPI = 150
+IMAGE_DPI_KEY = "图片DPI"  # config.json中的可选配置项
+JPEG_QUALITY = 85
+CACHE_MAX_BYTES = 64 * 1024 * 1024  # 处理结果缓存上限，超出时丢弃最早的结果
+PREFETCH_WORKERS = min(4, os.cpu_count() or 1)
+
+_cache = {}  # (内容sha1, DPI) -> 处理后的图片数据
+_cache_bytes = 0
+_digests = {}  # 文件绝对路径 -> ((大小, 修改时间), sha1)
+_pending = {}  # (文件绝对路径, DPI) -> 预处理中的Future
+_lock = threading.RLock()  # 已完成的Future会在submit所在线程中立即回调_forget
+_pool = None
+
+
+def image_dpi(base_info):
+    """从基础信息配置中读取图片DPI，未配置或无效时用默认值"""
+    try:
+        dpi = int(base_info.get(IMAGE_DPI_KEY, DEFAULT_DPI))
+    except (TypeError, ValueError):
+        return DEFAULT_DPI
+    return dpi if dpi > 0 else DEFAULT_DPI
+
+
+def target_pixels(dpi):
+    """图片在文档中显示区域对应的像素尺寸(宽, 高)"""
+    return round(MAX_IMG_WIDTH.inches * dpi), round(MAX_IMG_HEIGHT.inches * dpi)
+
+
+def process_image(data, dpi=DEFAULT_DPI):
+    """处理一张图片的原始数据，返回处理后的数据（无需处理或无法处理时返回原数据）"""
+    if Image is None: return data
+    try:
+        img = Image.open(io.BytesIO(data))
+        orientation = img.getexif().get(0x0112, 1)
+        width, height = (img.height, img.width) if orientation in (5, 6, 7, 8) else img.size  # 转正后的尺寸
+        max_w, max_h = target_pixels(dpi)
+        # 图片会被拉伸到固定显示区域，宽、高都要保留足够像素
+        scale = min(1.0, max(max_w / width, max_h / height))
+        if scale == 1.0 and orientation == 1 and img.format in ("JPEG", "PNG"):
+            return data
+        img = ImageOps.exif_transpose(img)
+        if scale < 1.0:
+            img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+        out = io.BytesIO()
+        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+            img.save(out, "PNG", optimize=True)
+        else:
+            img.convert("RGB").save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, dpi=(dpi, dpi))
+    except Exception:
+        return data
+    return out.getvalue()
+
+
+def _file_digest(path):
+    st = os.stat(path)
+    stat_key = (st.st_size, st.st_mtime_ns)
+    with _lock:
+        cached = _digests.get(path)
+    if cached is not None and cached[0] == stat_key:
+        return cached[1], None
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha1(data).hexdigest()
+    with _lock:
+        _digests[path] = (stat_key, digest)
+    return digest, data
+
+
+def _prepare(path, dpi, digest=None, data=None):
+    global _cache_bytes
+    if digest is None:
+        digest, data = _file_digest(path)
+    key = (digest, dpi)
+    with _lock:
+        result = _cache.get(key)
+    if result is not None:
+        return result
+    if data is None:
+        with open(path, "rb") as f:
+            data = f.read()
+    result = process_image(data, dpi)
+    with _lock:
+        if key not in _cache:
+            _cache[key] = result
+            _cache_bytes += len(result)
+            while _cache_bytes > CACHE_MAX_BYTES and len(_cache) > 1:
+                _cache_bytes -= len(_cache.pop(next(iter(_cache))))
+    return result
+
+
+def prepare_image(path, dpi=DEFAULT_DPI):
+    """返回处理后的图片数据：已在预处理中的等待其完成，已处理过的直接取缓存
+    path也可以是图片的原始数据（bytes，如本地服务收到的上传图片），同样按内容缓存"""
+    if isinstance(path, bytes):
+        return _prepare(None, dpi, hashlib.sha1(path).hexdigest(), path)
+    path = os.path.abspath(path)
+    with _lock:
+        future = _pending.get((path, dpi))
+    if future is not None:
+        try:
+            return future.result()
+        except Exception:
+            pass
+    return _prepare(path, dpi)
+
+
+def prefetch(paths, dpi=DEFAULT_DPI):
+    """在后台线程池中预处理图片（选择图片后调用，不阻塞界面）"""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="ImagePrep")
+        for path in paths:
+            key = (os.path.abspath(path), dpi)
+            if key in _pending: continue
+            future = _pool.submit(_prepare, *key)
+            _pending[key] = future
+            future.add_done_callback(lambda f, k=key: _forget(k, f))
+
+
+def _forget(key, future):
+    with _lock:
+        if _pending.get(key) is future:
+            del _pending[key]
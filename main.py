@@ -1,20 +1,37 @@
+import time
+
+STARTUP_T0 = time.perf_counter()  # 启动计时起点（导入其他模块之前）
+
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
-from tkcalendar import DateEntry
-import pandas as pd
-from docx import Document
-from docx.shared import Pt, Inches
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from tkinter import font as tkfont
 import os
+import sys
 import json
+import argparse
 from datetime import datetime
+from functools import partial
+
+import fast_start
+from fast_start import LazyDateEntry, StartupTimer, WarmUp
+from virtual_tree import VirtualTreeview
+from name_search import match_span
+from autosave import AutoSaver, atomic_write_json
+from doc_jobs import DocumentJob
+from edit_history import EditHistory
+import price_snapshot
+from sqlite_store import DB_FILE, PROJECT_STATUSES, SqliteBudgetDB, merge_snapshots
+from budget_core import (CONFIG_FILE, BUDGET_DATA_FILE, MAX_IMAGES, DEFAULT_BASE_INFO,
+                         read_budget_file, read_price_book, carry_over_ids)
 
 # ===================== 配置与常量 =====================
-CONFIG_FILE = "config.json"
-BUDGET_DATA_FILE = "budget_data.json"
 EXCEL_SHEETS = ["施工项目（Sheet1）", "材料项目（Sheet2）"]
-MAX_IMG_WIDTH = Inches(4)
-MAX_IMG_HEIGHT = Inches(3)
+VIRTUAL_TREE_MIN_ROWS = 2000  # 预算项目数达到此值时表格改用虚拟滚动（只生成可见行）
+IMPORT_REPORT_LINES = 20  # 导入工程量后提示框中最多列出的未导入行数
+
+FONT_FAMILY = "Microsoft YaHei UI"
+BOLD_FONTS = ("bold", "label_frame", "generate_btn", "total_amount")
+DEFAULT_NAMED_FONTS = ("TkDefaultFont", "TkTextFont")  # 输入框等未指定字体的控件使用的Tk内置字体
 
 # 基准字体大小（所有字体基于此缩放）
 BASE_FONT_SIZES = {
@@ -28,8 +45,11 @@ BASE_FONT_SIZES = {
 
 
 class HomeAndEnterpriseTool:
-    def __init__(self, root):
+    def __init__(self, root, db_path=None, startup_timer=None, print_startup_report=False):
         self.root = root
+        self.startup_timer = startup_timer or StartupTimer()
+        self.print_startup_report = print_startup_report
+        self.warmup = None  # 首帧后在后台导入pandas、python-docx等
         self.root.title("家集客项目预算与文档生成系统 v2.1")
 
         # ========== 窗口基础配置 ==========
@@ -46,40 +66,111 @@ class HomeAndEnterpriseTool:
         self.root.geometry(f"{default_width}x{default_height}+{x_cordinate}+{y_cordinate}")
         self.root.minsize(960, 600)
 
-        # 核心数据存储
-        self.budget_data = []
+        # 核心数据存储（预算表在首帧绘制后建立，见load_budget_data）
+        self.budget_data = None
+        self.history = EditHistory()  # 预算表修改的撤销/重做记录（预算表整体替换后自动清空）
         self.total_amount = 0.0
         self.base_info = {}
         self.word_app_template = None
         self.word_review_template = None
         self.image_paths = []
+        self.tree_rows = {}  # 项目ID -> (所在表格, 显示序号, 当前显示内容（不含序号）)；表格行iid即str(项目ID)
+        self.search_hits = None  # 当前搜索结果：表格 -> 按匹配程度排序的行iid；未搜索时为None
+        self._search_query = ""
+
+        # 可选的SQLite存储（多个已保存项目，工程量跨会话保留）
+        self.db = SqliteBudgetDB(db_path) if db_path else None
+        self.project_id = None  # 当前打开的已保存项目
+        self._table_serial = 0  # 预算表整体替换的次数，与price_version一起标识预算表版本（见_price_key）
+        self._saved_price_key = None  # 已确认写入数据库的预算表版本（保存成功的回调中更新）
+        self._written_price_key = None  # 后台保存线程最近一次写入成功的预算表版本
 
         self.status_var = tk.StringVar(value="✅ 系统初始化完成")
+        self.doc_job = None  # 后台生成中的文档任务
+        self.doc_progress = {}  # 文档名称 -> 生成状态
         self.font_scale = 1.0  # 字体缩放比例（默认100%）
 
-        # 加载数据
+        # 预算数据后台保存（合并连续修改，原子写入）
+        if self.db is not None:
+            self.autosaver = AutoSaver(self.root, self.write_budget_db, self._budget_snapshot,
+                                       self.on_budget_saved, merge=merge_snapshots)
+        else:
+            self.autosaver = AutoSaver(self.root, self.write_budget_json, self._budget_snapshot, self.on_budget_saved)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        for sequence, command in (("<Control-z>", self.undo), ("<Control-Z>", self.undo),
+                                  ("<Control-y>", self.redo), ("<Control-Y>", self.redo)):
+            self.root.bind_all(sequence, command)
+
+        # 读取数据（字典列表，不需要numpy；预算表在首帧绘制后建立）
         self.load_config()
-        self.load_budget_data()
-        if not self.budget_data:
-            self.load_budget_excel()
+        self._startup_items = self.read_local_items()
+        self.startup_timer.mark("读取数据")
 
         # 初始化GUI
         self.setup_style()
         self.setup_ui()
+        self.startup_timer.mark("构建界面")
+        self.root.after_idle(self.on_first_frame)
+
+    # ===================== 快速启动 =====================
+    def on_first_frame(self):
+        """窗口首帧绘制后：建立预算表并填充表格，记录启动耗时，再在后台预热较慢的库"""
+        self.root.update_idletasks()
+        self.startup_timer.mark("首帧绘制")
+        self.load_budget_data(self._startup_items)
+        self._startup_items = None
+        self.load_price_snapshot()
+        if not self.budget_data:
+            self.load_budget_excel()
+        self.refresh_treeviews()
+        if self.db is not None:
+            self.open_project(self.db.get_meta("current_project"))
+        self.startup_timer.mark("建立预算表")
+        report = self.startup_timer.report()
+        try:
+            fast_start.write_report(report)
+        except OSError:
+            pass
+        if self.print_startup_report:
+            print(fast_start.format_report(report))
+        self.warmup = WarmUp()
+        self._activate_date_entry()
+        self.budget_data.start_name_index()  # 在后台建立名称搜索索引，建立完成前搜索逐个比对名称
+        self._install_name_index()
+
+    def _install_name_index(self):
+        """名称搜索索引在后台建立完成后装入（预算表已整体替换时不再检查）"""
+        if not self.budget_data.poll_name_index():
+            self.root.after(50, self._install_name_index)
+
+    def _activate_date_entry(self):
+        """tkcalendar在后台导入完成后，把日期占位输入框换成DateEntry（Tk控件只能在主线程创建）"""
+        if "tkcalendar" in self.warmup.ready or self.warmup.done():
+            self.date_entry.activate()
+        else:
+            self.root.after(50, self._activate_date_entry)
 
     # ===================== 动态样式配置（支持字体缩放） =====================
-    def setup_style(self, refresh=False):
-        """初始化或刷新样式（根据当前字体缩放比例）"""
+    def scaled_font_sizes(self):
+        """当前字体大小（基准大小 * 缩放比例，最小6号，避免过小无法显示）"""
+        return {key: max(int(round(size * self.font_scale)), 6) for key, size in BASE_FONT_SIZES.items()}
+
+    def setup_fonts(self):
+        """创建共享的命名字体：样式和控件都引用这些字体，缩放时只需修改字体本身"""
+        sizes = self.scaled_font_sizes()
+        self.fonts = {key: tkfont.Font(self.root, family=FONT_FAMILY, size=size,
+                                       weight="bold" if key in BOLD_FONTS else "normal")
+                      for key, size in sizes.items()}
+        # 未单独指定字体的控件（输入框、下拉框、日期框等）使用Tk默认字体，同样随缩放调整
+        for name in DEFAULT_NAMED_FONTS:
+            tkfont.nametofont(name).configure(family=FONT_FAMILY, size=sizes["main"])
+
+    def setup_style(self):
+        """初始化样式（字体引用命名字体，缩放时无需重建样式）"""
+        self.setup_fonts()
         self.style = ttk.Style(self.root)
         self.style.theme_use("clam")
 
-        # 计算当前字体大小（基准大小 * 缩放比例）
-        current_fonts = {
-            key: int(round(size * self.font_scale)) for key, size in BASE_FONT_SIZES.items()
-        }
-        # 确保最小字体不小于6号（避免过小无法显示）
-        current_fonts = {k: max(v, 6) for k, v in current_fonts.items()}
-
         # 颜色配置
         primary_color = "#0078D7"  # 商务蓝
         self.bg_color = "#F0F2F5"  # 浅灰背景
@@ -91,7 +182,7 @@ class HomeAndEnterpriseTool:
                              relief="flat",
                              borderwidth=1)
         self.style.configure("Custom.TLabelframe.Label",
-                             font=("Microsoft YaHei UI", current_fonts["label_frame"], "bold"),
+                             font=self.fonts["label_frame"],
                              foreground=primary_color,
                              background=self.bg_color)
 
@@ -102,12 +193,12 @@ class HomeAndEnterpriseTool:
         # Label 样式（普通文本）
         self.style.configure("TLabel",
                              background=self.bg_color,
-                             font=("Microsoft YaHei UI", current_fonts["main"]),
+                             font=self.fonts["main"],
                              foreground="#333")
 
         # Button 样式（普通按钮）
         self.style.configure("Accent.TButton",
-                             font=("Microsoft YaHei UI", current_fonts["main"]),
+                             font=self.fonts["main"],
                              background=primary_color,
                              foreground="white",
                              borderwidth=0,
@@ -117,7 +208,7 @@ class HomeAndEnterpriseTool:
 
         # 生成按钮样式（特殊放大按钮）
         self.style.configure("Generate.TButton",
-                             font=("Microsoft YaHei UI", current_fonts["generate_btn"], "bold"),
+                             font=self.fonts["generate_btn"],
                              background="#28a745",  # 绿色
                              foreground="white",
                              padding=10)
@@ -126,75 +217,39 @@ class HomeAndEnterpriseTool:
 
         # Treeview 样式（表格）
         self.style.configure("Treeview",
-                             font=("Microsoft YaHei UI", current_fonts["main"]),
-                             rowheight=max(28, current_fonts["main"] * 2.5),  # 行高随字体调整
+                             font=self.fonts["main"],
+                             rowheight=self.tree_row_height(self.scaled_font_sizes()),  # 行高随字体调整
                              background="white",
                              fieldbackground="white",
                              borderwidth=0)
         self.style.configure("Treeview.Heading",
-                             font=("Microsoft YaHei UI", current_fonts["bold"], "bold"),
+                             font=self.fonts["bold"],
                              background="#E1E4E8",
                              foreground="#333",
                              relief="flat")
         self.style.map("Treeview", background=[("selected", primary_color)])
 
-        # 如果是刷新样式，需要更新所有已创建的控件字体
-        if refresh:
-            self.update_all_widget_fonts(current_fonts)
-
-    def update_all_widget_fonts(self, current_fonts):
-        """更新所有已创建控件的字体大小"""
-        # 1. 更新所有Label控件
-        for widget in self.root.winfo_children():
-            self._recursive_update_widget(widget, current_fonts)
-
-        # 2. 更新Treeview的列宽（避免文字溢出）
-        if hasattr(self, "construction_tree"):
-            self.construction_tree.column("name", width=max(400, current_fonts["main"] * 40))  # 项目名称列加宽
-            self.construction_tree.column("unit_price", width=max(100, current_fonts["main"] * 10))
-            self.construction_tree.column("quantity", width=max(100, current_fonts["main"] * 10))
-            self.construction_tree.column("total", width=max(100, current_fonts["main"] * 10))
-        if hasattr(self, "material_tree"):
-            self.material_tree.column("name", width=max(400, current_fonts["main"] * 40))
-            self.material_tree.column("unit_price", width=max(100, current_fonts["main"] * 10))
-            self.material_tree.column("quantity", width=max(100, current_fonts["main"] * 10))
-            self.material_tree.column("total", width=max(100, current_fonts["main"] * 10))
-
-        # 3. 更新总金额标签字体
-        if hasattr(self, "lbl_total"):
-            self.lbl_total.config(font=("Microsoft YaHei UI", current_fonts["total_amount"], "bold"))
-
-        # 4. 更新状态标签字体
-        if hasattr(self, "status_label"):
-            self.status_label.config(font=("Microsoft YaHei UI", current_fonts["main"]))
-
-    def _recursive_update_widget(self, widget, current_fonts):
-        """递归遍历控件树，更新字体"""
-        widget_type = str(type(widget)).split(".")[-1].strip(">").strip("'")
-
-        # Label 控件
-        if widget_type == "Label":
-            if widget.cget("text") == "双击表格行可快速修改工程量":
-                # 小字体提示
-                widget.config(font=("Microsoft YaHei UI", current_fonts["small"]))
-            else:
-                widget.config(font=("Microsoft YaHei UI", current_fonts["main"]))
-
-        # Entry 控件
-        elif widget_type == "Entry":
-            widget.config(font=("Microsoft YaHei UI", current_fonts["main"]))
-
-        # Button 控件（tk.Button，非ttk.Button）
-        elif widget_type == "Button":
-            widget.config(font=("Microsoft YaHei UI", current_fonts["main"]))
-
-        # DateEntry 控件（第三方控件）
-        elif widget_type == "DateEntry":
-            widget.config(font=("Microsoft YaHei UI", current_fonts["main"]))
-
-        # 递归处理子控件
-        for child in widget.winfo_children():
-            self._recursive_update_widget(child, current_fonts)
+    @staticmethod
+    def tree_row_height(sizes):
+        return int(max(28, sizes["main"] * 2.5))
+
+    def apply_font_scale(self):
+        """按当前缩放比例修改命名字体、表格行高与列宽（只需少量configure调用，与控件数量无关）"""
+        sizes = self.scaled_font_sizes()
+        for key, font in self.fonts.items():
+            font.configure(size=sizes[key])
+        for name in DEFAULT_NAMED_FONTS:
+            tkfont.nametofont(name).configure(size=sizes["main"])
+        self.style.configure("Treeview", rowheight=self.tree_row_height(sizes))
+
+        # Treeview的列宽（避免文字溢出）
+        for tree in (self.construction_tree, self.material_tree):
+            tree.column("name", width=max(400, sizes["main"] * 40))  # 项目名称列加宽
+            for column in ("unit_price", "quantity", "total"):
+                tree.column(column, width=max(100, sizes["main"] * 10))
+            # 虚拟滚动表格按新行高重新计算可见行
+            if isinstance(tree, VirtualTreeview):
+                tree.schedule_render()
 
     # ===================== GUI界面布局（保留全局滚动） =====================
     def setup_ui(self):
@@ -235,8 +290,8 @@ class HomeAndEnterpriseTool:
         ttk.Entry(input_frame_1, textvariable=self.project_name_var, width=35).pack(side=tk.LEFT, padx=(0, 15))
 
         ttk.Label(input_frame_1, text="项目日期：").pack(side=tk.LEFT)
-        self.date_entry = DateEntry(input_frame_1, width=12, background="#0078D7", foreground="white",
-                                    date_pattern="yyyy年MM月dd日")
+        self.date_entry = LazyDateEntry(input_frame_1, width=12, background="#0078D7", foreground="white",
+                                         date_pattern="yyyy年MM月dd日")  # 首帧后换成DateEntry
         self.date_entry.pack(side=tk.LEFT, padx=(0, 15))
 
         ttk.Label(input_frame_1, text="实施周期：").pack(side=tk.LEFT)
@@ -253,6 +308,29 @@ class HomeAndEnterpriseTool:
         ttk.Button(btn_frame, text="📝 字体还原", command=self.font_restore, style="Accent.TButton", width=8).pack(
             side=tk.LEFT, padx=2)
 
+        # 已保存项目（仅SQLite存储）：切换、新建、删除
+        if self.db is not None:
+            project_frame = ttk.Frame(top_frame)
+            project_frame.pack(fill=tk.X, padx=10, pady=(0, 5))
+            ttk.Label(project_frame, text="已保存项目：").pack(side=tk.LEFT)
+            self.project_combo = ttk.Combobox(project_frame, state="readonly", width=45)
+            self.project_combo.pack(side=tk.LEFT, padx=(0, 10))
+            self.project_combo.bind("<<ComboboxSelected>>", self.on_project_selected)
+            ttk.Button(project_frame, text="➕ 新建项目", command=self.new_project, style="Accent.TButton").pack(
+                side=tk.LEFT, padx=2)
+            ttk.Button(project_frame, text="🗑️ 删除项目", command=self.delete_project).pack(side=tk.LEFT, padx=2)
+            ttk.Label(project_frame, text="状态：").pack(side=tk.LEFT, padx=(10, 0))
+            self.status_combo = ttk.Combobox(project_frame, state="readonly", width=8, values=PROJECT_STATUSES)
+            self.status_combo.set(PROJECT_STATUSES[0])
+            self.status_combo.pack(side=tk.LEFT, padx=(0, 10))
+            self.status_combo.bind("<<ComboboxSelected>>", lambda e: self.save_budget_data())
+            ttk.Button(project_frame, text="📊 汇总报表", command=self.export_rollup).pack(side=tk.LEFT, padx=2)
+
+            # 项目名称、日期、周期变化时一并保存
+            self.project_name_var.trace_add("write", lambda *args: self.save_budget_data())
+            self.cycle_var.trace_add("write", lambda *args: self.save_budget_data())
+            self.date_entry.bind("<<DateEntrySelected>>", lambda e: self.save_budget_data())
+
         ttk.Separator(top_frame, orient=tk.HORIZONTAL).pack(fill=tk.X, padx=10, pady=5)
 
         # 第二行：基础信息
@@ -294,18 +372,38 @@ class HomeAndEnterpriseTool:
                          ("🗑️ 删除", self.delete_selected_project)]:
             ttk.Button(tool_bar, text=txt, command=cmd, style="Accent.TButton", width=10).pack(side=tk.LEFT, padx=3)
 
+        ttk.Button(tool_bar, text="↶ 撤销", command=self.undo, width=8).pack(side=tk.LEFT, padx=(12, 3))
+        ttk.Button(tool_bar, text="↷ 重做", command=self.redo, width=8).pack(side=tk.LEFT, padx=3)
+
         ttk.Button(tool_bar, text="📤 导出Excel", command=self.export_budget_to_excel).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(tool_bar, text="📥 导入工程量", command=self.import_quantities).pack(side=tk.RIGHT, padx=5)
+
+        # 搜索框：按项目名称实时筛选两个表格
+        search_bar = ttk.Frame(budget_frame)
+        search_bar.pack(fill=tk.X, padx=5, pady=(0, 5))
+        ttk.Label(search_bar, text="🔍 搜索项目：").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(search_bar, textvariable=self.search_var, width=40)
+        self.search_entry.pack(side=tk.LEFT, padx=(0, 10))
+        self.search_entry.bind("<Return>", self.on_search_enter)
+        self.search_entry.bind("<Down>", self.on_search_down)
+        self.search_entry.bind("<Escape>", lambda e: self.search_var.set(""))
+        self.search_info_var = tk.StringVar()
+        ttk.Label(search_bar, textvariable=self.search_info_var, foreground="#888",
+                  font=self.fonts["small"]).pack(side=tk.LEFT)
+        self.search_var.trace_add("write", lambda *args: self.apply_search())
 
         # 标签页 (Tab)
-        notebook = ttk.Notebook(budget_frame)
+        self.notebook = notebook = ttk.Notebook(budget_frame)
         notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=0)
 
-        # 施工项目表格
-        self.construction_tree = self.create_scrolled_tree(notebook, "施工项目")
+        # 施工项目表格（项目较多时使用虚拟滚动表格；预算表尚未建立，按读取的行数判断）
+        virtual = self._startup_rows() >= VIRTUAL_TREE_MIN_ROWS
+        self.construction_tree = self.create_scrolled_tree(notebook, "施工项目", virtual)
         notebook.add(self.construction_tree.master, text="  🚧 施工项目  ")
 
         # 材料项目表格
-        self.material_tree = self.create_scrolled_tree(notebook, "材料项目")
+        self.material_tree = self.create_scrolled_tree(notebook, "材料项目", virtual)
         notebook.add(self.material_tree.master, text="  🔩 材料项目  ")
 
         # 总金额条
@@ -313,11 +411,11 @@ class HomeAndEnterpriseTool:
         total_bar.pack(fill=tk.X, padx=10, pady=5)
         self.total_var = tk.StringVar(value="当前总金额：0.00元")
         self.lbl_total = ttk.Label(total_bar, textvariable=self.total_var,
-                                   font=("Microsoft YaHei UI", BASE_FONT_SIZES["total_amount"], "bold"),
+                                   font=self.fonts["total_amount"],
                                    foreground="#D32F2F")
         self.lbl_total.pack(side=tk.RIGHT)
-        ttk.Label(total_bar, text="双击表格行可快速修改工程量", foreground="#888",
-                  font=("Microsoft YaHei UI", BASE_FONT_SIZES["small"])).pack(
+        ttk.Label(total_bar, text="双击表格行（或选中后回车）可快速修改工程量；搜索框中回车修改选中的搜索结果", foreground="#888",
+                  font=self.fonts["small"]).pack(
             side=tk.LEFT)
 
         # --- 3. 底部区域：模板与生成 ---
@@ -359,13 +457,12 @@ class HomeAndEnterpriseTool:
         self.generate_btn = ttk.Button(action_frame, text="🚀 一键生成申请表 + 会审单", command=self.generate_documents,
                                        style="Generate.TButton")
         self.generate_btn.pack(side=tk.RIGHT, padx=10)
+        self.cancel_btn = ttk.Button(action_frame, text="✖ 取消生成", command=self.cancel_generation)  # 生成时才显示
 
         self.status_label = ttk.Label(action_frame, textvariable=self.status_var, foreground="#0078D7",
-                                      font=("Microsoft YaHei UI", BASE_FONT_SIZES["main"]))
+                                      font=self.fonts["main"])
         self.status_label.pack(side=tk.LEFT, padx=10)
 
-        self.refresh_treeviews()
-
     # ===================== 全局滚动相关函数 =====================
     def on_main_container_configure(self, event):
         """更新Canvas的滚动区域为内容的实际大小"""
@@ -398,25 +495,23 @@ class HomeAndEnterpriseTool:
 
     def update_font_size(self):
         """更新字体大小并刷新界面"""
-        # 重新配置样式（传入refresh=True表示刷新）
-        self.setup_style(refresh=True)
-        # 刷新表格数据（确保表格内容字体同步更新）
-        self.refresh_treeviews()
+        self.apply_font_scale()
         # 更新状态提示
         self.status_var.set(f"✅ 字体已调整至{int(self.font_scale * 100)}%")
 
     # ===================== 辅助UI构建函数 =====================
-    def create_scrolled_tree(self, parent, category):
-        """创建一个带滚动条的Treeview容器"""
+    def create_scrolled_tree(self, parent, category, virtual=False):
+        """创建一个带滚动条的Treeview容器（virtual=True时只生成可见区域的行）"""
         frame = ttk.Frame(parent)
 
         vscroll = ttk.Scrollbar(frame, orient=tk.VERTICAL)
         hscroll = ttk.Scrollbar(frame, orient=tk.HORIZONTAL)
 
         columns = ["id", "name", "unit_price", "quantity", "total"]
-        tree = ttk.Treeview(frame, columns=columns, show="headings",
-                            yscrollcommand=vscroll.set, xscrollcommand=hscroll.set,
-                            selectmode="browse")
+        tree_class = VirtualTreeview if virtual else ttk.Treeview
+        tree = tree_class(frame, columns=columns, show="headings",
+                          yscrollcommand=vscroll.set, xscrollcommand=hscroll.set,
+                          selectmode="browse")
 
         vscroll.config(command=tree.yview)
         hscroll.config(command=tree.xview)
@@ -442,42 +537,222 @@ class HomeAndEnterpriseTool:
         # 行颜色交替
         tree.tag_configure("oddrow", background="white")
         tree.tag_configure("evenrow", background="#F8F9FA")
+        tree.tag_configure("search_hit", background="#FFF3C4")  # 后配置的标签优先，覆盖斑马纹
 
-        # 双击修改工程量
+        # 双击或回车修改工程量
         tree.bind("<Double-1>", self.edit_quantity)
+        tree.bind("<Return>", self.edit_quantity)
         return tree
 
-    # ===================== 原有逻辑功能（无修改） =====================
+    # ===================== 预算数据保存 =====================
     def save_budget_data(self):
-        try:
-            with open(BUDGET_DATA_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.budget_data, f, ensure_ascii=False, indent=2)
+        """请求保存预算数据（后台线程合并写入，完成后在状态栏提示）"""
+        self.autosaver.request()
+
+    def _budget_snapshot(self):
+        """在主线程复制待保存的数据（预算表只整列复制，字典在后台线程生成；SQLite存储时预算表未变化则不重写）"""
+        if self.db is None:
+            return self.budget_data.snapshot()
+
+        snapshot = {"items": None, "projects": {}}
+        price_key = self._price_key()
+        if price_key != self._saved_price_key:  # 上次写入尚未确认或失败时再写一次
+            snapshot["items"] = self.budget_data.snapshot()
+            snapshot["price_key"] = price_key
+        if self.project_id is not None:
+            snapshot["projects"][self.project_id] = {
+                "name": self.project_name_var.get().strip(),
+                "project_date": self.date_entry.get(),
+                "cycle": self.cycle_var.get().strip(),
+                "county": self.base_info.get("申请单位", "").strip(),
+                "status": self.status_combo.get(),
+                "quantities": self.budget_data.quantities(),
+            }
+        return snapshot
+
+    def set_budget_table(self, table):
+        """整体替换预算表（重新导入、首次建立）"""
+        self.budget_data = table
+        self._table_serial += 1
+
+    def _price_key(self):
+        """预算表版本：整体替换后，或新增、删除、修改名称/单价等之后不同（只改工程量时不变）"""
+        return self._table_serial, self.budget_data.price_version
+
+    def write_budget_json(self, snapshot):
+        """（后台保存线程）把预算表列快照转换为字典后写入budget_data.json"""
+        from budget_store import snapshot_records
+        atomic_write_json(BUDGET_DATA_FILE, snapshot_records(snapshot))
+
+    def write_budget_db(self, snapshot):
+        """（后台保存线程）把预算表列快照转换为字典后写入数据库"""
+        from budget_store import snapshot_records
+        if snapshot["items"] is not None:
+            snapshot = dict(snapshot, items=snapshot_records(snapshot["items"]))
+        self.db.save_snapshot(snapshot)
+        if snapshot["items"] is not None:
+            self._written_price_key = snapshot["price_key"]
+
+    def on_budget_saved(self, error):
+        if error is None:
+            self._saved_price_key = self._written_price_key
             self.status_var.set("✅ 预算数据已保存到本地")
-        except Exception as e:
-            messagebox.showerror("数据保存失败", f"错误原因：{str(e)}")
-
-    def load_budget_data(self):
-        if os.path.exists(BUDGET_DATA_FILE):
+        else:
+            messagebox.showerror("数据保存失败", f"错误原因：{str(error)}")
+
+    def on_close(self):
+        """关闭窗口前取消后台生成并等待未完成的保存"""
+        if self.doc_job is not None:
+            self.doc_job.cancel()
+        self.autosaver.close()
+        self.root.destroy()
+
+    def read_local_items(self):
+        """（首帧之前）读取本地预算数据为字典列表；SQLite存储时数据库为空则读取budget_data.json"""
+        self._import_json = False  # SQLite存储时是否需要把budget_data.json导入数据库
+        items = self.db.load_items() if self.db is not None else []
+        if not items and os.path.exists(BUDGET_DATA_FILE):
             try:
-                with open(BUDGET_DATA_FILE, "r", encoding="utf-8") as f:
-                    self.budget_data = json.load(f)
-                for item in self.budget_data:
-                    item["quantity"] = 0.0
-                    item["total"] = 0.0
-                for idx, item in enumerate(self.budget_data):
-                    item["id"] = idx + 1
+                items = read_budget_file(BUDGET_DATA_FILE)
+                self._import_json = self.db is not None
             except Exception as e:
                 messagebox.showwarning("本地数据加载失败", f"将重新导入Excel：{str(e)}")
-                self.budget_data = []
-        else:
-            self.budget_data = []
+                items = []
+        return items
+
+    def _startup_rows(self):
+        """启动时预算表的行数：本地数据为空时取快照头部记录的行数（不解码快照）"""
+        if self._startup_items: return len(self._startup_items)
+        header, _ = price_snapshot.read_snapshot(decode=False)
+        return header["count"] if header else 0
+
+    def load_budget_data(self, items):
+        """（首帧之后）建立预算表；numpy在窗口显示前已开始在后台导入"""
+        from budget_store import BudgetTable
+        self.set_budget_table(BudgetTable(items))
+        if self.db is None: return
+        if self._import_json:
+            self.db.replace_items(self.budget_data.to_list())
+        self._saved_price_key = self._written_price_key = self._price_key()
+        if self.budget_data and not self.db.list_price_versions():  # 首次启用版本记录时，以现有预算表作为第一个版本
+            import price_versions
+            price_versions.save_version(self.db, self.budget_data, "初始预算表")
+
+    def load_price_snapshot(self):
+        """读取预算表快照：本地没有预算数据时直接使用（不再要求选择预算表），来源预算表有变化时自动重新解析"""
+        try:
+            result = price_snapshot.load_price_book(decode=not self.budget_data)  # 本地已有数据时只检查来源
+        except Exception as e:
+            messagebox.showwarning("预算表重新解析失败", f"继续使用本地数据：{str(e)}")
+            return
+        if result is None: return
+        items, source, reparsed = result
+        if not reparsed and self.budget_data: return
+        from budget_store import BudgetTable
+        self.set_budget_table(BudgetTable(carry_over_ids(items, self.budget_data)))
+        self.save_budget_data()
+        if reparsed:
+            self.write_price_snapshot(source)
+            changes = self.record_price_version(source)
+            self.status_var.set(f"✅ 预算表已变化，已重新加载{len(self.budget_data)}个项目" + (f"（{changes}）" if changes else ""))
+
+    def write_price_snapshot(self, source_path):
+        try:
+            price_snapshot.write_snapshot(self.budget_data, source_path)
+        except Exception as e:
+            self.status_var.set(f"⚠️ 预算表快照保存失败：{str(e)}")
+
+    def record_price_version(self, source):
+        """（SQLite存储时）把当前预算表保存为新版本，返回与上一版本比较的摘要（无上一版本或无变化时为空）"""
+        if self.db is None: return ""
+        try:
+            import price_versions
+            previous = self.db.list_price_versions()
+            version_id, created = price_versions.save_version(self.db, self.budget_data,
+                                                              os.path.basename(source), os.path.abspath(source))
+            if not created or not previous: return ""
+            return price_versions.diff_summary(price_versions.diff_versions(self.db, previous[-1]["id"], version_id))
+        except Exception as e:
+            self.status_var.set(f"⚠️ 预算表版本保存失败：{str(e)}")
+            return ""
+
+    # ===================== 已保存项目（SQLite存储） =====================
+    def refresh_project_list(self):
+        projects = self.db.list_projects()
+        self._project_ids = [project_id for project_id, _ in projects]
+        self.project_combo["values"] = [f"{name}（#{project_id}）" for project_id, name in projects]
+        if self.project_id in self._project_ids:
+            self.project_combo.current(self._project_ids.index(self.project_id))
+
+    def open_project(self, project_id):
+        """切换到已保存项目：一次查询读取其工程量，只刷新工程量有变化的行"""
+        self.autosaver.flush()  # 先提交当前项目未保存的修改
+        info, quantities = self.db.load_project(int(project_id)) if project_id else (None, {})
+        if info is None:  # 项目不存在（如首次使用）时新建一个
+            project_id = self.db.create_project(self.project_name_var.get().strip(), self.date_entry.get(),
+                                                self.cycle_var.get().strip())
+            info, quantities = self.db.load_project(project_id)
+
+        changed = self.budget_data.set_quantities(quantities)
+        self.history.clear()  # 撤销记录只属于原项目
+
+        self.project_id = int(project_id)
+        self.project_name_var.set(info["name"])
+        if info["project_date"]:
+            try:
+                self.date_entry.set_date(info["project_date"])
+            except Exception:
+                pass
+        if info["cycle"]:
+            self.cycle_var.set(info["cycle"])
+        self.status_combo.set(info["status"])
+        self.autosaver.flush()  # 上面设置项目信息触发的保存请求属于新项目，无需等待计时
+
+        self.db.set_meta("current_project", self.project_id)
+        self.refresh_treeviews(changed)
+        self.refresh_project_list()
+        self.status_var.set(f"✅ 已打开项目：{info['name']}")
+
+    def on_project_selected(self, event):
+        index = self.project_combo.current()
+        if index >= 0 and self._project_ids[index] != self.project_id:
+            self.open_project(self._project_ids[index])
+
+    def new_project(self):
+        name = simpledialog.askstring("新建项目", "项目名称：", initialvalue=self.project_name_var.get())
+        if not name: return
+        self.autosaver.flush()
+        project_id = self.db.create_project(name.strip(), self.date_entry.get(), self.cycle_var.get().strip())
+        self.open_project(project_id)
+
+    def delete_project(self):
+        if self.project_id is None: return
+        if not messagebox.askyesno("删除项目", f"确定删除项目“{self.project_name_var.get()}”及其工程量？"):
+            return
+        self.autosaver.flush()
+        self.db.delete_project(self.project_id)
+        self.project_id = None
+        remaining = self.db.list_projects()
+        self.open_project(remaining[0][0] if remaining else None)
+
+    def export_rollup(self):
+        """导出全部已保存项目的汇总表（按县、按项目、材料采购清单等，见rollup.py）"""
+        save_path = filedialog.asksaveasfilename(
+            title="导出汇总报表", defaultextension=".xlsx",
+            filetypes=[("Excel文件", "*.xlsx")],
+            initialfile=f"成本项目汇总_{datetime.now().strftime('%Y%m%d')}.xlsx"
+        )
+        if not save_path: return
+        self.autosaver.flush()  # 先保存当前项目，汇总才包含最新工程量
+        try:
+            import rollup  # pandas、openpyxl首次汇总时才导入
+            count = rollup.export_rollup(rollup.build_rollup(self.db), save_path)
+            messagebox.showinfo("成功", f"已汇总{count}个项目！")
+        except Exception as e:
+            messagebox.showerror("失败", str(e))
 
     def load_config(self):
-        default_info = {
-            "申请单位": "奇台县分公司", "申请人": "樊斌", "联系电话": "13909949883",
-            "实施单位": "中移建设", "项目经理": "吴斌", "项目经理联系电话": "18899661100",
-            "项目负责人": "樊斌"
-        }
+        default_info = dict(DEFAULT_BASE_INFO)
         if os.path.exists(CONFIG_FILE):
             try:
                 with open(CONFIG_FILE, "r", encoding="utf-8") as f:
@@ -509,99 +784,94 @@ class HomeAndEnterpriseTool:
             return
 
         try:
-            sheet1 = pd.read_excel(file_path, sheet_name=0)
-            if sheet1.empty: raise ValueError("Sheet1为空")
-            sheet1_data = self.parse_sheet1(sheet1)
-
-            sheet2 = pd.read_excel(file_path, sheet_name=1)
-            if sheet2.empty: raise ValueError("Sheet2为空")
-            sheet2_data = self.parse_sheet2(sheet2)
-
-            self.budget_data = sheet1_data + sheet2_data
-            for idx, item in enumerate(self.budget_data):
-                item["id"] = idx + 1
+            from budget_store import BudgetTable
+            self.set_budget_table(BudgetTable(carry_over_ids(read_price_book(file_path), self.budget_data)))
             self.save_budget_data()
-            messagebox.showinfo("加载成功", f"共加载{len(self.budget_data)}个项目")
+            self.write_price_snapshot(file_path)
+            changes = self.record_price_version(file_path)
+            messagebox.showinfo("加载成功", f"共加载{len(self.budget_data)}个项目" + (f"\n与上一版本相比：{changes}" if changes else ""))
         except Exception as e:
             messagebox.showerror("预算表加载失败", f"错误原因：{str(e)}")
 
-    def parse_sheet1(self, df):
-        parsed = []
-        df.columns = df.columns.str.strip()
-        required_cols = ["类别", "折扣后（含税）37%/元"]
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols: raise ValueError(f"Sheet1缺少必要列：{', '.join(missing_cols)}")
-
-        for _, row in df.iterrows():
-            project_name = str(row["类别"]).strip()
-            if not project_name or project_name == "nan": continue
-            unit_price = float(pd.to_numeric(row["折扣后（含税）37%/元"], errors="coerce")) if pd.notna(
-                row["折扣后（含税）37%/元"]) else 0.0
-            is_length_unit = "元/公里" in project_name
-            parsed.append({
-                "id": len(parsed) + 1, "category": "施工项目", "name": project_name,
-                "unit": "公里" if is_length_unit else "个/户/处等",
-                "unit_price": unit_price, "quantity": 0.0, "total": 0.0, "is_length": is_length_unit
-            })
-        if not parsed: raise ValueError("Sheet1无有效数据")
-        return parsed
-
-    def parse_sheet2(self, df):
-        parsed = []
-        df.columns = df.columns.str.strip()
-        required_cols = ["材料", "含税"]
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols: raise ValueError(f"Sheet2缺少必要列：{', '.join(missing_cols)}")
-
-        for _, row in df.iterrows():
-            project_name = str(row["材料"]).strip()
-            if not project_name or project_name == "nan": continue
-            unit_price = float(pd.to_numeric(row["含税"], errors="coerce")) if pd.notna(row["含税"]) else 0.0
-            parsed.append({
-                "id": len(parsed) + 1, "category": "材料项目", "name": project_name,
-                "unit": "个", "unit_price": unit_price, "quantity": 0.0, "total": 0.0, "is_length": False
-            })
-        if not parsed: raise ValueError("Sheet2无有效数据")
-        return parsed
-
-    def refresh_treeviews(self):
-        """刷新表格数据（确保字体缩放后内容正常显示）"""
-        for item in self.construction_tree.get_children():
-            self.construction_tree.delete(item)
-        for item in self.material_tree.get_children():
-            self.material_tree.delete(item)
-
-        if not self.budget_data:
-            self.total_var.set(f"当前总金额：0.00元")
-            return
-
-        self.total_amount = 0.0
-        count_c = 0
-        count_m = 0
-
+    @staticmethod
+    def _row_values(item):
+        """表格一行的显示内容（不含序号列）"""
+        return (item["name"], f"{float(item['unit_price']):.2f}",
+                f"{float(item['quantity']):.2f}", f"{item['total']:.2f}")
+
+    def refresh_treeviews(self, items=None):
+        """增量刷新表格：只更新数据有变化的行，增删行时才重排序号与斑马纹
+        items：本次修改过的项目（无增删时传入，只比对这些行）；为None时比对全部项目"""
+        self.total_amount = self.budget_data.total_amount  # 汇总随每次修改增量更新，无需重新累加
+        if items is None:
+            if self.search_hits is not None:  # 增删行按全部行计算位置，先取消筛选，比对后再重新搜索
+                for tree in (self.construction_tree, self.material_tree):
+                    self._filter_tree(tree, None)
+            self._diff_treeviews()
+        else:
+            for item in items:
+                row = self.tree_rows.get(item["id"])
+                if row is None: continue
+                tree, ordinal, old_values = row
+                values = self._row_values(item)
+                if values != old_values:
+                    tree.item(str(item["id"]), values=(ordinal,) + values)
+                    self.tree_rows[item["id"]] = (tree, ordinal, values)
+        subtotals = "，".join(f"{category}{self.budget_data.category_fen.get(category, 0) / 100:.2f}元"
+                              for category in ("施工项目", "材料项目"))
+        self.total_var.set(f"当前总金额：{self.total_amount:.2f}元（{subtotals}；"
+                           f"工程量不为0的项目{self.budget_data.nonzero_count}项）")
+        if self.search_hits is not None:
+            self.apply_search()
+
+    def _diff_treeviews(self):
+        """按项目ID比对表格现有行：删除多余行、插入新行、更新内容有变化的行"""
+        restripe_from = {}  # 表格 -> 需要重排序号与斑马纹的起始行号
+
+        def mark_restripe(tree, index):
+            restripe_from[tree] = min(restripe_from.get(tree, index), index)
+
+        # 先删除已不存在的项目，保证后续插入位置准确
+        for item_id in [k for k in self.tree_rows if k not in self.budget_data]:
+            tree, ordinal, _ = self.tree_rows.pop(item_id)
+            mark_restripe(tree, ordinal - 1)
+            tree.delete(str(item_id))
+
+        positions = {self.construction_tree: 0, self.material_tree: 0}
         for item in self.budget_data:
-            total = float(item["quantity"]) * float(item["unit_price"])
-            item["total"] = total
-            self.total_amount += total
-
-            quantity_str = f"{float(item['quantity']):.2f}"
-            unit_price_str = f"{float(item['unit_price']):.2f}"
-            total_str = f"{total:.2f}"
-
-            values = [item["id"], item["name"], unit_price_str, quantity_str, total_str]
-
-            if item["category"] == "施工项目":
-                tag = "evenrow" if count_c % 2 == 0 else "oddrow"
-                self.construction_tree.insert("", tk.END, values=values, tags=(tag,))
-                count_c += 1
+            tree = self.construction_tree if item["category"] == "施工项目" else self.material_tree
+            pos = positions[tree]
+            positions[tree] = pos + 1
+            values = self._row_values(item)
+
+            row = self.tree_rows.get(item["id"])
+            if row is None:
+                tree.insert("", pos, iid=str(item["id"]), values=(pos + 1,) + values)
+                mark_restripe(tree, pos)
+            elif values != row[2]:
+                tree.item(str(item["id"]), values=(row[1],) + values)
             else:
-                tag = "evenrow" if count_m % 2 == 0 else "oddrow"
-                self.material_tree.insert("", tk.END, values=values, tags=(tag,))
-                count_m += 1
-
-        self.total_var.set(f"当前总金额：{self.total_amount:.2f}元")
-
-    # 以下为原有功能函数（add_construction_project、add_material_project等），无修改
+                continue
+            self.tree_rows[item["id"]] = (tree, pos + 1, values)
+
+        for tree, start in restripe_from.items():
+            self._restripe(tree, start)
+
+    @staticmethod
+    def _stripe_tag(ordinal):
+        return "evenrow" if (ordinal - 1) % 2 == 0 else "oddrow"
+
+    def _restripe(self, tree, start=0):
+        """从start行开始重新编排显示序号与行颜色交替"""
+        children = tree.get_children()
+        for idx in range(start, len(children)):
+            item_id = int(children[idx])
+            values = self.tree_rows[item_id][2]
+            self.tree_rows[item_id] = (tree, idx + 1, values)
+            tree.item(children[idx], values=(idx + 1,) + values,
+                      tags=(self._stripe_tag(idx + 1),))
+
+    # ===================== 预算项目增删改 =====================
     def add_construction_project(self):
         name = simpledialog.askstring("新增施工项目", "请输入项目名称：")
         if not name: return
@@ -613,9 +883,8 @@ class HomeAndEnterpriseTool:
         new_quantity = simpledialog.askfloat("新增施工项目", "请输入工程量：", initialvalue=0.0)
         quantity = new_quantity if new_quantity is not None else 0.0
 
-        new_id = len(self.budget_data) + 1
-        self.budget_data.append({
-            "id": new_id, "category": "施工项目", "name": name.strip(),
+        self.history.add(self.budget_data, f"新增施工项目：{name.strip()}", {
+            "category": "施工项目", "name": name.strip(),
             "unit": unit.strip(), "unit_price": unit_price, "quantity": quantity,
             "total": unit_price * quantity, "is_length": is_length
         })
@@ -633,9 +902,8 @@ class HomeAndEnterpriseTool:
         new_quantity = simpledialog.askfloat("新增材料项目", "请输入工程量：", initialvalue=0.0)
         quantity = new_quantity if new_quantity is not None else 0.0
 
-        new_id = len(self.budget_data) + 1
-        self.budget_data.append({
-            "id": new_id, "category": "材料项目", "name": name.strip(),
+        self.history.add(self.budget_data, f"新增材料项目：{name.strip()}", {
+            "category": "材料项目", "name": name.strip(),
             "unit": unit.strip(), "unit_price": unit_price, "quantity": quantity,
             "total": unit_price * quantity, "is_length": False
         })
@@ -643,46 +911,33 @@ class HomeAndEnterpriseTool:
         self.refresh_treeviews()
         self.status_var.set(f"✅ 新增材料项目：{name}")
 
+    def _focused_item_id(self):
+        """当前选中行对应的项目ID（表格行iid即项目ID），未选中返回None"""
+        for tree in (self.construction_tree, self.material_tree):
+            focus_item = tree.focus()
+            if focus_item and int(focus_item) in self.budget_data:
+                return int(focus_item)
+        return None
+
     def delete_selected_project(self):
-        selected_item = None
-        current_tree = None
-        if self.construction_tree.focus():
-            selected_item = self.construction_tree.focus()
-            current_tree = self.construction_tree
-        elif self.material_tree.focus():
-            selected_item = self.material_tree.focus()
-            current_tree = self.material_tree
-
-        if not selected_item:
+        project_id = self._focused_item_id()
+        if project_id is None:
             messagebox.showwarning("提示", "请先选中要删除的项目！")
             return
 
-        item_values = current_tree.item(selected_item)["values"]
-        project_id = int(item_values[0])
-        self.budget_data = [item for item in self.budget_data if item["id"] != project_id]
-        for idx, item in enumerate(self.budget_data): item["id"] = idx + 1
+        name = self.budget_data.get(project_id)["name"]
+        self.history.delete(self.budget_data, f"删除项目：{name}", project_id)
         self.save_budget_data()
         self.refresh_treeviews()
-        self.status_var.set(f"✅ 删除项目ID：{project_id}")
+        self.status_var.set(f"✅ 删除项目ID：{project_id}（{name}，Ctrl+Z可撤销）")
 
     def edit_project_info(self):
-        selected_item = None
-        current_tree = None
-        if self.construction_tree.focus():
-            selected_item = self.construction_tree.focus()
-            current_tree = self.construction_tree
-        elif self.material_tree.focus():
-            selected_item = self.material_tree.focus()
-            current_tree = self.material_tree
-
-        if not selected_item:
+        project_id = self._focused_item_id()
+        if project_id is None:
             messagebox.showwarning("提示", "请先选中要修改的项目！")
             return
 
-        item_values = current_tree.item(selected_item)["values"]
-        project_id = int(item_values[0])
-        target_item = next((item for item in self.budget_data if item["id"] == project_id), None)
-        if not target_item: return
+        target_item = self.budget_data.get(project_id)
 
         new_name = simpledialog.askstring("修改", "项目名称：", initialvalue=target_item["name"])
         if not new_name: return
@@ -691,65 +946,198 @@ class HomeAndEnterpriseTool:
         new_quantity = simpledialog.askfloat("修改", "工程量：", initialvalue=target_item["quantity"])
         if new_quantity is None: return
 
+        new_unit = simpledialog.askstring("修改", "单位：", initialvalue=target_item["unit"])
+        fields = {
+            "name": new_name.strip(), "unit_price": new_unit_price, "quantity": new_quantity,
+            "unit": new_unit.strip() if new_unit else target_item["unit"],
+        }
         if target_item["category"] == "施工项目":
-            new_unit = simpledialog.askstring("修改", "单位：", initialvalue=target_item["unit"])
-            target_item["unit"] = new_unit.strip() if new_unit else target_item["unit"]
-            new_is_length = simpledialog.askyesno("修改", "是否为长度类项目？", initialvalue=target_item["is_length"])
-            target_item["is_length"] = new_is_length
-        else:
-            new_unit = simpledialog.askstring("修改", "单位：", initialvalue=target_item["unit"])
-            target_item["unit"] = new_unit.strip() if new_unit else target_item["unit"]
-
-        target_item["name"] = new_name.strip()
-        target_item["unit_price"] = new_unit_price
-        target_item["quantity"] = new_quantity
-        target_item["total"] = new_unit_price * new_quantity
+            fields["is_length"] = simpledialog.askyesno("修改", "是否为长度类项目？",
+                                                        initialvalue=target_item["is_length"])
+        self.history.update(self.budget_data, f"修改项目：{fields['name']}", project_id, **fields)
 
         self.save_budget_data()
-        self.refresh_treeviews()
+        self.refresh_treeviews([target_item])
         self.status_var.set(f"✅ 修改项目ID：{project_id}")
 
     def edit_quantity(self, event):
-        tree = event.widget
-        focus_item = tree.focus()
-        if not focus_item: return
-        item_values = tree.item(focus_item)["values"]
-        try:
-            project_id = int(item_values[0])
-            current_quantity = float(item_values[3])
-        except:
-            return
+        focus_item = event.widget.focus()
+        if focus_item:
+            self.edit_item_quantity(int(focus_item))
 
-        new_quantity = simpledialog.askfloat("修改工程量", f"项目：{item_values[1]}\n请输入新工程量：",
-                                             initialvalue=current_quantity)
-        if new_quantity is None or new_quantity < 0: return
+    def edit_item_quantity(self, item_id):
+        item = self.budget_data.get(item_id)
+        if item is None: return
 
-        for item in self.budget_data:
-            if item.get("id") == project_id:
-                item["quantity"] = float(new_quantity)
-                item["total"] = float(new_quantity) * float(item["unit_price"])
-                break
+        new_quantity = simpledialog.askfloat("修改工程量", f"项目：{item['name']}\n请输入新工程量：",
+                                             initialvalue=float(item["quantity"]))
+        if new_quantity is None or new_quantity < 0: return
 
+        self.history.update(self.budget_data, f"修改工程量：{item['name']}", item["id"], quantity=float(new_quantity))
         self.save_budget_data()
-        self.refresh_treeviews()
+        self.refresh_treeviews([item])
         self.status_var.set(f"✅ 更新工程量：{new_quantity:.2f}")
 
+    # ===================== 撤销/重做 =====================
+    def undo(self, event=None):
+        self._replay(self.history.undo, "撤销", event)
+
+    def redo(self, event=None):
+        self._replay(self.history.redo, "重做", event)
+
+    def _replay(self, step, action, event):
+        """撤销/重做一步：与普通修改一样增量刷新表格并保存"""
+        if event is not None and isinstance(event.widget, (tk.Entry, ttk.Entry, tk.Text)):
+            return  # 在输入框中按Ctrl+Z不改动预算表
+        result = step(self.budget_data)
+        if result is None:
+            self.status_var.set(f"⚠️ 没有可{action}的修改")
+            return
+        label, changed, structural = result
+        self.save_budget_data()
+        self.refresh_treeviews(None if structural else changed)
+        self.status_var.set(f"✅ 已{action}：{label}")
+
+    # ===================== 项目搜索 =====================
+    def _current_tree(self):
+        """当前标签页中的表格"""
+        selected = self.notebook.select()
+        return self.material_tree if selected == str(self.material_tree.master) else self.construction_tree
+
+    def apply_search(self):
+        """按搜索框内容筛选两个表格：结果按匹配程度排序、匹配文字用【】标出并高亮；搜索框为空时显示全部行"""
+        query = self.search_var.get()
+        hits = self.budget_data.search(query)
+        trees = (self.construction_tree, self.material_tree)
+        if hits is None:
+            if self.search_hits is not None:
+                for tree in trees:
+                    self._filter_tree(tree, None)
+            self.search_hits = None
+            self._search_query = ""
+            self.search_info_var.set("")
+            return
+
+        shown = {tree: [] for tree in trees}
+        for item_id in hits:
+            row = self.tree_rows.get(item_id)
+            if row is not None:
+                shown[row[0]].append(str(item_id))
+        self.search_hits = shown
+        decorate = partial(self._decorate_hit, query)
+        for tree in trees:
+            self._filter_tree(tree, shown[tree], decorate)
+        self.search_info_var.set(f"施工项目{len(shown[self.construction_tree])}项，"
+                                 f"材料项目{len(shown[self.material_tree])}项" if hits else "无匹配项目")
+
+        if query != self._search_query:  # 输入变化时回到结果开头；当前标签页没有结果时切换到有结果的一页
+            self._search_query = query
+            for tree in trees:
+                tree.yview("moveto", 0)
+            current = self._current_tree()
+            if not shown[current]:
+                other = trees[1] if current is trees[0] else trees[0]
+                if shown[other]:
+                    self.notebook.select(other.master)
+
+    def _decorate_hit(self, query, iid, values, tags):
+        """搜索结果的显示内容：名称中的匹配文字加【】，连续匹配的行高亮"""
+        name = values[1]
+        span = match_span(name, query)
+        if span is None:
+            return values, tags
+        start, end = span
+        values = list(values)
+        values[1] = f"{name[:start]}【{name[start:end]}】{name[end:]}"
+        return values, list(tags) + ["search_hit"]
+
+    def _filter_tree(self, tree, iids, decorate=None):
+        """表格只显示iids中的行（按给定顺序，decorate(iid, values, tags)返回实际显示内容）；iids为None时显示全部行"""
+        if isinstance(tree, VirtualTreeview):
+            tree.filter(iids, decorate)
+            return
+        # 普通表格（项目较少）：先恢复全部行的顺序与原始内容，再只挂回搜索结果
+        rows = sorted((row[1], item_id, row[2]) for item_id, row in self.tree_rows.items() if row[0] is tree)
+        for ordinal, item_id, values in rows:
+            tree.move(str(item_id), "", ordinal - 1)
+            tree.item(str(item_id), values=(ordinal,) + values, tags=(self._stripe_tag(ordinal),))
+        if iids is None: return
+        tree.detach(*tree.get_children())
+        for pos, iid in enumerate(iids):
+            ordinal, values = self.tree_rows[int(iid)][1:]
+            values, tags = decorate(iid, (ordinal,) + values, (self._stripe_tag(ordinal),))
+            tree.move(iid, "", pos)
+            tree.item(iid, values=values, tags=tags)
+
+    def _selected_hit(self):
+        """回车要修改的搜索结果：当前表格中选中的结果，没有时为当前表格（或另一表格）的第一个结果"""
+        tree = self._current_tree()
+        focus_item = tree.focus()
+        if focus_item and focus_item in self.search_hits[tree]:
+            return tree, focus_item
+        for candidate in sorted(self.search_hits, key=lambda t: t is not tree):
+            if self.search_hits[candidate]:
+                return candidate, self.search_hits[candidate][0]
+        return None, None
+
+    def _select_row(self, tree, iid):
+        self.notebook.select(tree.master)
+        tree.see(iid)
+        tree.focus(iid)
+        tree.selection_set(iid)
+
+    def on_search_enter(self, event):
+        if not self.search_hits: return
+        tree, iid = self._selected_hit()
+        if iid is None: return
+        self._select_row(tree, iid)
+        self.edit_item_quantity(int(iid))
+
+    def on_search_down(self, event):
+        """在搜索框中按下方向键：选中第一个结果并把焦点移到表格，之后可用方向键选择、回车修改"""
+        if not self.search_hits: return
+        tree, iid = self._selected_hit()
+        if iid is None: return
+        self._select_row(tree, iid)
+        tree.focus_set()
+        return "break"
+
+    def import_quantities(self):
+        """从勘察表（Excel/CSV）批量导入工程量：一次匹配、一次刷新和保存，列出未匹配的行"""
+        path = filedialog.askopenfilename(
+            title="选择勘察表", filetypes=[("Excel/CSV文件", "*.xlsx *.xls *.csv"), ("所有文件", "*.*")])
+        if not path: return
+        try:
+            import quantity_import  # pandas首次导入时才加载
+            result = quantity_import.import_survey(path, self.budget_data)
+        except Exception as e:
+            messagebox.showerror("导入失败", f"错误原因：{str(e)}")
+            return
+
+        quantities = self.budget_data.quantities()
+        quantities.update(result["quantities"])  # 勘察表中没有的项目保持原工程量
+        changed = self.history.set_quantities(self.budget_data, "导入工程量", quantities)
+        if changed:
+            self.save_budget_data()
+        self.refresh_treeviews(changed)
+
+        summary = (f"已导入{len(result['quantities'])}个项目的工程量（名称完全一致{result['exact']}行，"
+                   f"规范化后一致{result['normalized']}行），其中{len(changed)}项有变化。")
+        problems = [f"第{line}行 {name}：未找到项目" for line, name, _ in result["unmatched"]]
+        problems += [f"第{line}行 {name}：工程量无效（{raw}）" for line, name, raw in result["invalid"]]
+        self.status_var.set(f"✅ {summary}" + (f"{len(problems)}行未导入" if problems else ""))
+        if problems:
+            shown = "\n".join(problems[:IMPORT_REPORT_LINES])
+            more = f"\n……等共{len(problems)}行" if len(problems) > IMPORT_REPORT_LINES else ""
+            messagebox.showwarning("部分行未导入", f"{summary}\n\n以下行未导入：\n{shown}{more}")
+        else:
+            messagebox.showinfo("导入成功", summary)
+
     def export_budget_to_excel(self):
-        export_data = [item for item in self.budget_data if item["quantity"] > 0]
-        if not export_data:
+        if not self.budget_data.nonzero_count:
             messagebox.showwarning("提示", "无工程量>0的项目可导出！")
             return
 
-        df = pd.DataFrame({
-            "序号": [item["id"] for item in export_data],
-            "类别": [item["category"] for item in export_data],
-            "项目名称": [item["name"] for item in export_data],
-            "单位": [item["unit"] for item in export_data],
-            "单价（元）": [item["unit_price"] for item in export_data],
-            "工程量": [item["quantity"] for item in export_data],
-            "合计（元）": [item["total"] for item in export_data]
-        })
-
         save_path = filedialog.asksaveasfilename(
             title="导出", defaultextension=".xlsx",
             filetypes=[("Excel文件", "*.xlsx")],
@@ -757,8 +1145,9 @@ class HomeAndEnterpriseTool:
         )
         if save_path:
             try:
-                df.to_excel(save_path, index=False)
-                messagebox.showinfo("成功", f"导出{len(export_data)}条数据！")
+                from budget_export import export_budget  # openpyxl首次导出时才导入
+                count = export_budget(self.budget_data.rows(nonzero=True), save_path)
+                messagebox.showinfo("成功", f"导出{count}条数据！")
             except Exception as e:
                 messagebox.showerror("失败", str(e))
 
@@ -781,11 +1170,13 @@ class HomeAndEnterpriseTool:
             filetypes=[("图片", "*.jpg;*.jpeg;*.png;*.bmp")]
         )
         if paths:
-            remaining = 12 - len(self.image_paths)
+            remaining = MAX_IMAGES - len(self.image_paths)
             if len(paths) > remaining:
                 paths = paths[:remaining]
             self.image_paths.extend(paths)
             self.image_count_var.set(f"{len(self.image_paths)}张")
+            import image_prep
+            image_prep.prefetch(paths, image_prep.image_dpi(self.base_info))  # 后台预处理，生成时直接使用
 
     def clear_images(self):
         self.image_paths.clear()
@@ -795,38 +1186,10 @@ class HomeAndEnterpriseTool:
         self.base_info[key] = value.strip()
 
     def generate_work_list(self):
-        work_list = []
-        for item in self.budget_data:
-            if item["quantity"] <= 0: continue
-            quantity = float(item["quantity"])
-            if item["is_length"]:
-                item_str = f"{quantity:.2f}公里 {item['name']}"
-            else:
-                item_str = f"{quantity:.2f}{item['unit']} {item['name']}"
-            work_list.append(item_str)
-        return "，".join(work_list) if work_list else "无有效项目"
-
-    def insert_images_to_cell(self, cell, image_paths):
-        if not image_paths: return
-        cell.text = ""
-        for img_path in image_paths:
-            try:
-                para = cell.add_paragraph()
-                run = para.add_run()
-                img = run.add_picture(img_path, width=MAX_IMG_WIDTH, height=MAX_IMG_HEIGHT)
-                para.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-            except:
-                pass
-
-    def find_cell_by_text(self, table, keyword_list):
-        for row_idx, row in enumerate(table.rows):
-            for col_idx, cell in enumerate(row.cells):
-                for keyword in keyword_list:
-                    if keyword in cell.text.strip():
-                        return (row_idx, col_idx, cell)
-        return (None, None, None)
+        return self.budget_data.work_list()
 
     def generate_documents(self):
+        if self.doc_job is not None: return
         if not self.word_app_template or not self.word_review_template:
             messagebox.showwarning("提示", "请先选择模板！")
             return
@@ -838,124 +1201,97 @@ class HomeAndEnterpriseTool:
         project_date = self.date_entry.get()
         cycle = self.cycle_var.get().strip()
 
-        try:
-            work_list = self.generate_work_list()
-            self.fill_application_form(project_name, project_date, cycle, work_list)
-            self.fill_review_form(project_name, project_date, cycle, work_list)
-            messagebox.showinfo("成功", "文档生成完成！")
-            self.status_var.set(f"✅ 生成成功！金额：{self.total_amount:.2f}元")
-        except Exception as e:
-            messagebox.showerror("失败", str(e))
-
-    def fill_application_form(self, project_name, project_date, cycle, work_list):
-        doc = Document(self.word_app_template)
-        target_table = doc.tables[0]
-
-        fill_items = [
-            (0, 1, self.base_info["申请单位"], WD_PARAGRAPH_ALIGNMENT.LEFT),
-            (0, 3, project_date, WD_PARAGRAPH_ALIGNMENT.CENTER),
-            (0, 4, project_date, WD_PARAGRAPH_ALIGNMENT.CENTER),
-            (0, 6, self.base_info["申请人"], WD_PARAGRAPH_ALIGNMENT.LEFT),
-            (1, 6, self.base_info["联系电话"], WD_PARAGRAPH_ALIGNMENT.LEFT),
-            (2, 1, cycle, WD_PARAGRAPH_ALIGNMENT.LEFT),
-            (2, 3, f"{self.total_amount:.2f}元", WD_PARAGRAPH_ALIGNMENT.CENTER),
-            (2, 4, f"{self.total_amount:.2f}元", WD_PARAGRAPH_ALIGNMENT.CENTER),
-        ]
-        for r, c, t, a in fill_items:
-            try:
-                cell = target_table.cell(r, c)
-                cell.text = t
-                for p in cell.paragraphs: p.alignment = a
-            except:
-                pass
-
-        name_row, name_col, _ = self.find_cell_by_text(target_table, ["维修项目名称", "项目名称"])
-        if name_row is None: name_row, name_col = 1, 1
-        name_fill_col = min(name_col + 1, len(target_table.columns) - 1)
-        cell = target_table.cell(name_row, name_fill_col)
-        cell.text = project_name
-        for p in cell.paragraphs:
-            p.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-            for r in p.runs: r.font.size = Pt(10)
-
-        list_row, list_col, _ = self.find_cell_by_text(target_table, ["工作量及材料清单", "工作量", "清单"])
-        if list_row is None: list_row, list_col = max(0, len(target_table.rows) - 3), 0
-        list_fill_col = min(list_col + 1, len(target_table.columns) - 1)
-        cell = target_table.cell(list_row, list_fill_col)
-        cell.text = work_list
-        for p in cell.paragraphs:
-            p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-            for r in p.runs: r.font.size = Pt(9)
-
-        row, col, _ = self.find_cell_by_text(target_table, ["其他需求支撑文件"])
-        if row is not None:
-            target_col = col + 1 if (col + 1) < len(target_table.columns) else len(target_table.columns) - 1
-            self.insert_images_to_cell(target_table.cell(row, target_col), self.image_paths)
-        else:
-            self.insert_images_to_cell(
-                target_table.cell(max(0, len(target_table.rows) - 2), len(target_table.columns) - 1), self.image_paths)
-
-        save_path = filedialog.asksaveasfilename(
+        # 先选好保存位置，生成过程中不再弹出对话框
+        app_path = filedialog.asksaveasfilename(
             title="保存申请表", defaultextension=".docx", filetypes=[("Word文件", "*.docx")],
             initialfile=f"{project_name}_申请表.docx"
         )
-        if save_path: doc.save(save_path)
-
-    def fill_review_form(self, project_name, project_date, cycle, work_list):
-        doc = Document(self.word_review_template)
-        target_table = doc.tables[0]
-
-        fill_items = [
-            (1, 1, f"{self.total_amount:.2f}元", WD_PARAGRAPH_ALIGNMENT.CENTER),
-            (1, 5, project_date, WD_PARAGRAPH_ALIGNMENT.CENTER),
-            (1, 9, cycle, WD_PARAGRAPH_ALIGNMENT.CENTER),
-            (2, 1, self.base_info["项目负责人"], WD_PARAGRAPH_ALIGNMENT.CENTER),
-            (2, 5, self.base_info["联系电话"], WD_PARAGRAPH_ALIGNMENT.CENTER),
-            (3, 1, self.base_info["实施单位"], WD_PARAGRAPH_ALIGNMENT.CENTER),
-            (3, 5, self.base_info["项目经理"], WD_PARAGRAPH_ALIGNMENT.CENTER),
-            (3, 9, self.base_info["项目经理联系电话"], WD_PARAGRAPH_ALIGNMENT.CENTER),
-        ]
-        for r, c, t, a in fill_items:
-            try:
-                target_table.cell(r, c).text = t
-            except:
-                pass
-
-        name_row, name_col, _ = self.find_cell_by_text(target_table, ["维修项目名称", "项目名称"])
-        if name_row is None: name_row, name_col = 0, 1
-        name_fill_col = min(name_col + 1, len(target_table.columns) - 1)
-        cell = target_table.cell(name_row, name_fill_col)
-        cell.text = project_name
-        for p in cell.paragraphs:
-            p.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-            for r in p.runs: r.font.size = Pt(10)
-
-        list_row, list_col, _ = self.find_cell_by_text(target_table, ["主要工作量及材料清单", "工作量", "清单"])
-        if list_row is None: list_row, list_col = max(0, len(target_table.rows) - 2), 0
-        list_fill_col = min(list_col + 1, len(target_table.columns) - 1)
-        cell = target_table.cell(list_row, list_fill_col)
-        cell.text = f"工作量：{work_list}"
-        for p in cell.paragraphs:
-            p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-            for r in p.runs: r.font.size = Pt(9)
-
-        plan_row, plan_col, _ = self.find_cell_by_text(target_table, ["施工方实施计划"])
-        if plan_row is None: plan_row, plan_col = list_row + 1, list_col
-        plan_fill_col = min(plan_col + 1, len(target_table.columns) - 1)
-        cell = target_table.cell(plan_row, plan_fill_col)
-        cell.text = f"我方计划安排1辆车2人在{cycle}完成施工。"
-        for p in cell.paragraphs:
-            p.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-            for r in p.runs: r.font.size = Pt(9)
-
-        save_path = filedialog.asksaveasfilename(
+        review_path = filedialog.asksaveasfilename(
             title="保存会审单", defaultextension=".docx", filetypes=[("Word文件", "*.docx")],
-            initialfile=f"{project_name}_会审单.docx"
+            initialfile=f"{project_name}_会审单.docx",
+            initialdir=os.path.dirname(app_path) if app_path else None
         )
-        if save_path: doc.save(save_path)
+
+        import doc_forms  # python-docx首次生成时才导入
+
+        # 后台线程只使用这里取好的数据副本
+        work_list = self.generate_work_list()
+        base_info = dict(self.base_info)
+        tasks = []
+        if app_path:
+            tasks.append(("申请表", partial(doc_forms.fill_application_form, self.word_app_template, base_info,
+                                            project_name, project_date, cycle, work_list, self.total_amount,
+                                            list(self.image_paths)), app_path))
+        if review_path:
+            tasks.append(("会审单", partial(doc_forms.fill_review_form, self.word_review_template, base_info,
+                                            project_name, project_date, cycle, work_list, self.total_amount),
+                          review_path))
+        if not tasks: return
+
+        self.doc_progress = {name: "等待中" for name, _, _ in tasks}
+        self.generate_btn.state(["disabled"])
+        self.cancel_btn.pack(side=tk.RIGHT, padx=(0, 5))
+        self.show_generation_progress()
+        self.doc_job = DocumentJob(self.root, tasks, self.on_generation_progress, self.on_generation_done)
+
+    def cancel_generation(self):
+        if self.doc_job is None: return
+        self.doc_job.cancel()
+        self.status_var.set("⏳ 正在取消生成…")
+
+    def on_generation_progress(self, name, state):
+        self.doc_progress[name] = state
+        if not self.doc_job.cancelled:
+            self.show_generation_progress()
+
+    def show_generation_progress(self):
+        progress = "，".join(f"{name}{state}" for name, state in self.doc_progress.items())
+        self.status_var.set(f"⏳ 正在生成：{progress}")
+
+    def on_generation_done(self, saved, errors, cancelled):
+        self.doc_job = None
+        self.cancel_btn.pack_forget()
+        self.generate_btn.state(["!disabled"])
+        saved_names = "、".join(name for name, _ in saved)
+        if errors:
+            messagebox.showerror("失败", "\n".join(f"{name}：{e}" for name, e in errors.items()))
+            self.status_var.set(f"❌ 生成失败{'（已保存：' + saved_names + '）' if saved else ''}")
+        elif cancelled:
+            self.status_var.set(f"⚠️ 已取消生成{'（已保存：' + saved_names + '）' if saved else ''}")
+        else:
+            self.status_var.set(f"✅ 生成成功！金额：{self.total_amount:.2f}元")
+            messagebox.showinfo("成功", "文档生成完成！")
 
 
 if __name__ == "__main__":
+    # 命令行子命令（无界面）：python main.py batch 站点清单.xlsx --out 输出目录 --jobs 4 ...
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        import batch
+        sys.exit(batch.main(sys.argv[2:]))
+    # python main.py prices list | add 预算表.xlsx | diff [旧版本] [新版本]
+    if len(sys.argv) > 1 and sys.argv[1] == "prices":
+        import price_versions
+        sys.exit(price_versions.main(sys.argv[2:]))
+    # python main.py serve --app-template 申请表模板.docx --review-template 会审单模板.docx [--port 8765]
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        import doc_service
+        sys.exit(doc_service.main(sys.argv[2:]))
+
+    # python main.py rollup export [--out 成本项目汇总.xlsx] | status 项目ID 状态
+    if len(sys.argv) > 1 and sys.argv[1] == "rollup":
+        import rollup
+        sys.exit(rollup.main(sys.argv[2:]))
+
+    parser = argparse.ArgumentParser(description="家集客项目预算与文档生成系统")
+    parser.add_argument("--db", help=f"使用SQLite存储（支持多个已保存项目），默认：存在{DB_FILE}时自动启用")
+    parser.add_argument("--startup-report", action="store_true",
+                        help=f"启动后打印各阶段耗时（每次启动都会记录到{fast_start.STARTUP_LOG_FILE}）")
+    args = parser.parse_args()
+    db_path = args.db or (DB_FILE if os.path.exists(DB_FILE) else None)
+
+    startup_timer = StartupTimer(STARTUP_T0)
+    startup_timer.mark("导入模块")
+    WarmUp(fast_start.EARLY_MODULES)  # numpy在创建窗口的同时导入，首帧后建立预算表时不必等待
     root = tk.Tk()
-    app = HomeAndEnterpriseTool(root)
+    app = HomeAndEnterpriseTool(root, db_path, startup_timer, args.startup_report)
     root.mainloop()
\ No newline at end of file
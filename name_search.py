@@ -0,0 +1,127 @@
+"""项目名称搜索：按字符n-gram（单字与相邻两字）建立倒排索引，输入时实时筛选
+
+名称先做NFKC规范化并转小写（全角/半角、大小写不敏感）。
+查询按空白分为多个词，每个词的全部n-gram都出现的项目为候选（两字以上的词用二元组，单字用单字），
+候选按匹配程度排序：名称与查询相同 > 名称以第一个词开头 > 各词都连续出现 > 只是字都出现，
+同一档内按匹配位置、名称长度和显示顺序排列。
+索引在新增、修改名称、删除项目时增量更新；索引建立之前可用scan()逐个比对名称，结果相同。
+"""
+import unicodedata
+from operator import add
+
+EXACT, PREFIX, SUBSTRING, SCATTERED = range(4)  # 匹配程度（越小越靠前）
+_EMPTY = frozenset()
+
+
+def normalize(text):
+    return unicodedata.normalize("NFKC", str(text)).lower()
+
+
+def _grams(text):
+    """text中的单字与相邻两字（含空白的n-gram不会被查询到，不必剔除）"""
+    grams = set(text)
+    grams.update(map(add, text, text[1:]))
+    return grams
+
+
+def _head(text):
+    """名称开头的单字与两字"""
+    return {text[:1], text[:2]} if text else set()
+
+
+def _query_grams(term):
+    return {term} if len(term) == 1 else set(map(add, term, term[1:]))
+
+
+class NameIndex:
+    def __init__(self, items=()):
+        self._names = {}  # 项目ID -> 规范化后的名称
+        self._postings = {}  # n-gram -> 项目ID集合
+        self._starts = {}  # 名称开头的单字、两字 -> 项目ID集合（判断前缀匹配）
+        for item in items:
+            self.add(item["id"], item["name"])
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, item_id, name):
+        name = normalize(name)
+        self._names[item_id] = name
+        for gram in _grams(name):
+            self._postings.setdefault(gram, set()).add(item_id)
+        for gram in _head(name):
+            self._starts.setdefault(gram, set()).add(item_id)
+
+    def remove(self, item_id):
+        name = self._names.pop(item_id, None)
+        if name is None: return
+        for index, grams in ((self._postings, _grams(name)), (self._starts, _head(name))):
+            for gram in grams:
+                ids = index[gram]
+                ids.discard(item_id)
+                if not ids:
+                    del index[gram]
+
+    def rename(self, item_id, name):
+        self.remove(item_id)
+        self.add(item_id, name)
+
+    def search(self, query, order=None):
+        """返回按匹配程度排序的项目ID列表；查询为空时返回None
+
+        order：项目ID -> 显示顺序（同一档内按显示顺序排列），不传时按ID排序
+        """
+        terms = normalize(query).split()
+        if not terms: return None
+        postings = sorted((self._postings.get(gram, _EMPTY) for term in terms for gram in _query_grams(term)),
+                          key=len)
+        if not postings[0]: return []
+        candidates = postings[0].intersection(*postings[1:])
+        return _rank(candidates, self._names, terms, self._starts.get(terms[0][:2], _EMPTY), order)
+
+
+def scan(names, query, order=None):
+    """不用索引逐个比对名称（索引建立之前使用），结果与NameIndex.search相同：names为[(项目ID, 名称)]"""
+    terms = normalize(query).split()
+    if not terms: return None
+    grams = set().union(*map(_query_grams, terms))
+    matched = {}
+    for item_id, name in names:
+        name = normalize(name)
+        if all(gram in name for gram in grams):  # 一两个字的n-gram在名称中出现，即在索引中
+            matched[item_id] = name
+    first = terms[0][:2]
+    return _rank(set(matched), matched, terms, {i for i, name in matched.items() if name.startswith(first)}, order)
+
+
+def _rank(candidates, names, terms, starts, order):
+    """候选按匹配程度排序；starts为名称开头与第一个词前两字相同的项目ID"""
+    phrase, first = " ".join(terms), terms[0]
+    if len(terms) > 1 or len(first) > 2:  # 一两个字的单个词，n-gram都出现即为连续出现，不必逐个核对
+        contiguous = {i for i in candidates if all(term in names[i] for term in terms)}
+    else:
+        contiguous = candidates
+    prefix = contiguous & starts
+    if len(first) > 2:
+        prefix = {i for i in prefix if names[i].startswith(first)}
+
+    key = order.__getitem__ if order is not None else lambda i: i
+    ranked = sorted(prefix, key=lambda i: (names[i] != phrase, len(names[i]), key(i)))
+    ranked += sorted(contiguous - prefix, key=lambda i: (_position(names[i], first), len(names[i]), key(i)))
+    ranked += sorted(candidates - contiguous, key=lambda i: (_position(names[i], first), len(names[i]), key(i)))
+    return ranked
+
+
+def _position(name, term):
+    """词在名称中的位置；未连续出现时取其第一个字的位置"""
+    position = name.find(term)
+    return position if position >= 0 else name.find(term[0])
+
+
+def match_span(name, query):
+    """名称中第一个查询词的位置(start, end)，用于高亮；未连续出现或规范化改变了长度时返回None"""
+    terms = normalize(query).split()
+    normalized = normalize(name)
+    if not terms or len(normalized) != len(name): return None
+    start = normalized.find(terms[0])
+    return (start, start + len(terms[0])) if start >= 0 else None
@@ -0,0 +1,274 @@
+"""申请表 / 会审单快速填充：不经过python-docx对象模型，直接拼接 word/document.xml
+
+模板编译一次（填写位置与缓存校验沿用doc_forms.load_template）：用lxml定位各填写单元格，
+把document.xml切分为固定片段和各单元格的原有内容；之后每次填充只替换单元格内容、拼接字节串。
+其余部件（样式、主题、设置等）编译时预先打包为ZIP，填充时整体复制，再追加document.xml
+（有图片时另加图片、word/_rels/document.xml.rels和[Content_Types].xml），不再逐个解压、重新压缩。
+
+填写内容来自doc_forms.application_fills / review_fills，生成的XML与python-docx相同：
+单元格文字为一个段落一个run（制表符、换行转为w:tab、w:br），对齐方式、字号、图片编号与关系ID的规则一致。
+"""
+import io
+import re
+import zipfile
+import hashlib
+import posixpath
+import threading
+
+from lxml import etree
+from docx import Document
+from docx.oxml.ns import qn, nsdecls
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+
+import doc_forms
+import image_prep
+from image_prep import MAX_IMG_WIDTH, MAX_IMG_HEIGHT
+
+CONTENT_TYPES = "[Content_Types].xml"
+SLOT_MARK = "OOXML-FILL-SLOT"
+EMPTY_CELL = b"<w:p><w:r/></w:p>"  # python-docx中 cell.text = "" 的结果
+INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+IMAGE_TYPES = [  # (文件头, 扩展名, 内容类型)，与python-docx识别的图片格式一致
+    (b"\xff\xd8", "jpg", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"GIF87a", "gif", "image/gif"),
+    (b"GIF89a", "gif", "image/gif"),
+    (b"BM", "bmp", "image/bmp"),
+    (b"II*\x00", "tiff", "image/tiff"),
+    (b"MM\x00*", "tiff", "image/tiff"),
+]
+
+
+# ===================== 填充结果 =====================
+class FilledDocument:
+    """填充好的.docx数据；save()与python-docx的Document.save相同，参数为文件路径或可写的文件对象"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def save(self, target):
+        if hasattr(target, "write"):
+            target.write(self.data)
+            return
+        with open(target, "wb") as f:
+            f.write(self.data)
+
+
+# ===================== 模板编译 =====================
+class OoxmlTemplate:
+    """编译后的模板：document.xml的固定片段、各填写单元格的原有内容，以及不变部件打包成的ZIP"""
+
+    def __init__(self, data, slots):
+        doc = Document(io.BytesIO(data))
+        part = doc.part
+        targets = {}  # tc元素 -> 填写位置列表（合并单元格的多个位置对应同一个tc）
+        for pos, cell in doc_forms.slot_cells(doc.tables[0], slots).items():  # 与python-docx填充取到的单元格相同
+            targets.setdefault(cell._tc, []).append(pos)
+
+        # 在各单元格内容前后插入标记，序列化后切分（序列化方式与python-docx保存时相同）
+        order = {tc: pos for pos, tc in enumerate(part.element.body.iter(qn("w:tc"))) if tc in targets}
+        tcs = sorted(targets, key=order.get)
+        self.cell_slots = {}  # 填写位置(行, 列) -> 片段序号
+        for n, tc in enumerate(tcs):
+            tc.insert(1 if tc.tcPr is not None else 0, etree.Comment(SLOT_MARK))
+            tc.append(etree.Comment(SLOT_MARK))
+            self.cell_slots.update(dict.fromkeys(targets[tc], n))
+        xml = etree.tostring(part.element, encoding="UTF-8", standalone=True)
+        pieces = xml.split(f"<!--{SLOT_MARK}-->".encode())
+        self.fixed, self.contents = pieces[0::2], pieces[1::2]
+
+        # 图片编号：填写的单元格原有内容被替换后，文档中最大的数字id（python-docx按此分配图片id）
+        for tc in tcs:
+            for child in list(tc):
+                if child.tag != qn("w:tcPr"): tc.remove(child)
+        used_ids = [int(v) for v in part.element.xpath("//@id") if v.isdigit()]
+        self.max_shape_id = max(used_ids, default=0)
+
+        self.document_name = part.partname.lstrip("/")
+        self.rels_name = part.partname.rels_uri.lstrip("/")
+        self.rel_ids = set(part.rels)
+        self.image_rels = {rel.target_part.partname: rId for rId, rel in part.rels.items()
+                           if rel.reltype == RT.IMAGE and not rel.is_external}
+        self.image_parts = {image.sha1: image.partname for image in part.package.image_parts}
+        self.image_numbers = [image.partname.idx for image in part.package.image_parts]
+
+        changing = {self.document_name, self.rels_name, CONTENT_TYPES}
+        base = io.BytesIO()
+        with zipfile.ZipFile(io.BytesIO(data)) as src, zipfile.ZipFile(base, "w", zipfile.ZIP_DEFLATED) as dst:
+            names = set(src.namelist())
+            self.rels_xml = src.read(self.rels_name) if self.rels_name in names else None
+            self.content_types_xml = src.read(CONTENT_TYPES)
+            for info in src.infolist():
+                if info.filename not in changing:
+                    dst.writestr(info, src.read(info))
+        self.base = base.getvalue()
+        self.default_exts = {el.get("Extension", "").lower() for el in etree.fromstring(self.content_types_xml)
+                             if el.tag.endswith("}Default")}
+
+    # ===================== 填充 =====================
+    def render(self, fills, image_cell=None, image_paths=(), dpi=image_prep.DEFAULT_DPI):
+        """按填写内容（doc_forms.*_fills）生成.docx数据；image_cell为插入图片的位置(行, 列)"""
+        contents = list(self.contents)
+        for idx, text, alignment, size, optional in fills:
+            try:
+                contents[self.cell_slots[idx]] = _paragraph_xml(text, alignment, size)
+            except ValueError:
+                if not optional: raise
+                contents[self.cell_slots[idx]] = EMPTY_CELL
+
+        media = _Media(self)
+        if image_paths and image_cell is not None:
+            paragraphs = [EMPTY_CELL]
+            for img_path in image_paths:
+                try:
+                    paragraphs.append(media.picture_xml(image_prep.prepare_image(img_path, dpi)))
+                except Exception:
+                    paragraphs.append(EMPTY_CELL)  # 与python-docx插图失败时留下的空段落相同
+            contents[self.cell_slots[image_cell]] = b"".join(paragraphs)
+
+        document = [self.fixed[0]]
+        for content, fixed in zip(contents, self.fixed[1:]):
+            document += [content, fixed]
+        out = io.BytesIO(self.base)
+        with zipfile.ZipFile(out, "a", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(self.document_name, b"".join(document))
+            media.write(zf)
+        return out.getvalue()
+
+
+class _Media:
+    """一次填充中新增的图片部件、关系和内容类型（规则同python-docx：按内容去重，编号取最小未用值）"""
+
+    def __init__(self, template):
+        self.template = template
+        self.shape_id = template.max_shape_id
+        self.rel_ids = set(template.rel_ids)
+        self.image_rels = dict(template.image_rels)
+        self.image_parts = dict(template.image_parts)
+        self.numbers = list(template.image_numbers)
+        self.new_parts = []  # [(部件名, 数据)]
+        self.new_rels = []  # [(关系ID, 目标)]
+        self.new_exts = {}  # 扩展名 -> 内容类型
+
+    def _next_rel_id(self):
+        n = 1
+        while f"rId{n}" in self.rel_ids:
+            n += 1
+        return f"rId{n}"
+
+    def _next_partname(self, ext):
+        n = next((n for n in range(1, len(self.numbers) + 1) if n not in self.numbers), len(self.numbers) + 1)
+        self.numbers.append(n)
+        return f"/word/media/image{n}.{ext}"
+
+    def picture_xml(self, blob):
+        ext, content_type = next((ext, ct) for head, ext, ct in IMAGE_TYPES if blob.startswith(head))
+        sha1 = hashlib.sha1(blob).hexdigest()
+        partname = self.image_parts.get(sha1)
+        if partname is None:
+            partname = self.image_parts[sha1] = self._next_partname(ext)
+            self.new_parts.append((partname.lstrip("/"), blob))
+            if ext not in self.template.default_exts:
+                self.new_exts[ext] = content_type
+        rId = self.image_rels.get(partname)
+        if rId is None:
+            rId = self.image_rels[partname] = self._next_rel_id()
+            self.rel_ids.add(rId)
+            base = posixpath.dirname("/" + self.template.document_name)
+            self.new_rels.append((rId, posixpath.relpath(partname, base)))
+        self.shape_id += 1
+        return _picture_xml(self.shape_id, rId, f"image.{ext}")
+
+    def write(self, zf):
+        template = self.template
+        if not self.new_parts and not self.new_rels and not self.new_exts:
+            if template.rels_xml is not None: zf.writestr(template.rels_name, template.rels_xml)
+            zf.writestr(CONTENT_TYPES, template.content_types_xml)
+            return
+        for name, blob in self.new_parts:
+            zf.writestr(name, blob, compress_type=zipfile.ZIP_STORED)  # 图片本身已压缩
+        rels = "".join(f'<Relationship Id="{rId}" Type="{RT.IMAGE}" Target="{target}"/>'
+                       for rId, target in self.new_rels).encode()
+        if template.rels_xml is None:
+            rels_xml = (b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                        b'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                        + rels + b"</Relationships>")
+        else:
+            rels_xml = template.rels_xml.replace(b"</Relationships>", rels + b"</Relationships>")
+        zf.writestr(template.rels_name, rels_xml)
+        defaults = "".join(f'<Default Extension="{ext}" ContentType="{ct}"/>' for ext, ct in self.new_exts.items())
+        zf.writestr(CONTENT_TYPES, template.content_types_xml.replace(b"</Types>", defaults.encode() + b"</Types>"))
+
+
+# ===================== XML片段 =====================
+def _escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _paragraph_xml(text, alignment, size):
+    """与python-docx设置 cell.text、段落对齐、run字号后的单元格内容相同"""
+    if INVALID_XML_CHARS.search(text): raise ValueError("文本含有XML不允许的字符")
+    ppr = f'<w:pPr><w:jc w:val="{alignment.xml_value}"/></w:pPr>' if alignment is not None else ""
+    rpr = f'<w:rPr><w:sz w:val="{int(size.pt * 2)}"/></w:rPr>' if size is not None else ""
+    inner = []
+    for piece in re.split(r"([\t\r\n])", text):
+        if piece == "\t":
+            inner.append("<w:tab/>")
+        elif piece in ("\r", "\n"):
+            inner.append("<w:br/>")
+        elif piece:
+            space = ' xml:space="preserve"' if len(piece.strip()) < len(piece) else ""
+            inner.append(f"<w:t{space}>{_escape(piece)}</w:t>")
+    run = f"<w:r>{rpr}{''.join(inner)}</w:r>" if rpr or inner else "<w:r/>"
+    return f"<w:p>{ppr}{run}</w:p>".encode()
+
+
+def _picture_xml(shape_id, rId, filename, cx=MAX_IMG_WIDTH, cy=MAX_IMG_HEIGHT):
+    """居中段落中的嵌入图片（结构同python-docx的run.add_picture）"""
+    return (
+        f'<w:p><w:pPr><w:jc w:val="{WD_PARAGRAPH_ALIGNMENT.CENTER.xml_value}"/></w:pPr><w:r><w:drawing>'
+        f'<wp:inline {nsdecls("wp", "a", "pic", "r")}><wp:extent cx="{cx}" cy="{cy}"/>'
+        f'<wp:docPr id="{shape_id}" name="Picture {shape_id}"/>'
+        f'<wp:cNvGraphicFramePr><a:graphicFrameLocks noChangeAspect="1"/></wp:cNvGraphicFramePr>'
+        f'<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+        f'<pic:pic><pic:nvPicPr><pic:cNvPr id="0" name="{filename}"/><pic:cNvPicPr/></pic:nvPicPr>'
+        f'<pic:blipFill><a:blip r:embed="{rId}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+        f'<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm>'
+        f'<a:prstGeom prst="rect"/></pic:spPr></pic:pic></a:graphicData></a:graphic></wp:inline>'
+        f'</w:drawing></w:r></w:p>'
+    ).encode()
+
+
+# ===================== 模板缓存与填充入口 =====================
+_COMPILED = {}  # (表单类型, 模板内容sha1) -> OoxmlTemplate
+_compile_lock = threading.Lock()
+
+
+def load_template(template_path, kind):
+    """编译后的模板；模板是否变化由doc_forms.load_template判断（按大小/修改时间，再按内容哈希）"""
+    template = doc_forms.load_template(template_path, kind)
+    key = (kind, template.digest)
+    with _compile_lock:
+        compiled = _COMPILED.get(key)
+        if compiled is None:
+            with open(template_path, "rb") as f:
+                compiled = _COMPILED[key] = OoxmlTemplate(f.read(), template.slots)
+        return compiled
+
+
+def fill_application_form(template_path, base_info, project_name, project_date, cycle, work_list,
+                          total_amount, image_paths=()):
+    """按申请表模板填充内容，返回未保存的FilledDocument（参数与doc_forms.fill_application_form相同）"""
+    slots = doc_forms.load_template(template_path, "application").slots
+    fills = doc_forms.application_fills(slots, base_info, project_name, project_date, cycle, work_list, total_amount)
+    data = load_template(template_path, "application").render(fills, slots["image"], image_paths,
+                                                              image_prep.image_dpi(base_info))
+    return FilledDocument(data)
+
+
+def fill_review_form(template_path, base_info, project_name, project_date, cycle, work_list, total_amount):
+    """按会审单模板填充内容，返回未保存的FilledDocument（参数与doc_forms.fill_review_form相同）"""
+    slots = doc_forms.load_template(template_path, "review").slots
+    fills = doc_forms.review_fills(slots, base_info, project_name, project_date, cycle, work_list, total_amount)
+    return FilledDocument(load_template(template_path, "review").render(fills))
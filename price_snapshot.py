@@ -0,0 +1,153 @@
+"""预算表快照：解析好的预算表（Excel）以二进制列式格式保存，启动时内存映射读取，免去解析Excel
+
+快照记录来源预算表的路径、大小、修改时间和SHA1：
+- 大小与修改时间未变：直接使用快照（不读取Excel）；
+- 大小或修改时间变化但内容哈希相同：仍使用快照；
+- 内容已变化：重新解析预算表；来源文件已不存在时继续使用快照。
+数值列直接从内存映射中按类型读取，不经过逐行解析。
+
+文件格式（小端）：MAGIC | 版本号 u16 | 头部长度 u32 | 头部JSON | 各数据段（按8字节对齐）
+数据段：id(int32) / unit_price(float64) / is_length(uint8) / category、unit（uint16，头部中字符串表的下标）
+/ name_offsets(uint32, n+1) / names（UTF-8拼接）
+"""
+import os
+import json
+import mmap
+import struct
+import hashlib
+from array import array
+
+from autosave import atomic_write_bytes
+from budget_core import read_price_book
+
+SNAPSHOT_FILE = "price_book.snapshot"
+SNAPSHOT_VERSION = 1
+MAGIC = b"JJKPB"
+_PREFIX = struct.Struct("<5sHI")
+
+
+def file_sha1(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _source_key(path):
+    st = os.stat(path)
+    return {"source": os.path.abspath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": file_sha1(path)}
+
+
+# ===================== 写入 =====================
+def write_snapshot(items, source_path, path=SNAPSHOT_FILE):
+    """保存预算表快照（items为解析后的预算数据，只保存价格相关字段，工程量不保存）"""
+    items = list(items)
+    categories = list(dict.fromkeys(item["category"] for item in items))
+    units = list(dict.fromkeys(item["unit"] for item in items))
+    category_idx = {value: idx for idx, value in enumerate(categories)}
+    unit_idx = {value: idx for idx, value in enumerate(units)}
+    names = [item["name"].encode("utf-8") for item in items]
+    offsets = array("I", [0])
+    for name in names:
+        offsets.append(offsets[-1] + len(name))
+
+    sections = [
+        ("id", array("i", (item["id"] for item in items)).tobytes()),
+        ("unit_price", array("d", (float(item["unit_price"]) for item in items)).tobytes()),
+        ("is_length", bytes(int(bool(item["is_length"])) for item in items)),
+        ("category", array("H", (category_idx[item["category"]] for item in items)).tobytes()),
+        ("unit", array("H", (unit_idx[item["unit"]] for item in items)).tobytes()),
+        ("name_offsets", offsets.tobytes()),
+        ("names", b"".join(names)),
+    ]
+    offset, layout = 0, {}  # 各段相对数据区起点的偏移与长度
+    for key, data in sections:
+        layout[key] = [offset, len(data)]
+        offset += (len(data) + 7) // 8 * 8
+    header = dict(_source_key(source_path), count=len(items), categories=categories, units=units, sections=layout)
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    base = (_PREFIX.size + len(header_bytes) + 7) // 8 * 8
+
+    parts = [_PREFIX.pack(MAGIC, SNAPSHOT_VERSION, len(header_bytes)), header_bytes,
+             b"\0" * (base - _PREFIX.size - len(header_bytes))]
+    for key, data in sections:
+        parts.append(data)
+        parts.append(b"\0" * (-len(data) % 8))
+    atomic_write_bytes(path, b"".join(parts))
+
+
+# ===================== 读取 =====================
+def read_header(mm):
+    magic, version, header_len = _PREFIX.unpack_from(mm, 0)
+    if magic != MAGIC or version != SNAPSHOT_VERSION:
+        return None, 0
+    header = json.loads(bytes(mm[_PREFIX.size:_PREFIX.size + header_len]).decode("utf-8"))
+    return header, (_PREFIX.size + header_len + 7) // 8 * 8
+
+
+def read_snapshot(path=SNAPSHOT_FILE, decode=True):
+    """读取快照，返回(头部, 预算数据)；decode为False时只读头部（预算数据为None）；
+    文件不存在、版本不符或已损坏时返回(None, None)"""
+    if not os.path.exists(path) or os.path.getsize(path) < _PREFIX.size:
+        return None, None
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        try:
+            header, base = read_header(mm)
+            if header is None:
+                return None, None
+            items = _decode_items(mm, header, base) if decode else None
+        except (ValueError, KeyError, IndexError, struct.error):
+            return None, None
+    return header, items
+
+
+def _decode_items(mm, header, base):
+    n = header["count"]
+
+    def section(key, fmt):
+        offset, size = header["sections"][key]
+        with memoryview(mm)[base + offset:base + offset + size] as view:
+            return view.cast(fmt).tolist() if fmt != "B" else view.tobytes()
+
+    ids = section("id", "i")
+    prices = section("unit_price", "d")
+    is_length = section("is_length", "B")
+    category = section("category", "H")
+    unit = section("unit", "H")
+    offsets = section("name_offsets", "I")
+    names = section("names", "B")
+    if not (len(ids) == len(prices) == len(is_length) == len(offsets) - 1 == n):
+        raise ValueError("快照已损坏")
+    categories, units = header["categories"], header["units"]
+    return [
+        {"id": ids[i], "category": categories[category[i]], "name": names[offsets[i]:offsets[i + 1]].decode("utf-8"),
+         "unit": units[unit[i]], "unit_price": prices[i], "quantity": 0.0, "total": 0.0,
+         "is_length": bool(is_length[i])}
+        for i in range(n)
+    ]
+
+
+def load_price_book(path=SNAPSHOT_FILE, decode=True):
+    """启动时读取预算表：返回(预算数据, 来源预算表路径, 是否重新解析了Excel)，没有可用快照时返回None
+
+    先只读头部检查来源：来源未变化时使用快照，decode为False（本地已有预算数据）时不解码，预算数据为None；
+    已变化时重新解析（调用方沿用原项目ID后应重新保存快照）。来源文件已不存在时继续使用快照。
+    """
+    header, _ = read_snapshot(path, decode=False)
+    if header is None:
+        return None
+    source = header["source"]
+    items = None
+    if os.path.exists(source):
+        st = os.stat(source)
+        if st.st_size != header["size"] or st.st_mtime_ns != header["mtime_ns"]:
+            if file_sha1(source) != header["sha1"]:
+                return read_price_book(source), source, True
+            _, items = read_snapshot(path)
+            if items is None: return None
+            write_snapshot(items, source, path)  # 内容未变，更新记录的修改时间，下次启动不必再计算哈希
+    if items is None and decode:
+        _, items = read_snapshot(path)
+        if items is None: return None
+    return items, source, False
@@ -0,0 +1,235 @@
+"""预算表版本：每次导入的家集客预算表保存为一个版本（SQLite，增量存储），可比较任意两个版本
+
+存储：每隔KEYFRAME_INTERVAL个版本（或变化超过一半时）保存一次完整预算表，
+其余版本只保存相对上一版本新增/修改的行和删除标记；项目顺序按ID差值编码后zlib压缩保存。
+读取某个版本时从最近的完整版本开始依次套用增量。
+
+比较：两个版本按项目ID排序后用numpy整列比较，得出新增、删除、调价的项目；
+并一次读取全部已保存项目的工程量，按两个版本的单价批量计算各项目合计（不逐个打开项目），
+列出合计有变化的项目。项目ID沿用规则见budget_core.carry_over_ids（同类别同名项目ID不变）。
+
+命令行：python main.py prices list | add 预算表.xlsx [--label 名称] | diff [旧版本] [新版本]
+"""
+import os
+import zlib
+import argparse
+
+import numpy as np
+
+from budget_core import read_price_book, carry_over_ids, to_fen
+from sqlite_store import DB_FILE, SqliteBudgetDB
+
+KEYFRAME_INTERVAL = 10  # 每隔若干个版本保存一次完整预算表，限制读取时需要套用的增量数
+PRICE_FIELDS = ("category", "name", "unit", "unit_price", "is_length")
+DIFF_SHOW_LINES = 50  # 命令行每类变化最多列出的行数
+
+
+# ===================== 版本存取 =====================
+def _encode_order(ids):
+    ids = np.asarray(ids, dtype=np.int64)
+    return zlib.compress(np.diff(ids, prepend=0).astype("<i8").tobytes(), 9)
+
+
+def _decode_order(blob):
+    return np.cumsum(np.frombuffer(zlib.decompress(blob), dtype="<i8")).tolist()
+
+
+def _fields(item):
+    return (item["category"], item["name"], item["unit"], float(item["unit_price"]), bool(item["is_length"]))
+
+
+def load_version(db, version_id, versions=None):
+    """读取某个版本：返回({项目ID: (类别, 名称, 单位, 单价, 是否长度类)}, 按显示顺序的项目ID)"""
+    versions = {v["id"]: v for v in (versions or db.list_price_versions())}
+    if version_id not in versions: raise ValueError(f"预算表版本不存在：{version_id}")
+    chain = []
+    while version_id is not None:
+        chain.append(version_id)
+        version_id = versions[version_id]["base_id"]
+    rows = {}
+    for version_id in reversed(chain):
+        for item_id, category, name, unit, unit_price, is_length, deleted in db.price_version_rows(version_id):
+            if deleted:
+                rows.pop(item_id, None)
+            else:
+                rows[item_id] = (category, name, unit, unit_price, bool(is_length))
+    return rows, _decode_order(db.price_version_order(chain[0]))
+
+
+def version_items(db, version_id):
+    """某个版本的预算数据（字典列表，工程量为0）"""
+    rows, order = load_version(db, version_id)
+    return [dict(zip(PRICE_FIELDS, rows[item_id]), id=item_id, quantity=0.0, total=0.0) for item_id in order]
+
+
+def save_version(db, items, label, source=""):
+    """把预算表保存为新版本，返回(版本ID, 是否新建)；与最新版本完全相同时不新建，返回最新版本ID"""
+    items = list(items)
+    new = {item["id"]: _fields(item) for item in items}
+    order = _encode_order([item["id"] for item in items])
+    versions = db.list_price_versions()
+    latest = versions[-1] if versions else None
+
+    keyframe, changes = True, []
+    if latest is not None:
+        old, old_order = load_version(db, latest["id"], versions)
+        changes = [(item_id,) + fields + (0,) for item_id, fields in new.items() if old.get(item_id) != fields]
+        changes += [(item_id, None, None, None, None, None, 1) for item_id in old if item_id not in new]
+        if not changes and old_order == [item["id"] for item in items]:
+            return latest["id"], False
+        keyframe = latest["depth"] + 1 >= KEYFRAME_INTERVAL or len(changes) * 2 > len(new)
+    if keyframe:
+        version_id = db.insert_price_version(label, source, None, 0, len(new), order,
+                                             [(item_id,) + fields + (0,) for item_id, fields in new.items()])
+    else:
+        version_id = db.insert_price_version(label, source, latest["id"], latest["depth"] + 1, len(new), order,
+                                             changes)
+    return version_id, True
+
+
+# ===================== 版本比较 =====================
+def _price_arrays(rows):
+    """按项目ID排序的(ID数组, 单价数组)"""
+    ids = np.fromiter(rows.keys(), dtype=np.int64, count=len(rows))
+    prices = np.fromiter((fields[3] for fields in rows.values()), dtype=np.float64, count=len(rows))
+    order = np.argsort(ids)
+    return ids[order], prices[order]
+
+
+def fen_array(quantities, prices):
+    """工程量×单价的金额（分，整数数组），与budget_core.to_fen逐项计算的结果相同"""
+    raw = quantities * prices * 100
+    fen = np.floor(raw + 0.5).astype(np.int64)
+    unsure = np.flatnonzero(np.abs(raw - np.floor(raw) - 0.5) < 1e-6)  # 接近0.5分时浮点误差可能影响舍入，逐项精确计算
+    for i in unsure.tolist():
+        fen[i] = to_fen(quantities[i], prices[i])
+    return fen
+
+
+def lookup_prices(ids, prices, item_ids):
+    """按项目ID查单价，版本中不存在的项目单价为0"""
+    if not len(ids):
+        return np.zeros(len(item_ids))
+    pos = np.minimum(np.searchsorted(ids, item_ids), len(ids) - 1)
+    return np.where(ids[pos] == item_ids, prices[pos], 0.0)
+
+
+def project_totals(db, *price_tables):
+    """全部已保存项目在各版本单价下的合计：返回(项目ID数组, [各版本合计（分）数组])"""
+    rows = db.all_project_quantities()
+    if not rows:
+        return np.zeros(0, np.int64), [np.zeros(0, np.int64) for _ in price_tables]
+    data = np.array(rows, dtype=np.float64)
+    item_ids, quantities = data[:, 1].astype(np.int64), data[:, 2]
+    projects, inverse = np.unique(data[:, 0].astype(np.int64), return_inverse=True)
+    totals = []
+    for ids, prices in price_tables:
+        total = np.zeros(len(projects), np.int64)
+        np.add.at(total, inverse, fen_array(quantities, lookup_prices(ids, prices, item_ids)))
+        totals.append(total)
+    return projects, totals
+
+
+def diff_versions(db, old_id, new_id):
+    """比较两个版本：返回字典
+    added / removed：[项目字典]；repriced：[项目字典（含old_price、new_price）]；
+    projects：合计有变化的已保存项目[{"id", "name", "old_total", "new_total"}]
+    """
+    versions = db.list_price_versions()
+    old, _ = load_version(db, old_id, versions)
+    new, _ = load_version(db, new_id, versions)
+    old_ids, old_prices = _price_arrays(old)
+    new_ids, new_prices = _price_arrays(new)
+
+    added = np.setdiff1d(new_ids, old_ids, assume_unique=True)
+    removed = np.setdiff1d(old_ids, new_ids, assume_unique=True)
+    common, old_idx, new_idx = np.intersect1d(old_ids, new_ids, assume_unique=True, return_indices=True)
+    changed = np.flatnonzero(old_prices[old_idx] != new_prices[new_idx])
+
+    def item(rows, item_id):
+        return dict(zip(PRICE_FIELDS, rows[item_id]), id=item_id)
+
+    projects, (old_totals, new_totals) = project_totals(db, (old_ids, old_prices), (new_ids, new_prices))
+    names = dict(db.list_projects())
+    impacted = np.flatnonzero(old_totals != new_totals)
+    return {
+        "old": old_id, "new": new_id,
+        "added": [item(new, i) for i in added.tolist()],
+        "removed": [item(old, i) for i in removed.tolist()],
+        "repriced": [dict(item(new, i), old_price=old_prices[o], new_price=new_prices[n])
+                     for i, o, n in zip(common[changed].tolist(), old_idx[changed].tolist(), new_idx[changed].tolist())],
+        "projects": [{"id": p, "name": names.get(p, ""), "old_total": o / 100, "new_total": n / 100}
+                     for p, o, n in zip(projects[impacted].tolist(), old_totals[impacted].tolist(),
+                                        new_totals[impacted].tolist())],
+    }
+
+
+def diff_summary(diff):
+    return (f"新增{len(diff['added'])}项，删除{len(diff['removed'])}项，调价{len(diff['repriced'])}项；"
+            f"{len(diff['projects'])}个已保存项目的合计有变化")
+
+
+def format_diff(diff, limit=DIFF_SHOW_LINES):
+    """比较结果的文本（每类最多列出limit行）"""
+    lines = [f"版本{diff['old']} → 版本{diff['new']}：{diff_summary(diff)}"]
+
+    def section(title, rows, fmt):
+        if not rows: return
+        lines.append(f"\n{title}（{len(rows)}项）：")
+        lines.extend(fmt(row) for row in rows[:limit])
+        if len(rows) > limit:
+            lines.append(f"  ……等共{len(rows)}项")
+
+    section("新增", diff["added"], lambda r: f"  [{r['category']}] {r['name']}  {r['unit_price']:.2f}元")
+    section("删除", diff["removed"], lambda r: f"  [{r['category']}] {r['name']}  {r['unit_price']:.2f}元")
+    section("调价", diff["repriced"],
+            lambda r: f"  [{r['category']}] {r['name']}  {r['old_price']:.2f} → {r['new_price']:.2f}元")
+    section("合计变化的已保存项目", diff["projects"],
+            lambda r: f"  #{r['id']} {r['name']}  {r['old_total']:.2f} → {r['new_total']:.2f}元")
+    return "\n".join(lines)
+
+
+# ===================== 命令行入口 =====================
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py prices", description="预算表版本管理与比较")
+    parser.add_argument("--db", default=DB_FILE, help=f"SQLite项目库（默认：{DB_FILE}）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="列出已保存的预算表版本")
+    add = sub.add_parser("add", help="把家集客预算表保存为新版本")
+    add.add_argument("workbook", help="家集客预算表（.xlsx）")
+    add.add_argument("--label", help="版本名称（默认：文件名）")
+    diff = sub.add_parser("diff", help="比较两个版本（默认比较最新的两个版本）")
+    diff.add_argument("old", nargs="?", type=int, help="旧版本ID")
+    diff.add_argument("new", nargs="?", type=int, help="新版本ID")
+    diff.add_argument("--limit", type=int, default=DIFF_SHOW_LINES, help=f"每类最多列出的行数（默认：{DIFF_SHOW_LINES}）")
+    args = parser.parse_args(argv)
+
+    db = SqliteBudgetDB(args.db)
+    versions = db.list_price_versions()
+    if args.command == "list":
+        if not versions:
+            print("暂无预算表版本")
+        for v in versions:
+            kind = "完整" if v["base_id"] is None else f"增量（基于版本{v['base_id']}）"
+            print(f"版本{v['id']}  {v['label']}  {v['created_at']}  {v['item_count']}项  {kind}")
+        return 0
+
+    if args.command == "add":
+        if not os.path.exists(args.workbook): parser.error(f"文件不存在：{args.workbook}")
+        items = read_price_book(args.workbook)
+        if versions:  # 沿用最新版本的项目ID，使工程量仍对应到同一项目
+            items = carry_over_ids(items, version_items(db, versions[-1]["id"]))
+        version_id, created = save_version(db, items, args.label or os.path.basename(args.workbook),
+                                           os.path.abspath(args.workbook))
+        print(f"已保存为版本{version_id}" if created else f"与最新版本{version_id}相同，未新建版本")
+        if created and versions:
+            print(diff_summary(diff_versions(db, versions[-1]["id"], version_id)))
+        return 0
+
+    if len(versions) < 2 and (args.old is None or args.new is None):
+        print("至少需要两个预算表版本才能比较")
+        return 1
+    old_id = args.old if args.old is not None else versions[-2]["id"]
+    new_id = args.new if args.new is not None else versions[-1]["id"]
+    print(format_diff(diff_versions(db, old_id, new_id), args.limit))
+    return 0
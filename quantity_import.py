@@ -0,0 +1,92 @@
+"""工程量批量导入：读取现场勘察表（Excel/CSV，每行一个项目名称和工程量），与预算表一次合并匹配
+
+匹配分两轮，均为pandas整列合并（不逐行查找）：
+1. 名称完全相同（去除首尾空格）；
+2. 规范化名称相同：NFKC（全角/半角统一）、转小写、去掉全部空白。
+预算表中有重名项目时取显示顺序靠前的一个；同一项目出现在多行时工程量相加。
+未匹配的行、工程量不是有效数字（或为负数）的行单独列出，不导入。
+"""
+import pandas as pd
+
+NAME_COLUMNS = ("项目名称", "名称", "项目", "材料名称")  # 按顺序取第一个存在的列
+QUANTITY_COLUMNS = ("工程量", "数量")
+CSV_ENCODINGS = ("utf-8-sig", "gbk")  # Excel另存的CSV常为GBK编码
+
+
+def _pick_column(df, candidates, label):
+    for col in candidates:
+        if col in df.columns:
+            return col
+    raise ValueError(f"勘察表缺少{label}列（可用列名：{'、'.join(candidates)}）")
+
+
+def read_survey(path):
+    """读取勘察表，返回DataFrame（列：line行号、name名称、quantity工程量，工程量无效时为NaN）"""
+    if path.lower().endswith(".csv"):
+        for encoding in CSV_ENCODINGS:
+            try:
+                df = pd.read_csv(path, encoding=encoding, dtype=str)
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            raise ValueError("勘察表编码无法识别（请另存为UTF-8或GBK编码的CSV）")
+    else:
+        df = pd.read_excel(path, dtype=object)
+    df.columns = df.columns.astype(str).str.strip()
+    name_col = _pick_column(df, NAME_COLUMNS, "项目名称")
+    quantity_col = _pick_column(df, QUANTITY_COLUMNS, "工程量")
+
+    names = df[name_col].astype(str).str.strip()
+    survey = pd.DataFrame({
+        "line": df.index + 2,  # Excel行号（含表头）
+        "name": names,
+        "raw_quantity": df[quantity_col],
+        "quantity": pd.to_numeric(df[quantity_col], errors="coerce"),
+    })
+    return survey[df[name_col].notna() & (names != "")]
+
+
+def normalize_names(names):
+    """规范化名称（整列）：NFKC、小写、去掉全部空白"""
+    return names.str.normalize("NFKC").str.lower().str.replace(r"\s+", "", regex=True)
+
+
+def match_survey(survey, item_ids, item_names):
+    """把勘察表与预算表（按显示顺序的项目ID、名称）合并匹配
+
+    返回字典：quantities {项目ID: 工程量}、exact/normalized 两轮各匹配的行数、
+    unmatched [(行号, 名称, 工程量)]、invalid [(行号, 名称, 原始工程量)]
+    """
+    book = pd.DataFrame({"id": item_ids, "name": item_names})
+    book["name"] = book["name"].str.strip()
+    book["key"] = normalize_names(book["name"])
+
+    valid = survey["quantity"].notna() & (survey["quantity"] >= 0)
+    invalid = survey[~valid]
+    lines = survey[valid].copy()
+
+    lines = lines.merge(book.drop_duplicates("name")[["name", "id"]], on="name", how="left")
+    exact = lines["id"].notna()
+    rest = lines[~exact].drop(columns="id")
+    rest["key"] = normalize_names(rest["name"])
+    rest = rest.merge(book.drop_duplicates("key")[["key", "id"]], on="key", how="left")
+    normalized = rest["id"].notna()
+
+    matched = pd.concat([lines[exact], rest[normalized]])
+    totals = matched.groupby("id")["quantity"].sum()
+    unmatched = rest[~normalized].sort_values("line")
+    return {
+        "quantities": dict(zip(totals.index.astype(int).tolist(), totals.astype(float).tolist())),
+        "exact": int(exact.sum()),
+        "normalized": int(normalized.sum()),
+        "unmatched": list(zip(unmatched["line"].tolist(), unmatched["name"].tolist(),
+                              unmatched["quantity"].astype(float).tolist())),
+        "invalid": list(zip(invalid["line"].tolist(), invalid["name"].tolist(),
+                            invalid["raw_quantity"].fillna("（空）").astype(str).tolist())),
+    }
+
+
+def import_survey(path, budget_data):
+    """读取勘察表并与预算表（BudgetTable）匹配，结果见match_survey（不修改预算表）"""
+    return match_survey(read_survey(path), *budget_data.names())
@@ -0,0 +1,184 @@
+"""跨项目汇总（季度上报）：按申请单位（县）、类别、预算项目汇总全部已保存项目的工程量与金额，
+并汇总待实施项目的材料项目数量生成材料采购清单（需使用SQLite项目库）
+
+索引：各项目的工程量和按当时预算表算好的金额（分）保存在项目库的rollup_rows表中，
+rollup_projects记录索引时项目的revision（每次保存加1）和预算表标识（项目ID与单价的哈希）。
+每次汇总只重新计算revision或预算表有变化的项目（已删除的项目从索引中移除），
+再用pandas一次分组汇总全部索引行，因此只有少数项目变化时几百个项目的汇总也只需很短时间。
+
+命令行：python main.py rollup export [--out 成本汇总.xlsx] [--pending 待实施 ...] [--db budget.db]
+        python main.py rollup status 项目ID 状态
+"""
+import os
+import hashlib
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from budget_export import new_sheet, styled_cell, MONEY_FORMAT, QUANTITY_FORMAT
+from price_versions import fen_array, lookup_prices
+from sqlite_store import DB_FILE, PROJECT_STATUSES, SqliteBudgetDB
+
+PENDING_STATUSES = ("待实施",)  # 材料采购清单默认只统计尚未开工的项目
+MATERIAL_CATEGORY = "材料项目"
+NO_COUNTY = "（未填写）"
+ROLLUP_FILE = "成本项目汇总.xlsx"
+
+
+# ===================== 索引 =====================
+def _price_table(items):
+    """按项目ID排序的(ID数组, 单价数组)与预算表标识"""
+    ids = np.fromiter((item["id"] for item in items), dtype=np.int64, count=len(items))
+    prices = np.fromiter((item["unit_price"] for item in items), dtype=np.float64, count=len(items))
+    order = np.argsort(ids)
+    ids, prices = ids[order], prices[order]
+    return ids, prices, hashlib.sha1(ids.tobytes() + prices.tobytes()).hexdigest()
+
+
+def update_index(db, items=None):
+    """更新汇总索引，返回(重新计算的项目数, 移除的项目数)"""
+    items = db.load_items() if items is None else items
+    ids, prices, price_key = _price_table(items)
+    state = db.rollup_state()
+    projects = {pid: revision for pid, _, _, _, _, revision in db.project_table()}
+    stale = [pid for pid, revision in projects.items() if state.get(pid) != (revision, price_key)]
+    removed = [pid for pid in state if pid not in projects]
+    if not stale and not removed:
+        return 0, 0
+
+    rows = []
+    quantities = db.project_quantities_of(stale)
+    if quantities:
+        data = np.array(quantities, dtype=np.float64)
+        item_ids, amounts = data[:, 1].astype(np.int64), data[:, 2]
+        fen = fen_array(amounts, lookup_prices(ids, prices, item_ids))
+        known = np.isin(item_ids, ids)  # 预算表中已删除的项目不计入
+        rows = list(zip(data[known, 0].astype(np.int64).tolist(), item_ids[known].tolist(),
+                        amounts[known].tolist(), fen[known].tolist()))
+    db.update_rollup(stale + removed, rows, [(pid, projects[pid], price_key) for pid in stale])
+    return len(stale), len(removed)
+
+
+# ===================== 汇总 =====================
+def build_rollup(db, pending_statuses=PENDING_STATUSES, items=None, update=True):
+    """更新索引后汇总，返回{表名: DataFrame}（金额单位：元）；update为False时调用方已用items更新过索引"""
+    items = db.load_items() if items is None else items
+    if update:
+        update_index(db, items)
+
+    book = pd.DataFrame(items, columns=["id", "category", "name", "unit", "unit_price"])
+    book["seq"] = np.arange(len(book))
+    projects = pd.DataFrame(db.project_table(),
+                            columns=["project_id", "project", "project_date", "county", "status", "revision"])
+    projects["county"] = projects["county"].str.strip().replace("", NO_COUNTY)
+    rows = pd.DataFrame(db.rollup_rows(), columns=["project_id", "item_id", "quantity", "fen"])
+    rows = (rows.merge(projects[["project_id", "county", "status"]], on="project_id")
+                .merge(book, left_on="item_id", right_on="id"))
+
+    def sums(keys, data=rows):
+        grouped = data.groupby(keys, sort=False).agg(quantity=("quantity", "sum"), fen=("fen", "sum"),
+                                                      projects=("project_id", "nunique")).reset_index()
+        grouped["amount"] = grouped.pop("fen") / 100
+        return grouped
+
+    # 按县：项目数（含无工程量的项目）、各类别金额、合计
+    by_county = rows.pivot_table(index="county", columns="category", values="fen", aggfunc="sum", fill_value=0)
+    by_county = by_county.reindex(projects["county"].unique(), fill_value=0)
+    counts = projects.groupby("county").agg(projects=("project_id", "size"),
+                                            pending=("status", lambda s: s.isin(pending_statuses).sum()))
+    by_county = counts.join(by_county / 100).fillna(0)
+    by_county["total"] = by_county.drop(columns=["projects", "pending"]).sum(axis=1)
+    by_county = by_county.sort_values("total", ascending=False).reset_index()
+
+    item_cols = ["category", "name", "unit", "unit_price", "seq"]
+    by_item = sums(["item_id"] + item_cols).sort_values("seq")
+    by_county_item = sums(["county", "item_id"] + item_cols).sort_values(["county", "seq"])
+    procurement = rows[(rows["category"] == MATERIAL_CATEGORY) & rows["status"].isin(pending_statuses)]
+    procurement = sums(["item_id"] + item_cols, procurement).sort_values("seq")
+
+    project_totals = rows.groupby("project_id")["fen"].sum()
+    project_list = projects.assign(amount=projects["project_id"].map(project_totals).fillna(0) / 100)
+    return {"county": by_county, "item": by_item, "county_item": by_county_item,
+            "procurement": procurement, "projects": project_list}
+
+
+# ===================== 导出 =====================
+def export_rollup(report, target, pending_statuses=PENDING_STATUSES):
+    """汇总结果写入Excel（openpyxl只写模式），返回导出的项目数"""
+    wb = Workbook(write_only=True)
+    by_county = report["county"]
+    categories = [c for c in by_county.columns if c not in ("county", "projects", "pending", "total")]
+    ws = new_sheet(wb, "按县汇总", ["申请单位", "项目数", "待实施项目数"] + [f"{c}（元）" for c in categories]
+                    + ["合计（元）"], [20, 10, 14] + [16] * len(categories) + [16])
+    for _, row in by_county.iterrows():
+        ws.append([row["county"], int(row["projects"]), int(row["pending"])]
+                  + [styled_cell(ws, float(row[c]), MONEY_FORMAT) for c in categories]
+                  + [styled_cell(ws, float(row["total"]), MONEY_FORMAT)])
+    ws.append([styled_cell(ws, "总计", bold=True), styled_cell(ws, int(by_county["projects"].sum()), bold=True),
+               styled_cell(ws, int(by_county["pending"].sum()), bold=True)]
+              + [styled_cell(ws, float(by_county[c].sum()), MONEY_FORMAT, bold=True) for c in categories]
+              + [styled_cell(ws, float(by_county["total"].sum()), MONEY_FORMAT, bold=True)])
+
+    def item_rows(ws, df, leading=()):
+        for row in df.itertuples(index=False):
+            yield ([getattr(row, col) for col in leading]
+                   + [row.category, row.name, row.unit, styled_cell(ws, float(row.unit_price), MONEY_FORMAT),
+                      styled_cell(ws, float(row.quantity), QUANTITY_FORMAT), int(row.projects),
+                      styled_cell(ws, float(row.amount), MONEY_FORMAT)])
+
+    item_columns = ["类别", "项目名称", "单位", "单价（元）", "工程量", "项目数", "金额（元）"]
+    item_widths = [12, 50, 10, 14, 12, 10, 16]
+    ws = new_sheet(wb, "按项目汇总", item_columns, item_widths)
+    for row in item_rows(ws, report["item"]):
+        ws.append(row)
+    ws = new_sheet(wb, "分县明细", ["申请单位"] + item_columns, [20] + item_widths)
+    for row in item_rows(ws, report["county_item"], ["county"]):
+        ws.append(row)
+    ws = new_sheet(wb, "材料采购清单", item_columns, item_widths)
+    for row in item_rows(ws, report["procurement"]):
+        ws.append(row)
+    ws.append([styled_cell(ws, f"统计范围：状态为{'、'.join(pending_statuses)}的项目", bold=True)])
+
+    ws = new_sheet(wb, "项目清单", ["项目ID", "项目名称", "日期", "申请单位", "状态", "金额（元）"],
+                    [8, 40, 16, 20, 10, 16])
+    for row in report["projects"].itertuples(index=False):
+        ws.append([row.project_id, row.project, row.project_date, row.county, row.status,
+                   styled_cell(ws, float(row.amount), MONEY_FORMAT)])
+    wb.save(target)
+    return len(report["projects"])
+
+
+# ===================== 命令行入口 =====================
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py rollup", description="跨项目成本汇总与材料采购清单")
+    parser.add_argument("--db", default=DB_FILE, help=f"SQLite项目库（默认：{DB_FILE}）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="导出汇总表（按县、按项目、分县明细、材料采购清单、项目清单）")
+    export.add_argument("--out", default=ROLLUP_FILE, help=f"输出文件（默认：{ROLLUP_FILE}）")
+    export.add_argument("--pending", nargs="+", choices=PROJECT_STATUSES, default=list(PENDING_STATUSES),
+                        help=f"材料采购清单统计的项目状态（默认：{' '.join(PENDING_STATUSES)}）")
+    status = sub.add_parser("status", help="修改项目状态")
+    status.add_argument("project_id", type=int, help="项目ID")
+    status.add_argument("status", choices=PROJECT_STATUSES, help="项目状态")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db): parser.error(f"项目库不存在：{args.db}")
+    db = SqliteBudgetDB(args.db)
+    if args.command == "status":
+        if not db.set_project_status(args.project_id, args.status):
+            print(f"项目不存在：#{args.project_id}")
+            return 1
+        print(f"项目#{args.project_id}状态已改为：{args.status}")
+        return 0
+
+    t0 = datetime.now()
+    items = db.load_items()
+    recomputed, removed = update_index(db, items)
+    print(f"索引已更新：重新计算{recomputed}个项目，移除{removed}个项目")
+    report = build_rollup(db, args.pending, items, update=False)
+    count = export_rollup(report, args.out, args.pending)
+    print(f"已导出{count}个项目的汇总：{os.path.abspath(args.out)}（耗时{(datetime.now() - t0).total_seconds():.2f}秒）")
+    return 0
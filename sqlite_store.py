@@ -0,0 +1,278 @@
+"""SQLite存储（可选）：预算表只存一份，多个已保存项目的工程量按项目ID稀疏存储
+
+启用方式：python main.py --db budget.db（工作目录下存在budget.db时自动启用）。
+- items：预算表（施工/材料项目），seq为显示顺序
+- projects：已保存项目（项目名称、日期、实施周期、申请单位、状态；revision每次保存加1）
+- project_quantities：各项目工程量不为0的行，主键(project_id, item_id)，打开项目只需一次索引查询
+- price_versions / price_version_items：历年预算表版本（增量存储，见price_versions.py）
+- rollup_projects / rollup_rows：跨项目汇总的索引（各项目按当时预算表算好的金额，见rollup.py）
+数据库使用WAL模式，后台保存线程写入时界面仍可读取。
+"""
+import sqlite3
+import threading
+from datetime import datetime
+
+DB_FILE = "budget.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    name TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    unit_price REAL NOT NULL,
+    is_length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    project_date TEXT NOT NULL DEFAULT '',
+    cycle TEXT NOT NULL DEFAULT '',
+    updated_at TEXT NOT NULL,
+    county TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '待实施',
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS project_quantities (
+    project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    item_id INTEGER NOT NULL,
+    quantity REAL NOT NULL,
+    PRIMARY KEY (project_id, item_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS price_versions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    label TEXT NOT NULL,
+    source TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,
+    base_id INTEGER REFERENCES price_versions(id),
+    depth INTEGER NOT NULL DEFAULT 0,
+    item_count INTEGER NOT NULL,
+    item_order BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS price_version_items (
+    version_id INTEGER NOT NULL REFERENCES price_versions(id) ON DELETE CASCADE,
+    item_id INTEGER NOT NULL,
+    category TEXT,
+    name TEXT,
+    unit TEXT,
+    unit_price REAL,
+    is_length INTEGER,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (version_id, item_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_projects (
+    project_id INTEGER PRIMARY KEY,
+    revision INTEGER NOT NULL,
+    price_key TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollup_rows (
+    project_id INTEGER NOT NULL,
+    item_id INTEGER NOT NULL,
+    quantity REAL NOT NULL,
+    fen INTEGER NOT NULL,
+    PRIMARY KEY (project_id, item_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+PROJECT_STATUSES = ("待实施", "实施中", "已完成")  # projects.status的取值
+
+# 旧版本数据库的projects表缺少的列（CREATE TABLE IF NOT EXISTS不会补列）
+PROJECT_COLUMNS = {
+    "county": "TEXT NOT NULL DEFAULT ''",
+    "status": "TEXT NOT NULL DEFAULT '待实施'",
+    "revision": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def merge_snapshots(older, newer):
+    """合并两份待保存数据：预算表（及随之记录的其他字段）取较新的一份，各项目按项目ID合并"""
+    base = newer if newer["items"] is not None else older
+    return dict(base, projects={**older["projects"], **newer["projects"]})
+
+
+class SqliteBudgetDB:
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self._local = threading.local()  # sqlite连接不能跨线程使用，每个线程单独连接
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(projects)")}
+        with conn:
+            for name, decl in PROJECT_COLUMNS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE projects ADD COLUMN {name} {decl}")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    # ===================== 预算表 =====================
+    def load_items(self):
+        rows = self._conn().execute(
+            "SELECT id, category, name, unit, unit_price, is_length FROM items ORDER BY seq")
+        return [{"id": item_id, "category": category, "name": name, "unit": unit,
+                 "unit_price": unit_price, "quantity": 0.0, "total": 0.0, "is_length": bool(is_length)}
+                for item_id, category, name, unit, unit_price, is_length in rows]
+
+    def _replace_items(self, conn, items):
+        conn.execute("DELETE FROM items")
+        conn.executemany(
+            "INSERT INTO items (id, seq, category, name, unit, unit_price, is_length) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((item["id"], seq, item["category"], item["name"], item["unit"], float(item["unit_price"]),
+              int(bool(item["is_length"]))) for seq, item in enumerate(items)))
+        # 已删除项目的工程量一并清除
+        conn.execute("DELETE FROM project_quantities WHERE item_id NOT IN (SELECT id FROM items)")
+
+    def replace_items(self, items):
+        conn = self._conn()
+        with conn:
+            self._replace_items(conn, items)
+
+    # ===================== 已保存项目 =====================
+    def list_projects(self):
+        """按最近修改时间排序的(项目ID, 项目名称)列表"""
+        return self._conn().execute("SELECT id, name FROM projects ORDER BY updated_at DESC, id DESC").fetchall()
+
+    def create_project(self, name, project_date="", cycle=""):
+        conn = self._conn()
+        with conn:
+            cur = conn.execute("INSERT INTO projects (name, project_date, cycle, updated_at) VALUES (?, ?, ?, ?)",
+                               (name, project_date, cycle, datetime.now().isoformat(timespec="seconds")))
+        return cur.lastrowid
+
+    def delete_project(self, project_id):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+
+    def load_project(self, project_id):
+        """返回(项目信息, {项目ID: 工程量})，项目不存在时返回(None, {})"""
+        conn = self._conn()
+        row = conn.execute("SELECT name, project_date, cycle, county, status FROM projects WHERE id = ?",
+                           (project_id,)).fetchone()
+        if row is None:
+            return None, {}
+        quantities = dict(conn.execute(
+            "SELECT item_id, quantity FROM project_quantities WHERE project_id = ?", (project_id,)))
+        return dict(zip(("name", "project_date", "cycle", "county", "status"), row)), quantities
+
+    def set_project_status(self, project_id, status):
+        """修改项目状态，返回是否存在该项目"""
+        conn = self._conn()
+        with conn:
+            cur = conn.execute("UPDATE projects SET status = ?, revision = revision + 1 WHERE id = ?",
+                               (status, project_id))
+        return cur.rowcount > 0
+
+    def _save_project(self, conn, project_id, project):
+        cur = conn.execute("UPDATE projects SET name = ?, project_date = ?, cycle = ?, updated_at = ?, "
+                           "county = COALESCE(?, county), status = COALESCE(?, status), revision = revision + 1 "
+                           "WHERE id = ?",
+                           (project["name"], project["project_date"], project["cycle"],
+                            datetime.now().isoformat(timespec="seconds"), project.get("county"),
+                            project.get("status"), project_id))
+        if cur.rowcount == 0:  # 保存排队期间项目已被删除
+            return
+        conn.execute("DELETE FROM project_quantities WHERE project_id = ?", (project_id,))
+        conn.executemany("INSERT INTO project_quantities (project_id, item_id, quantity) VALUES (?, ?, ?)",
+                         ((project_id, item_id, quantity) for item_id, quantity in project["quantities"].items()))
+
+    def save_snapshot(self, snapshot):
+        """在一个事务中写入预算表（有变化时）和各项目的工程量（供后台保存线程调用）"""
+        conn = self._conn()
+        with conn:
+            if snapshot["items"] is not None:
+                self._replace_items(conn, snapshot["items"])
+            for project_id, project in snapshot["projects"].items():
+                self._save_project(conn, project_id, project)
+
+    def all_project_quantities(self):
+        """全部已保存项目的工程量：[(项目ID, 预算项目ID, 工程量)]"""
+        return self._conn().execute("SELECT project_id, item_id, quantity FROM project_quantities").fetchall()
+
+    # ===================== 跨项目汇总索引 =====================
+    def project_table(self):
+        """全部已保存项目：[(项目ID, 名称, 日期, 申请单位, 状态, revision)]"""
+        return self._conn().execute(
+            "SELECT id, name, project_date, county, status, revision FROM projects ORDER BY id").fetchall()
+
+    def project_quantities_of(self, project_ids):
+        """指定项目的工程量：[(项目ID, 预算项目ID, 工程量)]"""
+        conn = self._conn()
+        rows = []
+        ids = list(project_ids)
+        for start in range(0, len(ids), 500):  # 分批，避免超过SQLite参数个数上限
+            chunk = ids[start:start + 500]
+            rows += conn.execute(f"SELECT project_id, item_id, quantity FROM project_quantities "
+                                 f"WHERE project_id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+        return rows
+
+    def rollup_state(self):
+        """{项目ID: (索引时的revision, 预算表标识)}"""
+        rows = self._conn().execute("SELECT project_id, revision, price_key FROM rollup_projects")
+        return {project_id: (revision, price_key) for project_id, revision, price_key in rows}
+
+    def update_rollup(self, project_ids, rows, states):
+        """一个事务中替换指定项目的索引行：先删除project_ids的旧行，再写入rows与states"""
+        conn = self._conn()
+        with conn:
+            conn.executemany("DELETE FROM rollup_rows WHERE project_id = ?", ((pid,) for pid in project_ids))
+            conn.executemany("DELETE FROM rollup_projects WHERE project_id = ?", ((pid,) for pid in project_ids))
+            conn.executemany("INSERT INTO rollup_rows (project_id, item_id, quantity, fen) VALUES (?, ?, ?, ?)", rows)
+            conn.executemany("INSERT INTO rollup_projects (project_id, revision, price_key) VALUES (?, ?, ?)", states)
+
+    def rollup_rows(self):
+        """索引中全部行：[(项目ID, 预算项目ID, 工程量, 金额（分）)]"""
+        return self._conn().execute("SELECT project_id, item_id, quantity, fen FROM rollup_rows").fetchall()
+
+    # ===================== 预算表版本 =====================
+    def list_price_versions(self):
+        """按保存顺序的版本信息列表（不含版本内容）"""
+        rows = self._conn().execute(
+            "SELECT id, label, source, created_at, base_id, depth, item_count FROM price_versions ORDER BY id")
+        keys = ("id", "label", "source", "created_at", "base_id", "depth", "item_count")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def insert_price_version(self, label, source, base_id, depth, item_count, item_order, rows):
+        """保存一个版本；item_order为压缩后的项目顺序，rows为[(预算项目ID, 类别, 名称, 单位, 单价, 是否长度类, 是否删除)]，
+        返回版本ID"""
+        conn = self._conn()
+        with conn:
+            cur = conn.execute(
+                "INSERT INTO price_versions (label, source, created_at, base_id, depth, item_count, item_order) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (label, source, datetime.now().isoformat(timespec="seconds"), base_id, depth, item_count, item_order))
+            version_id = cur.lastrowid
+            conn.executemany(
+                "INSERT INTO price_version_items (version_id, item_id, category, name, unit, unit_price, is_length, "
+                "deleted) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", ((version_id,) + tuple(row) for row in rows))
+        return version_id
+
+    def price_version_rows(self, version_id):
+        return self._conn().execute(
+            "SELECT item_id, category, name, unit, unit_price, is_length, deleted FROM price_version_items "
+            "WHERE version_id = ?", (version_id,)).fetchall()
+
+    def price_version_order(self, version_id):
+        row = self._conn().execute("SELECT item_order FROM price_versions WHERE id = ?", (version_id,)).fetchone()
+        return row[0] if row else None
+
+    # ===================== 其他设置 =====================
+    def get_meta(self, key, default=None):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
@@ -0,0 +1,61 @@
+"""测试公共数据：仓库自带的预算表doc/家集客预算表.xlsx，以及小型合成预算表（随机单价和工程量）"""
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # 项目根目录
+sys.path.insert(0, ROOT)
+
+PRICE_BOOK = os.path.join(ROOT, "doc", "家集客预算表.xlsx")
+
+
+def make_items(count, seed=0, quantities=True):
+    """合成预算数据（字典列表，ID为1..count，合计已计算），约一半项目的工程量不为0"""
+    from budget_core import calc_total_amount
+    rng = random.Random(seed)
+    items = []
+    for item_id in range(1, count + 1):
+        material = rng.random() < 0.3
+        is_length = not material and rng.random() < 0.2
+        quantity = round(rng.uniform(0, 50), rng.choice((0, 1, 2))) if quantities and rng.random() < 0.5 else 0.0
+        items.append({
+            "id": item_id,
+            "category": "材料项目" if material else "施工项目",
+            "name": f"{'材料' if material else '施工'}{item_id}{'元/公里' if is_length else ''}",
+            "unit": "个" if material else ("公里" if is_length else "个/户/处等"),
+            "unit_price": round(rng.uniform(0.01, 3000), 2),
+            "quantity": quantity,
+            "total": 0.0,
+            "is_length": is_length,
+        })
+    calc_total_amount(items)
+    return items
+
+
+@pytest.fixture(scope="session")
+def price_book_items():
+    from budget_core import read_price_book
+    return read_price_book(PRICE_BOOK)
+
+
+@pytest.fixture
+def items():
+    return make_items(40)
+
+
+def assert_table(table, expected):
+    """预算表内容与汇总（合计、类别小计、工作量清单）与按字典列表逐项计算的结果一致"""
+    from budget_core import calc_total_amount, generate_work_list
+    expected = [dict(item) for item in expected]
+    total = calc_total_amount(expected)
+    assert table.to_list() == expected
+    assert [dict(row) for row in table] == expected
+    assert table.total_amount == total
+    assert table.work_list() == generate_work_list(expected)
+    assert table.nonzero_count == sum(item["quantity"] > 0 for item in expected)
+    categories = {item["category"] for item in expected}
+    assert {key: fen for key, fen in table.category_fen.items() if key in categories} == {
+        category: sum(round(item["total"] * 100) for item in expected if item["category"] == category)
+        for category in categories}
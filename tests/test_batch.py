@@ -0,0 +1,147 @@
+"""批量生成：站点清单解析（工程量列、基础信息覆盖、图片目录、重名项目），按站点生成文档到目录或ZIP"""
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+import batch
+from benchmarks import synthetic
+from budget_core import DEFAULT_BASE_INFO, generate_work_list
+from .conftest import make_items
+
+
+@pytest.fixture
+def budget():
+    return [dict(item, quantity=0.0, total=0.0) for item in make_items(10)]
+
+
+@pytest.fixture
+def templates(tmp_path):
+    return synthetic.application_template(str(tmp_path)), synthetic.review_template(str(tmp_path))
+
+
+def _manifest(tmp_path, rows):
+    path = str(tmp_path / "站点清单.xlsx")
+    pd.DataFrame(rows).to_excel(path, index=False)
+    return path
+
+
+def test_read_manifest(tmp_path, budget):
+    os.makedirs(tmp_path / "照片")
+    for name in ("b.jpg", "a.png", "说明.txt"):
+        (tmp_path / "照片" / name).write_bytes(b"")
+    path = _manifest(tmp_path, {
+        "项目名称": ["站点/A", "站点/A", None, "站点B"],
+        "项目日期": ["2026年10月1日", None, None, None],
+        "实施周期": [None, "30天", None, None],
+        "申请单位": ["吉木萨尔县分公司", None, None, None],
+        "图片目录": ["照片", None, None, None],
+        budget[4]["name"]: [2, None, 1, "x"],
+        budget[1]["name"]: [0.5, 1, 1, 0],
+        "不存在的项目": [1, 1, 1, 1],
+    })
+    sites, unknown = batch.read_manifest(path, budget, dict(DEFAULT_BASE_INFO))
+    assert unknown == ["不存在的项目"]
+    assert [site["row"] for site in sites] == [2, 3, 5]  # 项目名称为空的行跳过
+    assert [site["file_stem"] for site in sites] == ["站点_A", "站点_A_2", "站点B"]
+
+    first, second, third = sites
+    assert [(item["id"], item["quantity"]) for item in first["items"]] == [(2, 0.5), (5, 2.0)]  # 按预算表顺序
+    assert first["project_date"] == "2026年10月1日" and first["cycle"] == batch.DEFAULT_CYCLE
+    assert first["base_info"]["申请单位"] == "吉木萨尔县分公司"
+    assert second["base_info"] == DEFAULT_BASE_INFO and second["cycle"] == "30天"
+    assert first["image_paths"] == [str(tmp_path / "照片" / "a.png"), str(tmp_path / "照片" / "b.jpg")]
+    assert second["image_paths"] == []
+    assert third["items"] == []
+
+
+def test_read_manifest_requires_project_name(tmp_path, budget):
+    path = _manifest(tmp_path, {"名称": ["站点"]})
+    with pytest.raises(ValueError, match="项目名称"):
+        batch.read_manifest(path, budget, dict(DEFAULT_BASE_INFO))
+
+
+def test_read_manifest_rejects_duplicated_names(tmp_path, budget):
+    budget[7]["name"] = budget[2]["name"]
+    path = _manifest(tmp_path, {"项目名称": ["站点"], budget[2]["name"]: [1], budget[1]["name"]: [1]})
+    with pytest.raises(ValueError, match=budget[2]["name"]):
+        batch.read_manifest(path, budget, dict(DEFAULT_BASE_INFO))
+    # 不引用重名项目的清单照常读取
+    path = _manifest(tmp_path, {"项目名称": ["站点"], budget[1]["name"]: [1]})
+    sites, _ = batch.read_manifest(path, budget, dict(DEFAULT_BASE_INFO))
+    assert [item["id"] for item in sites[0]["items"]] == [2]
+
+
+def _sites(tmp_path, budget):
+    path = _manifest(tmp_path, {"项目名称": ["站点A", "站点B", "空站点"],
+                                budget[0]["name"]: [1, 2, 0], budget[3]["name"]: [3, 0, 0]})
+    return batch.read_manifest(path, budget, dict(DEFAULT_BASE_INFO))[0]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_run_batch_to_directory(tmp_path, budget, templates, jobs):
+    sites = _sites(tmp_path, budget)
+    out_dir = str(tmp_path / "输出")
+    results = {site["project_name"]: (total, paths, error)
+               for site, total, paths, error in batch.run_batch(sites, *templates, out_dir, jobs, excel=True)}
+    assert results["空站点"] == (0.0, [], "无有效项目")
+    total, paths, error = results["站点A"]
+    assert error is None
+    assert total == batch.calc_total_amount([dict(item) for item in sites[0]["items"]])
+    assert [os.path.basename(p) for p in paths] == ["站点A_申请表.docx", "站点A_会审单.docx", "站点A_预算清单.xlsx"]
+    assert sorted(os.listdir(out_dir)) == sorted(f"{stem}_{kind}" for stem in ("站点A", "站点B")
+                                                 for kind in ("申请表.docx", "会审单.docx", "预算清单.xlsx"))
+    with zipfile.ZipFile(paths[0]) as zf:
+        document = zf.read("word/document.xml").decode("utf-8")
+    assert generate_work_list(sites[0]["items"]) in document
+
+
+
+def _docx_names(stem):
+    return [f"{stem}_申请表.docx", f"{stem}_会审单.docx"]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_run_batch_to_zip(tmp_path, budget, templates, jobs):
+    sites = _sites(tmp_path, budget)
+    zip_path = str(tmp_path / "打包" / "全部.zip")
+    output = batch.ZipOutput(zip_path)
+    try:
+        results = {site["project_name"]: (paths, error)
+                   for site, _, paths, error in batch.run_batch(sites, *templates, output, jobs)}
+    finally:
+        output.close()
+    assert results["站点A"] == ([f"{zip_path}:{name}" for name in _docx_names("站点A")], None)
+    assert results["空站点"] == ([], "无有效项目")
+    with zipfile.ZipFile(zip_path) as zf:
+        assert sorted(zf.namelist()) == sorted(_docx_names("站点A") + _docx_names("站点B"))
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in zf.infolist())
+        with zipfile.ZipFile(zf.open("站点A_申请表.docx")) as docx:
+            document = docx.read("word/document.xml").decode("utf-8")
+    assert generate_work_list(sites[0]["items"]) in document
+    assert not os.path.exists(tmp_path / "输出")  # 不产生散文件
+
+
+def test_run_batch_zip_per_site(tmp_path, budget, templates):
+    sites = _sites(tmp_path, budget)
+    out_dir = str(tmp_path / "输出")
+    output = batch.SiteZipOutput(out_dir)
+    results = list(batch.run_batch(sites, *templates, output, 2, excel=True))
+    output.close()
+    assert sorted(os.listdir(out_dir)) == ["站点A.zip", "站点B.zip"]
+    with zipfile.ZipFile(os.path.join(out_dir, "站点B.zip")) as zf:
+        assert zf.namelist() == _docx_names("站点B") + ["站点B_预算清单.xlsx"]
+    assert sum(error is not None for *_, error in results) == 1
+
+
+def test_main_zip(tmp_path, budget, templates):
+    budget_path = str(tmp_path / "budget_data.json")
+    pd.DataFrame(budget).to_json(budget_path, orient="records", force_ascii=False)
+    manifest = _manifest(tmp_path, {"项目名称": ["站点A"], budget[0]["name"]: [1]})
+    zip_path = str(tmp_path / "全部.zip")
+    argv = [manifest, "--app-template", templates[0], "--review-template", templates[1], "--budget", budget_path,
+            "--config", str(tmp_path / "无配置.json"), "--jobs", "1", "--zip", zip_path]
+    assert batch.main(argv) == 0
+    with zipfile.ZipFile(zip_path) as zf:
+        assert sorted(zf.namelist()) == sorted(_docx_names("站点A"))
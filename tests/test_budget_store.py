@@ -0,0 +1,152 @@
+"""BudgetTable：按ID查找、修改、删除，新增时保留未占用的ID，删除后其余项目ID不变；合计与清单随修改增量更新；
+列式存储的整理、整列读取与快照"""
+import random
+
+import pytest
+
+from budget_core import to_fen, work_item_text
+from budget_store import BudgetTable, snapshot_records
+from .conftest import assert_table, make_items
+
+
+def test_build(items):
+    table = BudgetTable(items)
+    assert len(table) == len(items)
+    assert 3 in table and 99 not in table
+    assert dict(table.get(3)) == items[2]
+    assert table.get(99) is None
+    assert_table(table, items)
+
+
+def test_price_book(price_book_items):
+    assert len(price_book_items) == 80
+    assert [item["id"] for item in price_book_items] == list(range(1, 81))
+    assert sum(item["category"] == "材料项目" for item in price_book_items) == 23
+    assert all(item["is_length"] == (item["unit"] == "公里") for item in price_book_items)
+    table = BudgetTable(price_book_items)
+    assert_table(table, price_book_items)
+    assert table.work_list() == "无有效项目"
+
+
+def test_update(items):
+    table = BudgetTable(items)
+    row = table.update(3, quantity=7.25)
+    items[2]["quantity"] = 7.25
+    assert row["quantity"] == 7.25
+    table.update(5, unit_price=12.345, name="改名", category="材料项目", total=1.0)  # 合计由工程量×单价得出
+    items[4].update(unit_price=12.345, name="改名", category="材料项目")
+    table.update(7, quantity=0)
+    items[6]["quantity"] = 0.0
+    assert_table(table, items)
+    with pytest.raises(KeyError):
+        table.update(999, quantity=1)
+    with pytest.raises(KeyError):
+        table.update(1, color="红")
+
+
+def test_add_keeps_free_id(items):
+    table = BudgetTable(items)
+    new = dict(items[0], id=100, name="新增")
+    assert table.add(new)["id"] == 100
+    assert table.add(dict(new, id=100))["id"] == 101  # ID已被占用时分配新ID
+    assert table.add(dict(new, id=None))["id"] == 102
+    assert_table(table, items + [dict(new, id=100), dict(new, id=101), dict(new, id=102)])
+
+
+def test_delete_keeps_ids(items):
+    table = BudgetTable(items)
+    assert table.delete(2) == items[1]
+    assert table.get(2) is None
+    assert table.delete(40) == items[39]
+    assert_table(table, items[:1] + items[2:39])  # 其余项目ID不变，不重新编号
+    assert table.add(dict(items[0], id=None))["id"] == 41  # 已删除的ID不再分配
+    with pytest.raises(KeyError):
+        table.delete(2)
+
+
+def test_row_view_after_delete(items):
+    table = BudgetTable(items)
+    row = table.get(4)
+    table.delete(4)
+    with pytest.raises(KeyError):
+        row["name"]
+
+
+def test_aggregates_follow_edits():
+    items = make_items(200, seed=3)
+    table = BudgetTable(items)
+    rng = random.Random(3)
+    for _ in range(300):
+        item = rng.choice(items)
+        if rng.random() < 0.8:
+            item["quantity"] = rng.choice((0.0, round(rng.uniform(0, 30), 2)))
+            table.update(item["id"], quantity=item["quantity"])
+        else:
+            item["unit_price"] = round(rng.uniform(0, 100), 3)
+            table.update(item["id"], unit_price=item["unit_price"])
+        assert table.total_fen == sum(to_fen(i["quantity"], i["unit_price"]) for i in items)
+    assert_table(table, items)
+    for item in items[::3]:
+        table.delete(item["id"])
+    assert_table(table, [item for item in items if item not in items[::3]])
+
+
+def test_work_list_keeps_display_order(items):
+    table = BudgetTable([dict(item, quantity=0.0) for item in items])
+    for item_id in (30, 2, 17, 9):  # 修改顺序与显示顺序不同
+        table.update(item_id, quantity=1.5)
+    assert table.work_list() == "，".join(work_item_text(table.get(i)) for i in (2, 9, 17, 30))
+    table.update(17, quantity=-1)  # 负数计入合计，不列入清单
+    assert table.work_list() == "，".join(work_item_text(table.get(i)) for i in (2, 9, 30))
+    assert table.nonzero_count == 3
+    assert table.total_fen == sum(to_fen(table.get(i)["quantity"], table.get(i)["unit_price"]) for i in (2, 9, 17, 30))
+
+
+def test_compaction_keeps_order():
+    items = make_items(300, seed=2)
+    table = BudgetTable(items)
+    removed = set(random.Random(2).sample(range(1, 301), 220))
+    for item_id in removed:
+        table.delete(item_id)
+    remaining = [item for item in items if item["id"] not in removed]
+    assert table._n < 300  # 已整理
+    assert_table(table, remaining)
+    table.update(remaining[-1]["id"], quantity=3)
+    remaining[-1]["quantity"] = 3.0
+    assert_table(table, remaining)
+
+
+def test_rows_quantities_and_set_quantities(items):
+    table = BudgetTable(items)
+    assert [row["id"] for row in table.rows("材料项目")] == [i["id"] for i in items if i["category"] == "材料项目"]
+    assert [row["id"] for row in table.rows(nonzero=True)] == [i["id"] for i in items if i["quantity"] > 0]
+    assert table.quantities() == {i["id"]: i["quantity"] for i in items if i["quantity"] > 0}
+    assert table.names() == ([i["id"] for i in items], [i["name"] for i in items])
+
+    quantities = {1: 2.0, 2: 0.5, 40: 9.0}
+    changed = table.set_quantities(quantities)
+    for item in items:
+        item["quantity"] = quantities.get(item["id"], 0.0)
+    assert table.quantities() == quantities
+    assert len(changed) > 0
+    assert table.set_quantities(quantities) == []
+    assert_table(table, items)
+
+
+def test_snapshot_records(items):
+    table = BudgetTable(items)
+    table.delete(3)
+    table.update(4, name="新名称", quantity=1.5)
+    records = snapshot_records(table.snapshot())
+    assert records == [dict(row) for row in table] == table.to_list()
+    assert [type(value) for value in records[0].values()] == [int, str, str, str, float, float, float, bool]
+
+
+def test_price_version(items):
+    table = BudgetTable(items)
+    version = table.price_version
+    table.update(1, quantity=3)
+    table.set_quantities({2: 1.0})
+    assert table.price_version == version  # 只改工程量
+    table.update(1, unit_price=9.9)
+    assert table.price_version == version + 1
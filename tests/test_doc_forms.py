@@ -0,0 +1,41 @@
+"""模板编译：填写位置为(行, 列)坐标，按关键字定位到标签右侧的单元格，超出表格的固定坐标跳过"""
+import os
+
+from docx import Document
+
+import doc_forms
+from benchmarks import synthetic
+
+
+def test_application_slots(tmp_path):
+    template = doc_forms.load_template(synthetic.application_template(str(tmp_path)), "application")
+    slots = template.slots
+    assert (slots["name"], slots["list"], slots["image"]) == ((1, 1), (3, 1), (4, 1))
+    assert slots["fixed"] == doc_forms.APPLICATION_FIXED_CELLS
+    doc, cells = template.new_document()
+    assert cells[slots["list"]]._tc is doc.tables[0].cell(3, 1)._tc
+
+
+def test_review_slots(tmp_path):
+    slots = doc_forms.load_template(synthetic.review_template(str(tmp_path)), "review").slots
+    assert (slots["name"], slots["list"], slots["plan"]) == ((0, 1), (4, 1), (5, 1))
+
+
+def test_fixed_cells_outside_table(tmp_path):
+    path = str(tmp_path / "小表格.docx")
+    doc = Document()
+    table = doc.add_table(rows=2, cols=3)
+    table.cell(1, 0).text = "维修项目名称"
+    table.cell(0, 0).text = "其他需求支撑文件"
+    doc.save(path)
+    slots = doc_forms.load_template(path, "application").slots
+    assert slots["fixed"] == [(0, 1), None, None, None, None, None, None, None]  # (0, 3)等超出2行3列
+    assert slots["name"] == (1, 1)
+
+
+def test_template_cache(tmp_path):
+    path = synthetic.application_template(str(tmp_path))
+    template = doc_forms.load_template(path, "application")
+    assert doc_forms.load_template(path, "application") is template
+    os.utime(path, ns=(0, 0))  # 修改时间变化、内容不变时不重新编译
+    assert doc_forms.load_template(path, "application") is template
@@ -0,0 +1,82 @@
+"""文档生成服务：任务校验（400）、生成结果与耗时统计、关闭时取消排队中的任务"""
+import io
+import math
+import threading
+import zipfile
+
+import pytest
+
+import doc_service
+from benchmarks import synthetic
+from budget_core import DEFAULT_BASE_INFO
+from .conftest import make_items
+
+
+@pytest.fixture
+def budget():
+    return [dict(item, quantity=0.0, total=0.0) for item in make_items(10)]
+
+
+@pytest.mark.parametrize("job, message", [
+    ([], "JSON对象"),
+    ({"quantities": {}}, "项目名称"),
+    ({"project_name": "站点", "quantities": {"施工1": "abc"}}, "有效数字"),
+    ({"project_name": "站点", "quantities": {"施工1": -1}}, "不小于0"),
+    ({"project_name": "站点", "quantities": {"施工1": math.inf}}, "有限数字"),
+    ({"project_name": "站点", "quantities": {"无此项": 1}}, "无此项"),
+    ({"project_name": "站点", "images": ["不是base64"]}, "base64"),
+])
+def test_build_site_rejects(budget, job, message):
+    with pytest.raises(ValueError, match=message):
+        doc_service.build_site(job, budget, dict(DEFAULT_BASE_INFO))
+
+
+def test_build_site(budget):
+    site = doc_service.build_site({"project_name": "站点/1", "quantities": {"3": 2, budget[0]["name"]: 1.5},
+                                   "base_info": {"申请单位": "玛纳斯县分公司", "无关": "x"}}, budget,
+                                  dict(DEFAULT_BASE_INFO))
+    assert [(item["id"], item["quantity"]) for item in site["items"]] == [(1, 1.5), (3, 2.0)]
+    assert site["base_info"] == dict(DEFAULT_BASE_INFO, 申请单位="玛纳斯县分公司")
+    assert site["file_stem"] == "站点_1"
+
+
+def test_service(tmp_path, budget):
+    templates = synthetic.application_template(str(tmp_path)), synthetic.review_template(str(tmp_path))
+    service = doc_service.DocumentService(budget, dict(DEFAULT_BASE_INFO), *templates, jobs=1, engine="ooxml",
+                                          max_queue=10)
+    try:
+        assert service.status()["latency_ms"] == {}
+        total, data = service.submit({"project_name": "站点", "quantities": {"1": 2}, "excel": True})
+        assert total == round(2 * budget[0]["unit_price"], 2)
+        assert sorted(zipfile.ZipFile(io.BytesIO(data)).namelist()) == ["站点_会审单.docx", "站点_申请表.docx",
+                                                                         "站点_预算清单.xlsx"]
+        status = service.status()
+        assert status["completed"] == 1 and status["latency_ms"]["samples"] == 1
+        assert status["latency_ms"]["avg"] == status["latency_ms"]["max"]
+    finally:
+        service.close()
+
+
+def test_close_cancels_queued(tmp_path, budget):
+    templates = synthetic.application_template(str(tmp_path)), synthetic.review_template(str(tmp_path))
+    service = doc_service.DocumentService(budget, dict(DEFAULT_BASE_INFO), *templates, jobs=1, max_queue=20)
+    results = []
+
+    def submit(i):
+        try:
+            results.append(service.submit({"project_name": f"站点{i}", "quantities": {"1": 1}})[0])
+        except Exception as e:
+            results.append(type(e).__name__)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    while len(service.futures) + len(results) < 8:  # 全部提交到进程池
+        pass
+    service.close()
+    for thread in threads:
+        thread.join(60)
+    assert not any(thread.is_alive() for thread in threads)
+    assert "CancelledError" in results
+    status = service.status()
+    assert status["completed"] + status["failed"] == 8 and status["in_flight"] == 0
@@ -0,0 +1,123 @@
+"""撤销/重做：随机修改后全部撤销恢复初始状态，全部重做恢复最终状态；删除的项目按原ID插回原位置"""
+import random
+
+from budget_store import BudgetTable
+from edit_history import EditHistory
+from .conftest import assert_table, make_items
+
+
+def _random_edits(table, history, rng, steps):
+    for step in range(steps):
+        ids = [row["id"] for row in table]
+        action = rng.random()
+        if action < 0.4:
+            history.update(table, "修改工程量", rng.choice(ids), quantity=round(rng.uniform(0, 20), 2))
+        elif action < 0.55:
+            history.update(table, "修改项目", rng.choice(ids), name=f"改名{step}", unit_price=round(rng.uniform(1, 99), 2))
+        elif action < 0.7 and len(ids) > 5:
+            history.delete(table, "删除项目", rng.choice(ids))
+        elif action < 0.85:
+            history.add(table, "新增项目", {"category": "材料项目", "name": f"新增{step}", "unit": "个",
+                                            "unit_price": 2.5, "quantity": rng.choice((0.0, 4.0)), "is_length": False})
+        else:
+            quantities = {item_id: float(rng.randint(1, 9)) for item_id in rng.sample(ids, min(5, len(ids)))}
+            history.set_quantities(table, "导入工程量", quantities)
+
+
+def test_undo_redo_round_trip():
+    for seed in range(5):
+        rng = random.Random(seed)
+        items = make_items(30, seed=seed)
+        table = BudgetTable(items)
+        history = EditHistory()
+        _random_edits(table, history, rng, 60)
+        final = table.to_list()
+
+        while history.can_undo:
+            assert history.undo(table) is not None
+        assert_table(table, items)
+        assert history.undo(table) is None
+
+        while history.can_redo:
+            history.redo(table)
+        assert_table(table, final)
+
+
+def test_undo_result():
+    table = BudgetTable(make_items(10))
+    history = EditHistory()
+    history.update(table, "修改工程量", 2, quantity=5)
+    history.delete(table, "删除项目", 3)
+    label, changed, structural = history.undo(table)
+    assert (label, changed, structural) == ("删除项目", [], True)
+    assert table.next_id(2) == 3  # 插回原位置
+    label, changed, structural = history.undo(table)
+    assert (label, [row["id"] for row in changed], structural) == ("修改工程量", [2], False)
+
+
+def test_unchanged_update_not_recorded():
+    table = BudgetTable(make_items(10))
+    history = EditHistory()
+    history.update(table, "修改", 1, name=table.get(1)["name"])
+    assert not history.can_undo
+
+
+def test_new_edit_clears_redo():
+    table = BudgetTable(make_items(10))
+    history = EditHistory()
+    history.update(table, "修改", 1, quantity=1)
+    history.undo(table)
+    assert history.can_redo
+    history.update(table, "修改", 2, quantity=1)
+    assert not history.can_redo
+
+
+def test_max_steps():
+    items = make_items(10)
+    table = BudgetTable(items)
+    history = EditHistory(max_steps=3)
+    for quantity in range(1, 6):
+        history.update(table, "修改", 1, quantity=quantity)
+    undone = 0
+    while history.undo(table):
+        undone += 1
+    assert undone == 3
+    assert table.get(1)["quantity"] == 2.0  # 最早两步已丢弃
+
+
+def test_history_follows_table():
+    table = BudgetTable(make_items(10))
+    history = EditHistory()
+    history.update(table, "修改", 1, quantity=1)
+    assert history.undo(BudgetTable(make_items(10))) is None  # 预算表整体替换后历史清空
+
+
+def test_insert_restores_position(items):
+    table = BudgetTable(items)
+    for item_id in (1, 10, 40):
+        before = table.next_id(item_id)
+        table.insert(table.delete(item_id), before)
+        assert_table(table, items)
+    assert table.next_id(40) is None
+    table.insert(dict(items[0], id=2, name="ID被占用"), 5)
+    assert table.next_id(41) == 5  # ID已被占用时分配新ID
+
+
+
+class _PrependTable(BudgetTable):
+    """新增项目插在最前面（重做新增时不能假设新增项目在末尾）"""
+
+    def add(self, item):
+        return self.insert(item, next(iter(self))["id"])
+
+
+def test_redo_add_restores_position(items):
+    table = _PrependTable(items)
+    history = EditHistory()
+    item_id = history.add(table, "新增项目", dict(items[0], id=None, name="新增"))["id"]
+    order = [row["id"] for row in table]
+    assert order[0] == item_id
+    history.undo(table)
+    assert item_id not in table
+    history.redo(table)
+    assert [row["id"] for row in table] == order
@@ -0,0 +1,25 @@
+"""金额计算：to_fen按十进制四舍五入到分，合计按分累加"""
+import pytest
+
+from budget_core import calc_total_amount, to_fen
+
+
+@pytest.mark.parametrize("quantity, unit_price, fen", [
+    (0, 123.45, 0),
+    (1, 0.005, 1),  # 0.5分进位
+    (1, 0.004, 0),
+    (3, 1.005, 302),  # 浮点计算为301.4999…
+    (1.5, 0.01, 2),
+    (2.675, 100, 26750),
+    (0.1, 0.3, 3),
+    (12.34, 56.78, 70067),
+])
+def test_to_fen_rounds_half_up(quantity, unit_price, fen):
+    assert to_fen(quantity, unit_price) == fen
+
+
+def test_calc_total_amount_sums_fen():
+    items = [{"quantity": 1, "unit_price": 0.1} for _ in range(3)] + [{"quantity": 3, "unit_price": 1.005}]
+    assert calc_total_amount(items) == 3.32
+    assert [item["total"] for item in items] == [0.1, 0.1, 0.1, 3.02]
+
@@ -0,0 +1,69 @@
+"""名称搜索：索引与逐个比对（scan）结果相同，索引随新增、改名、删除增量更新，后台建立期间照常搜索"""
+import random
+
+from budget_store import BudgetTable
+from name_search import NameIndex, match_span, scan
+
+QUERIES = ("光缆", "熔接", "接头 盒", "ONU", "元/芯", "芯", "安装 光", "不存在的名称")
+
+
+def _scan(table, query):
+    ids, names = table.names()
+    return scan(zip(ids, names), query, {item_id: pos for pos, item_id in enumerate(ids)})
+
+
+def test_search_matches_scan(price_book_items):
+    table = BudgetTable(price_book_items)
+    for query in QUERIES:
+        assert table.search(query) == _scan(table, query)
+    assert table.search("") is None and table.search("  ") is None
+
+
+def test_index_follows_edits(price_book_items):
+    table = BudgetTable(price_book_items)
+    table.search("光缆")  # 建立索引
+    rng = random.Random(0)
+    for step in range(30):
+        item_id = rng.choice(table.names()[0])
+        if step % 3 == 0:
+            table.delete(item_id)
+        elif step % 3 == 1:
+            table.update(item_id, name=f"测试光缆{step}")
+        else:
+            table.add(dict(table.get(item_id), id=None, name=f"新增熔接{step}"))
+        for query in QUERIES + ("测试光缆", "新增"):
+            assert table.search(query) == _scan(table, query)
+
+
+def test_background_build(price_book_items):
+    table = BudgetTable(price_book_items)
+    table.start_name_index()
+    table.update(1, name="改名光缆")  # 建立期间改名，装入前重新建立
+    assert table.search("改名光缆") == [1]
+    while not table.poll_name_index():
+        pass
+    assert table._name_index is not None
+    assert "改名光缆" in table._name_index._names.values()
+    for query in QUERIES:
+        assert table.search(query) == _scan(table, query)
+
+
+def test_normalized_match():
+    index = NameIndex([{"id": 1, "name": "ＯＮＵ安装（室内）"}, {"id": 2, "name": "onu"}])
+    assert index.search("onu") == [2, 1]  # 名称与查询相同的排在前面
+    assert index.search("(室内") == [1]
+    assert match_span("皮线光缆布放", "光缆") == (2, 4)
+    assert match_span("㎞光缆", "光缆") is None  # 规范化改变了长度（㎞ -> km）
+
+
+
+def test_rank_order():
+    names = ["甲光缆缆接头", "甲光缆接头", "光缆接头盒", "乙甲光缆接", "光缆缆接", "光缆接", "乙光缆接", "甲光缆缆接",
+             "光缆接头", "丙光缆接"]
+    pairs = list(enumerate(names, 1))
+    order = {i: i for i, _ in pairs}
+    # 相同 > 前缀（按长度） > 连续出现（按位置、长度） > 字都出现（按第一个字的位置、长度），再按显示顺序
+    expected = [6, 9, 3, 7, 10, 2, 4, 5, 8, 1]
+    assert NameIndex({"id": i, "name": n} for i, n in pairs).search("光缆接", order) == expected
+    assert scan(pairs, "光缆接", order) == expected
+    assert scan(pairs, "光缆接", {i: -i for i in order})[3:5] == [10, 7]
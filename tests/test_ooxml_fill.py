@@ -0,0 +1,71 @@
+"""ooxml_fill与doc_forms（python-docx）填充结果相同：比较.docx中的全部部件（XML规范化后比较）"""
+import io
+import os
+import zipfile
+
+import pytest
+from docx import Document
+from lxml import etree
+
+import doc_forms
+import ooxml_fill
+from benchmarks import synthetic
+from budget_core import DEFAULT_BASE_INFO
+from .conftest import ROOT
+
+APPLICATION_TEMPLATES = ["synthetic", os.path.join(ROOT, "doc", "昌吉州家集客成本项目上报.docx")]
+REVIEW_TEMPLATES = ["synthetic", os.path.join(ROOT, "doc", "家集客成本项目方案会审 - （光猫安装、开通）.docx")]
+WORK_LIST = "120.00米 皮线光缆，2.00个 ONU安装（室内）\t<备注>&\"引号\"\n第二行"
+
+
+def _parts(document):
+    buffer = io.BytesIO()
+    document.save(buffer)
+    parts = {}
+    with zipfile.ZipFile(buffer) as zf:
+        for name in zf.namelist():
+            if name.endswith("/"): continue  # 模板中的目录项（python-docx不保留）
+            data = zf.read(name)
+            if name.endswith((".xml", ".rels")):
+                root = etree.fromstring(data)
+                if name == "[Content_Types].xml":  # Default/Override的先后顺序无意义
+                    root[:] = sorted(root, key=lambda el: etree.tostring(el, method="c14n"))
+                data = etree.tostring(root, method="c14n")
+            parts[name] = data
+    return parts
+
+
+def _template(path, tmp_path, make):
+    return make(str(tmp_path)) if path == "synthetic" else path
+
+
+@pytest.mark.parametrize("path", APPLICATION_TEMPLATES)
+@pytest.mark.parametrize("images", [0, 2])
+def test_application_form(path, images, tmp_path):
+    template = _template(path, tmp_path, synthetic.application_template)
+    if images: pytest.importorskip("PIL", reason="合成照片需要Pillow")
+    image_paths = synthetic.photos(str(tmp_path), count=images, size=(800, 600)) if images else []
+    args = (template, dict(DEFAULT_BASE_INFO), "某小区光猫安装", "2026-10-18", "15天", WORK_LIST, 1234.56, image_paths)
+    expected = _parts(doc_forms.fill_application_form(*args))
+    assert _parts(ooxml_fill.fill_application_form(*args)) == expected
+    assert sum(name.startswith("word/media/") for name in expected) == images
+
+
+@pytest.mark.parametrize("path", REVIEW_TEMPLATES)
+def test_review_form(path, tmp_path):
+    template = _template(path, tmp_path, synthetic.review_template)
+    args = (template, dict(DEFAULT_BASE_INFO), "某小区光猫安装", "2026-10-18", "15天", WORK_LIST, 0.1)
+    assert _parts(ooxml_fill.fill_review_form(*args)) == _parts(doc_forms.fill_review_form(*args))
+
+
+def test_merged_cells(tmp_path):
+    """合并单元格：多个填写位置对应同一单元格时，两种方式取到的单元格相同"""
+    path = str(tmp_path / "合并单元格.docx")
+    doc = Document(synthetic.application_template(str(tmp_path)))
+    table = doc.tables[0]
+    table.cell(1, 1).merge(table.cell(1, 4))  # 项目名称
+    table.cell(2, 3).merge(table.cell(2, 4))  # 预算金额的两个固定位置
+    table.cell(3, 1).merge(table.cell(3, 6))  # 工作量清单
+    doc.save(path)
+    args = (path, dict(DEFAULT_BASE_INFO), "某小区光猫安装", "2026-10-18", "15天", WORK_LIST, 1234.56)
+    assert _parts(ooxml_fill.fill_application_form(*args)) == _parts(doc_forms.fill_application_form(*args))
@@ -0,0 +1,99 @@
+"""预算表版本：增量保存后读取与保存的内容相同，版本比较列出新增、删除、调价项目，整列计算金额与逐项计算相同"""
+import random
+
+import numpy as np
+import pytest
+
+from budget_core import to_fen
+from price_versions import (KEYFRAME_INTERVAL, diff_versions, fen_array, load_version, lookup_prices, save_version,
+                            version_items)
+from sqlite_store import SqliteBudgetDB
+from .conftest import make_items
+
+
+def _prices(items):
+    return [dict(item, quantity=0.0, total=0.0) for item in items]
+
+
+@pytest.fixture
+def db(tmp_path):
+    return SqliteBudgetDB(str(tmp_path / "budget.db"))
+
+
+def test_round_trip(db):
+    items = _prices(make_items(30))
+    saved = []
+    for step in range(KEYFRAME_INTERVAL + 3):
+        items = [dict(item) for item in items]
+        items[step]["unit_price"] += 1
+        if step % 3 == 0:
+            items.pop()
+        if step % 4 == 0:
+            items.append(dict(items[0], id=100 + step, name=f"新增{step}"))
+        if step == 5:
+            items.reverse()
+        version_id, created = save_version(db, items, f"v{step}")
+        assert created
+        saved.append((version_id, items))
+
+    for version_id, items in saved:
+        assert version_items(db, version_id) == items
+    versions = db.list_price_versions()
+    assert max(v["depth"] for v in versions) < KEYFRAME_INTERVAL
+    assert any(v["base_id"] is not None for v in versions)  # 有增量版本
+
+
+def test_unchanged_not_saved(db):
+    items = _prices(make_items(10))
+    version_id, created = save_version(db, items, "v1")
+    assert created
+    assert save_version(db, items, "v2") == (version_id, False)
+    version_id2, created = save_version(db, items[::-1], "v3")  # 只改顺序也是新版本
+    assert created and version_id2 != version_id
+
+
+def test_missing_version(db):
+    with pytest.raises(ValueError):
+        load_version(db, 1)
+
+
+def test_diff(db):
+    old = _prices(make_items(10))
+    new = [dict(item) for item in old[1:]]
+    new[0]["unit_price"] = 99.0
+    new.append(dict(old[0], id=11, name="新增"))
+    old_id, _ = save_version(db, old, "旧")
+    new_id, _ = save_version(db, new, "新")
+
+    changed, same = db.create_project("站点1"), db.create_project("站点2")
+    db.save_snapshot({"items": old, "projects": {
+        changed: {"name": "站点1", "project_date": "", "cycle": "", "quantities": {2: 2.0, 5: 1.0}},
+        same: {"name": "站点2", "project_date": "", "cycle": "", "quantities": {5: 3.0}},
+    }})
+    diff = diff_versions(db, old_id, new_id)
+    assert [item["id"] for item in diff["added"]] == [11]
+    assert [item["id"] for item in diff["removed"]] == [1]
+    assert [(item["id"], item["old_price"], item["new_price"]) for item in diff["repriced"]] == [
+        (2, old[1]["unit_price"], 99.0)]
+    unit_price = {item["id"]: item["unit_price"] for item in old}
+    assert diff["projects"] == [{"id": changed, "name": "站点1",
+                                 "old_total": (to_fen(2, unit_price[2]) + to_fen(1, unit_price[5])) / 100,
+                                 "new_total": (to_fen(2, 99.0) + to_fen(1, unit_price[5])) / 100}]
+
+
+def test_fen_array_matches_to_fen():
+    rng = random.Random(1)
+    quantities = [round(rng.uniform(0, 100), rng.choice((0, 1, 2, 3))) for _ in range(5000)]
+    prices = [round(rng.uniform(0, 5000), rng.choice((1, 2, 3))) for _ in range(5000)]
+    # 恰好为0.5分的组合
+    quantities += [1, 3, 0.5, 1.5, 2.5, 0.3]
+    prices += [0.005, 1.005, 0.01, 0.01, 0.01, 0.05]
+    fen = fen_array(np.array(quantities), np.array(prices))
+    assert fen.dtype == np.int64
+    assert fen.tolist() == [to_fen(q, p) for q, p in zip(quantities, prices)]
+
+
+def test_lookup_prices():
+    ids, prices = np.array([2, 5, 9]), np.array([1.5, 2.5, 3.5])
+    assert lookup_prices(ids, prices, np.array([9, 1, 5, 10, 2])).tolist() == [3.5, 0.0, 2.5, 0.0, 1.5]
+    assert lookup_prices(np.zeros(0, np.int64), np.zeros(0), np.array([1, 2])).tolist() == [0.0, 0.0]
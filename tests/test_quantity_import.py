@@ -0,0 +1,53 @@
+"""勘察表工程量导入：名称完全匹配、规范化匹配、未匹配与无效工程量、重复行相加"""
+import pandas as pd
+
+from budget_store import BudgetTable
+from quantity_import import import_survey, match_survey, read_survey
+
+
+def _survey(rows):
+    names = [name for name, _ in rows]
+    raw = [quantity for _, quantity in rows]
+    return pd.DataFrame({"line": range(2, len(rows) + 2), "name": names, "raw_quantity": raw,
+                         "quantity": pd.to_numeric(pd.Series(raw, dtype=object), errors="coerce")})
+
+
+def test_match_survey():
+    ids = [1, 2, 3, 4]
+    names = ["皮线光缆", "ONU安装 （室内）", "皮线光缆", " 分纤箱 "]
+    result = match_survey(_survey([
+        ("皮线光缆", 10),            # 完全匹配，重名取靠前的项目
+        ("onu安装(室内)", 2),        # 全角括号、大小写、空格
+        ("分纤箱", "3.5"),           # 预算表名称首尾空格
+        ("皮线光缆", 5),             # 重复行相加
+        ("不存在", 1),
+        ("分纤箱", -1),
+        ("分纤箱", "两个"),
+        ("分纤箱", None),
+    ]), ids, names)
+    assert result["quantities"] == {1: 15.0, 2: 2.0, 4: 3.5}
+    assert (result["exact"], result["normalized"]) == (3, 1)
+    assert result["unmatched"] == [(6, "不存在", 1.0)]
+    assert result["invalid"] == [(7, "分纤箱", "-1"), (8, "分纤箱", "两个"), (9, "分纤箱", "（空）")]
+
+
+def test_read_survey_csv(tmp_path, price_book_items):
+    path = tmp_path / "勘察表.csv"
+    first, second = price_book_items[0]["name"], price_book_items[30]["name"]
+    pd.DataFrame({"序号": [1, 2, 3, 4], "名称": [first, " " + second, "", "不存在"],
+                  "数量": ["2", "1.5", "9", "x"]}).to_csv(path, index=False, encoding="gbk")
+    survey = read_survey(str(path))
+    assert survey["line"].tolist() == [2, 3, 5]  # 名称为空的行跳过
+    assert survey["name"].tolist() == [first, second, "不存在"]
+
+    result = import_survey(str(path), BudgetTable(price_book_items))
+    assert result["quantities"] == {1: 2.0, 31: 1.5}
+    assert result["unmatched"] == []
+    assert result["invalid"] == [(5, "不存在", "x")]
+
+
+def test_read_survey_xlsx(tmp_path):
+    path = str(tmp_path / "勘察表.xlsx")
+    pd.DataFrame({"项目名称": ["a", "b"], "工程量": [1, 2.5]}).to_excel(path, index=False)
+    survey = read_survey(path)
+    assert survey["quantity"].tolist() == [1.0, 2.5]
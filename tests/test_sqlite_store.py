@@ -0,0 +1,27 @@
+"""SQLite项目库：预算表与各项目工程量的保存，排队中的保存请求合并"""
+from sqlite_store import SqliteBudgetDB, merge_snapshots
+from .conftest import make_items
+
+
+def test_merge_snapshots():
+    items = {"items": ["预算表"], "price_key": (1, 2), "projects": {1: "a", 2: "b"}}
+    quantities = {"items": None, "projects": {2: "c", 3: "d"}}
+    assert merge_snapshots(items, quantities) == {"items": ["预算表"], "price_key": (1, 2),
+                                                  "projects": {1: "a", 2: "c", 3: "d"}}
+    newer = {"items": ["新预算表"], "price_key": (1, 3), "projects": {}}
+    assert merge_snapshots(items, newer) == dict(newer, projects=items["projects"])
+
+
+def test_save_snapshot(tmp_path):
+    db = SqliteBudgetDB(str(tmp_path / "budget.db"))
+    items = [dict(item, quantity=0.0, total=0.0) for item in make_items(10)]
+    project = db.create_project("站点")
+    db.save_snapshot({"items": items, "projects": {
+        project: {"name": "站点1", "project_date": "2026年10月18日", "cycle": "15天", "quantities": {2: 1.5, 9: 3.0}}}})
+    assert db.load_items() == items
+    info, quantities = db.load_project(project)
+    assert info["name"] == "站点1" and quantities == {2: 1.5, 9: 3.0}
+
+    db.save_snapshot({"items": items[:8], "projects": {}})  # 删除的项目，其工程量一并清除
+    assert db.load_project(project)[1] == {2: 1.5}
+    assert db.list_projects() == [(project, "站点1")]
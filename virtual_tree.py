@@ -0,0 +1,255 @@
+"""虚拟滚动表格：只在界面中生成可见区域（外加少量预留行）的Treeview行
+
+VirtualTreeview 提供与 ttk.Treeview 相同的常用接口（insert / delete / item / index /
+get_children / focus / selection / see / yview），全部行数据保存在内存中，
+滚动时只替换真实Treeview中的少量行，适合数万行的预算表。
+filter() 可以只显示部分行（如搜索结果），并在生成行时改写显示内容（如高亮匹配文字）；
+get_children / index 仍按全部行计算。
+其余方法（heading、column、tag_configure、pack等）直接转交给内部的真实Treeview。
+"""
+import itertools
+import tkinter as tk
+from tkinter import ttk
+
+OVERSCAN_ROWS = 5  # 可见区域以外额外生成的行数（窗口变化时避免出现空白）
+WHEEL_SCROLL_ROWS = 3
+
+
+class VirtualTreeview:
+    _iid_counter = itertools.count(1)
+
+    def __init__(self, master, yscrollcommand=None, **kw):
+        self.master = master
+        self.tree = ttk.Treeview(master, **kw)
+        self.yscrollcommand = yscrollcommand
+
+        self._rows = []  # 全部行iid（按显示顺序）
+        self._data = {}  # iid -> {"values": [...], "tags": [...]}
+        self._window = []  # 当前已生成到真实Treeview中的行
+        self._window_set = set()
+        self._top = 0  # 可见区域第一行在_rows中的位置
+        self._focus = ""
+        self._selection = ()
+        self._render_pending = None
+        self._shown = None  # 筛选后显示的行（按给定顺序），None为显示全部行
+        self._decorate = None
+
+        self.tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        self.tree.bind("<Configure>", lambda e: self.schedule_render(), add="+")
+        for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(seq, self._on_mouse_wheel)
+        for seq, delta in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "page_up"), ("<Next>", "page_down"),
+                           ("<Home>", "home"), ("<End>", "end")):
+            self.tree.bind(seq, lambda e, d=delta: self._on_key_move(d))
+
+    def __getattr__(self, name):
+        if name == "tree":
+            raise AttributeError(name)
+        return getattr(self.tree, name)
+
+    # ===================== Treeview 兼容接口 =====================
+    def insert(self, parent, index, iid=None, values=(), tags=(), **kw):
+        if iid is None:
+            iid = f"V{next(self._iid_counter)}"
+        if index == tk.END or index >= len(self._rows):
+            self._rows.append(iid)
+        else:
+            self._rows.insert(index, iid)
+        self._data[iid] = {"values": list(values), "tags": list(tags) if not isinstance(tags, str) else [tags]}
+        self.schedule_render()
+        return iid
+
+    def delete(self, *iids):
+        for iid in iids:
+            self._rows.remove(iid)
+            del self._data[iid]
+            if self._shown is not None and iid in self._shown:
+                self._shown.remove(iid)
+            if iid in self._selection:
+                self._selection = tuple(i for i in self._selection if i != iid)
+            if self._focus == iid:
+                self._focus = ""
+        self.schedule_render()
+
+    def item(self, iid, option=None, **kw):
+        data = self._data[iid]
+        if option is None and not kw:
+            return {"text": "", "values": list(data["values"]), "tags": list(data["tags"])}
+        if option is not None:
+            return list(data[option])
+        if "values" in kw:
+            data["values"] = list(kw["values"])
+        if "tags" in kw:
+            tags = kw["tags"]
+            data["tags"] = [tags] if isinstance(tags, str) else list(tags)
+        if iid in self._window_set:
+            values, tags = self._display(iid)
+            self.tree.item(iid, values=values, tags=tags)
+
+    def index(self, iid):
+        return self._rows.index(iid)
+
+    def get_children(self, item=""):
+        return tuple(self._rows)
+
+    def exists(self, iid):
+        return iid in self._data
+
+    def focus(self, iid=None):
+        if iid is None:
+            return self._focus
+        self._focus = iid
+        if iid in self._window_set:
+            self.tree.focus(iid)
+
+    def selection(self):
+        return self._selection
+
+    def selection_set(self, *items):
+        if len(items) == 1 and isinstance(items[0], (list, tuple)):
+            items = items[0]
+        self._selection = tuple(i for i in items if i in self._data)
+        self.tree.selection_set([i for i in self._selection if i in self._window_set])
+
+    def see(self, iid):
+        rows = self._visible()
+        if iid not in rows: return
+        pos = rows.index(iid)
+        visible = self._visible_rows()
+        if pos < self._top:
+            self._top = pos
+        elif pos >= self._top + visible:
+            self._top = pos - visible + 1
+        self._render()
+
+    def bind(self, sequence=None, func=None, add=None):
+        """绑定事件时将event.widget替换为本对象，回调中可照常调用focus()/item()"""
+        if func is None:
+            return self.tree.bind(sequence, func, add)
+
+        def handler(event):
+            event.widget = self
+            return func(event)
+
+        return self.tree.bind(sequence, handler, add)
+
+    # ===================== 筛选 =====================
+    def filter(self, iids=None, decorate=None):
+        """只显示iids中的行（按给定顺序）；decorate(iid, values, tags)返回实际显示的(values, tags)
+        iids为None时恢复显示全部行。滚动位置保留（超出范围时自动调整）"""
+        self._shown = None if iids is None else [iid for iid in iids if iid in self._data]
+        self._decorate = decorate if iids is not None else None
+        if self._window:  # 已生成的行可能需要改写内容，全部重新生成
+            self.tree.delete(*self._window)
+            self._window, self._window_set = [], set()
+        self._render()
+
+    def _visible(self):
+        return self._rows if self._shown is None else self._shown
+
+    def _display(self, iid):
+        data = self._data[iid]
+        if self._decorate is None:
+            return data["values"], data["tags"]
+        return self._decorate(iid, data["values"], data["tags"])
+
+    # ===================== 滚动 =====================
+    def yview(self, *args):
+        if not args:
+            return self._fractions()
+        n = len(self._visible())
+        visible = self._visible_rows()
+        if args[0] == "moveto":
+            self._top = int(round(float(args[1]) * n))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self._top += step * visible if args[2] == "pages" else step
+        self._render()
+
+    def _fractions(self):
+        n = len(self._visible())
+        if n == 0:
+            return 0.0, 1.0
+        visible = self._visible_rows()
+        return self._top / n, min(1.0, (self._top + visible) / n)
+
+    def _visible_rows(self):
+        """按控件高度与行高估算可见行数（表头按一行计算）"""
+        rowheight = int(float(ttk.Style(self.tree).lookup("Treeview", "rowheight") or 20))
+        height = self.tree.winfo_height()
+        if height <= 1:  # 尚未显示时按控件的height选项估算
+            return int(self.tree.cget("height"))
+        return max(1, height // rowheight - 1)
+
+    def _on_mouse_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.yview("scroll", -WHEEL_SCROLL_ROWS, "units")
+        elif event.num == 5 or event.delta < 0:
+            self.yview("scroll", WHEEL_SCROLL_ROWS, "units")
+        return "break"
+
+    def _on_key_move(self, delta):
+        """键盘上下翻行：在显示的行中移动焦点，并保证焦点行可见"""
+        rows = self._visible()
+        if not rows:
+            return "break"
+        pos = rows.index(self._focus) if self._focus in rows else -1
+        visible = self._visible_rows()
+        if delta == "home":
+            pos = 0
+        elif delta == "end":
+            pos = len(rows) - 1
+        elif delta == "page_up":
+            pos -= visible
+        elif delta == "page_down":
+            pos += visible
+        else:
+            pos += delta
+        iid = rows[max(0, min(pos, len(rows) - 1))]
+        self.see(iid)
+        self.focus(iid)
+        self.selection_set(iid)
+        return "break"
+
+    def _on_select(self, event):
+        """用户点击选中行时同步选中与焦点（滚出窗口导致的取消选中不处理）"""
+        selected = self.tree.selection()
+        if selected:
+            self._selection = tuple(selected)
+            self._focus = self.tree.focus() or selected[0]
+
+    # ===================== 渲染 =====================
+    def schedule_render(self):
+        if self._render_pending is None:
+            self._render_pending = self.tree.after_idle(self._render)
+
+    def _render(self):
+        if self._render_pending is not None:
+            self.tree.after_cancel(self._render_pending)
+            self._render_pending = None
+
+        rows = self._visible()
+        n = len(rows)
+        visible = self._visible_rows()
+        self._top = max(0, min(self._top, n - visible))
+        window = rows[self._top:min(n, self._top + visible + OVERSCAN_ROWS)]
+
+        if window != self._window:
+            keep = set(window)
+            stale = [iid for iid in self._window if iid not in keep]
+            if stale:
+                self.tree.delete(*stale)
+            materialized = self._window_set & keep
+            for pos, iid in enumerate(window):
+                if iid not in materialized:
+                    values, tags = self._display(iid)
+                    self.tree.insert("", pos, iid=iid, values=values, tags=tags)
+            self._window = window
+            self._window_set = keep
+            self.tree.selection_set([i for i in self._selection if i in keep])
+            if self._focus in keep:
+                self.tree.focus(self._focus)
+
+        self.tree.yview_moveto(0)
+        if self.yscrollcommand:
+            self.yscrollcommand(*self._fractions())